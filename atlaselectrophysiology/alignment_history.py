@@ -0,0 +1,111 @@
+from collections import OrderedDict
+import numpy as np
+
+# Number of steps for which brain regions and scale factors are kept once computed
+HISTORY_CACHE_SIZE = 20
+
+
+class AlignmentHistory:
+    """
+    Undo/ redo history of the alignment of a probe. Each step only stores the feature and track
+    reference points of the fit. The brain regions and scale factors of a step are computed from
+    these the first time they are needed and the most recently used are memoized, so the number of
+    steps is unlimited and moving between steps doesn't require recomputation
+    """
+    def __init__(self, ephysalign, feature, track, cache_size=HISTORY_CACHE_SIZE):
+        """
+        :param ephysalign: alignment used to compute brain regions and scale factors
+        :type ephysalign: EphysAlignment
+        :param feature: feature reference points of initial alignment
+        :type feature: np.array
+        :param track: track reference points of initial alignment
+        :type track: np.array
+        :param cache_size: number of steps for which region data is memoized
+        :type cache_size: int
+        """
+        self.ephysalign = ephysalign
+        self.cache_size = cache_size
+        self.steps = []
+        self.current = -1
+        self._regions = OrderedDict()
+        self._scale = OrderedDict()
+        self.add(feature, track)
+
+    @property
+    def total(self):
+        # Index of the latest step
+        return len(self.steps) - 1
+
+    @property
+    def feature(self):
+        return self.steps[self.current][0]
+
+    @property
+    def track(self):
+        return self.steps[self.current][1]
+
+    def add(self, feature, track):
+        """
+        Add a step after the current step, steps that had been undone are discarded
+        :param feature: feature reference points
+        :type feature: np.array
+        :param track: track reference points
+        :type track: np.array
+        """
+        del self.steps[self.current + 1:]
+        for memo in [self._regions, self._scale]:
+            for idx in [idx for idx in memo if idx > self.current]:
+                del memo[idx]
+        self.steps.append((np.array(feature, dtype=float), np.array(track, dtype=float)))
+        self.current = self.total
+
+    def undo(self):
+        """
+        :return: whether there was a previous step to move to
+        :type: bool
+        """
+        if self.current == 0:
+            return False
+        self.current -= 1
+        return True
+
+    def redo(self):
+        """
+        :return: whether there was a next step to move to
+        :type: bool
+        """
+        if self.current == self.total:
+            return False
+        self.current += 1
+        return True
+
+    def regions(self):
+        """
+        Brain regions along the probe track for the current step
+        :return region: lower and upper bounds of each region along track in um
+        :type region: np.array((n_regions, 2))
+        :return axis_label: position and acronym of label of each region
+        :type axis_label: np.array
+        """
+        return self._memoize(self._regions, lambda: self.ephysalign.scale_histology_regions(
+            self.feature, self.track))
+
+    def scale_factor(self):
+        """
+        Scale factor applied to each brain region for the current step
+        :return region: lower and upper bounds of each scaled region along track in um
+        :type region: np.array((n_regions, 2))
+        :return scale: scale factor of each region
+        :type scale: np.array
+        """
+        return self._memoize(self._scale, lambda: self.ephysalign.get_scale_factor(
+            self.regions()[0]))
+
+    def _memoize(self, memo, compute):
+        if self.current in memo:
+            memo.move_to_end(self.current)
+        else:
+            memo[self.current] = compute()
+            if len(memo) > self.cache_size:
+                memo.popitem(last=False)
+        return memo[self.current]
@@ -0,0 +1,111 @@
+"""
+Brain atlases shared by all apps of a process. The first time an atlas is loaded its volumes are
+written as .npy files to a cache folder, afterwards the volumes are memory mapped read only. A
+single instance is kept per resolution, and GUI processes on the same machine share the volumes
+through the page cache rather than each holding a copy in memory.
+"""
+from pathlib import Path
+import pickle
+import shutil
+import threading
+import uuid
+import numpy as np
+import ibllib
+import ibllib.atlas as atlas
+
+ATLAS_CACHE_DIR = Path.home().joinpath('.iblapps', 'atlas_cache')
+# Attributes of the atlas larger than this are stored as memory mapped .npy files
+MMAP_MIN_BYTES = 2 ** 20
+
+_atlases = {}
+_lock = threading.Lock()
+
+
+def get_atlas(res_um=25, cache_dir=None):
+    """
+    Get the Allen atlas at a given resolution, the same instance is returned on every call
+    :param res_um: resolution of atlas in um
+    :type res_um: int
+    :param cache_dir: folder in which atlas volumes are cached, by default ATLAS_CACHE_DIR
+    :type cache_dir: Path
+    :return: brain atlas with memory mapped volumes
+    :type: AllenAtlas
+    """
+    with _lock:
+        if res_um not in _atlases:
+            _atlases[res_um] = load_atlas(res_um, cache_dir or ATLAS_CACHE_DIR)
+        return _atlases[res_um]
+
+
+def load_atlas(res_um, cache_dir):
+    """
+    Load the Allen atlas from the cache, the atlas is instantiated and added to the cache if it
+    isn't there yet. The cache is specific to the version of ibllib so changes to the atlas are
+    picked up
+    :param res_um: resolution of atlas in um
+    :type res_um: int
+    :param cache_dir: folder in which atlas volumes are cached
+    :type cache_dir: Path
+    :return: brain atlas
+    :type: AllenAtlas
+    """
+    version = getattr(ibllib, '__version__', 'unknown')
+    atlas_path = Path(cache_dir).joinpath(f'allen_{res_um}um_ibllib_{version}')
+    if not atlas_path.joinpath('atlas.pkl').exists():
+        brain_atlas = atlas.AllenAtlas(res_um)
+        if not save_atlas(brain_atlas, atlas_path):
+            return brain_atlas
+    return read_atlas(atlas_path)
+
+
+def save_atlas(brain_atlas, atlas_path):
+    """
+    Save an atlas, large arrays are stored as .npy files and the remaining attributes are pickled
+    :param brain_atlas: atlas to save
+    :type brain_atlas: BrainAtlas
+    :param atlas_path: folder in which to save atlas
+    :type atlas_path: Path
+    :return: whether the atlas is available in atlas_path
+    :type: bool
+    """
+    # Write to a temporary folder first so that a partially written atlas is never read, if
+    # another process saved the atlas in the meantime its copy is kept
+    tmp_path = atlas_path.parent.joinpath(f'.{atlas_path.name}_{uuid.uuid4().hex}')
+    try:
+        tmp_path.mkdir(parents=True)
+        state = {}
+        volumes = []
+        for key, val in vars(brain_atlas).items():
+            if isinstance(val, np.ndarray) and val.nbytes >= MMAP_MIN_BYTES:
+                np.save(tmp_path.joinpath(f'{key}.npy'), val, allow_pickle=False)
+                volumes.append(key)
+            else:
+                state[key] = val
+        with open(tmp_path.joinpath('atlas.pkl'), 'wb') as f:
+            pickle.dump({'class': type(brain_atlas), 'state': state, 'volumes': volumes}, f)
+        tmp_path.rename(atlas_path)
+    except OSError as err:
+        if not atlas_path.joinpath('atlas.pkl').exists():
+            print(f'could not write atlas to cache: {err}')
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    return atlas_path.joinpath('atlas.pkl').exists()
+
+
+def read_atlas(atlas_path):
+    """
+    Read an atlas saved with save_atlas, its volumes are memory mapped read only
+    :param atlas_path: folder in which atlas is saved
+    :type atlas_path: Path
+    :return: brain atlas
+    :type: BrainAtlas
+    """
+    with open(atlas_path.joinpath('atlas.pkl'), 'rb') as f:
+        saved = pickle.load(f)
+    brain_atlas = saved['class'].__new__(saved['class'])
+    vars(brain_atlas).update(saved['state'])
+    for key in saved['volumes']:
+        setattr(brain_atlas, key, np.load(atlas_path.joinpath(f'{key}.npy'), mmap_mode='r'))
+
+    return brain_atlas
@@ -0,0 +1,253 @@
+"""
+Benchmark PlotData on synthetic data. Synthetic alf and raw ephys qc folders are generated for
+a range of numbers of spikes and the time taken and peak memory allocated by each PlotData method
+are written to a json report, so performance can be tracked across commits without network
+access.
+
+e.g
+python benchmark.py -s 1e6 10e6 -o report.json
+"""
+from pathlib import Path
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from atlaselectrophysiology.plot_data import PlotData, FREQ_BANDS
+
+SIZES = [1e6, 10e6, 50e6, 200e6]
+# Average number of spikes per second across the whole probe
+SPIKE_RATE = 10000
+# Number of spikes generated at once
+CHUNK_SIZE = 10 ** 7
+N_CHANNELS = 384
+PROBE_DEPTH = 3840
+# Interval between samples of the rms data in s
+RMS_BIN = 2
+# Methods to benchmark, in the order they are run, with their arguments
+BENCHMARKS = [
+    ('get_depth_data_scatter', ()),
+    ('get_cluster_stats', ()),
+    ('get_fr_p2t_data_scatter', ()),
+    ('get_fr_img', ()),
+    ('get_fr_amp_data_line', ()),
+    ('get_correlation_data_img', ()),
+    ('get_autocorrs', ()),
+    ('get_rms_data_img_probe', ('AP',)),
+    ('get_rms_data_img_probe', ('LF',)),
+    ('get_lfp_spectrum_data', ()),
+    ('get_lfp_band_data', tuple(FREQ_BANDS[0]))
+]
+
+
+def make_synthetic_data(path, n_spikes, n_clusters=None, seed=0):
+    """
+    Generate synthetic spike sorting and raw ephys qc data for a Neuropixel probe
+    :param path: folder in which to create 'alf' and 'raw_ephys_data' folders
+    :type path: Path
+    :param n_spikes: number of spikes
+    :type n_spikes: int
+    :param n_clusters: number of clusters, by default scales with number of spikes
+    :type n_clusters: int
+    :param seed: seed of random number generator
+    :type seed: int
+    :return alf_path: path to alf folder
+    :type alf_path: Path
+    :return ephys_path: path to raw ephys qc folder
+    :type ephys_path: Path
+    """
+    rng = np.random.default_rng(seed)
+    n_spikes = int(n_spikes)
+    n_clusters = n_clusters or int(np.clip(n_spikes / 20000, 50, 1000))
+    duration = n_spikes / SPIKE_RATE
+    alf_path = Path(path, 'alf')
+    ephys_path = Path(path, 'raw_ephys_data')
+    alf_path.mkdir(parents=True, exist_ok=True)
+    ephys_path.mkdir(parents=True, exist_ok=True)
+
+    # Channels, Neuropixel 3B geometry with two channels at each depth
+    chn_coords = np.c_[np.tile([43, 11, 59, 27], N_CHANNELS // 4),
+                       np.repeat(np.arange(20, PROBE_DEPTH + 20, 20), 2)].astype(float)
+    np.save(alf_path.joinpath('channels.localCoordinates.npy'), chn_coords)
+    np.save(alf_path.joinpath('channels.rawInd.npy'), np.arange(N_CHANNELS))
+
+    # Clusters, with a log normal distribution of firing rates
+    clust_rate = rng.lognormal(0, 1, n_clusters)
+    clust_rate /= np.sum(clust_rate)
+    clust_depth = rng.uniform(0, PROBE_DEPTH, n_clusters)
+    clust_amp = rng.lognormal(np.log(100e-6), 0.5, n_clusters)
+    clust_label = rng.choice(['good', 'mua'], n_clusters, p=[0.3, 0.7])
+    np.save(alf_path.joinpath('clusters.channels.npy'),
+            np.searchsorted(chn_coords[::2, 1], clust_depth).clip(max=N_CHANNELS // 2 - 1) * 2)
+    np.save(alf_path.joinpath('clusters.peakToTrough.npy'), rng.normal(0.5, 0.5, n_clusters))
+    np.save(alf_path.joinpath('clusters.waveforms.npy'),
+            rng.normal(0, 1e-5, (n_clusters, 82, 32)).astype(np.float32))
+    pd.DataFrame({'cluster_id': np.arange(n_clusters), 'ks2_label': clust_label}).to_csv(
+        alf_path.joinpath('clusters.metrics.csv'), index=False)
+
+    # Spikes, generated in chunks of time so that they are sorted without holding all spikes in
+    # memory
+    spikes = {
+        'times': np.lib.format.open_memmap(alf_path.joinpath('spikes.times.npy'), mode='w+',
+                                           dtype=np.float64, shape=(n_spikes,)),
+        'clusters': np.lib.format.open_memmap(alf_path.joinpath('spikes.clusters.npy'),
+                                              mode='w+', dtype=np.int64, shape=(n_spikes,)),
+        'depths': np.lib.format.open_memmap(alf_path.joinpath('spikes.depths.npy'), mode='w+',
+                                            dtype=np.float64, shape=(n_spikes,)),
+        'amps': np.lib.format.open_memmap(alf_path.joinpath('spikes.amps.npy'), mode='w+',
+                                          dtype=np.float64, shape=(n_spikes,))
+    }
+    n_chunks = int(np.ceil(n_spikes / CHUNK_SIZE))
+    bounds = np.linspace(0, n_spikes, n_chunks + 1).astype(int)
+    for iC in range(n_chunks):
+        n = bounds[iC + 1] - bounds[iC]
+        sl = slice(bounds[iC], bounds[iC + 1])
+        t_chunk = np.array([iC, iC + 1]) * duration / n_chunks
+        clusters = rng.choice(n_clusters, n, p=clust_rate)
+        depths = np.clip(clust_depth[clusters] + rng.normal(0, 20, n), 0, PROBE_DEPTH)
+        # Small number of spikes without a valid depth
+        depths[rng.random(n) < 1e-3] = np.nan
+        spikes['times'][sl] = np.sort(rng.uniform(t_chunk[0], t_chunk[1], n))
+        spikes['clusters'][sl] = clusters
+        spikes['depths'][sl] = depths
+        spikes['amps'][sl] = clust_amp[clusters] * rng.lognormal(0, 0.2, n)
+    for data in spikes.values():
+        data.flush()
+    del spikes
+
+    # Raw ephys qc, rms and power spectral density of the AP and LF bands
+    rms_times = np.arange(0, duration, RMS_BIN)
+    for band, rms in zip(['AP', 'LF'], [10e-6, 50e-6]):
+        np.save(ephys_path.joinpath(f'_iblqc_ephysTimeRms{band}.rms.npy'),
+                rng.lognormal(np.log(rms), 0.2, (rms_times.size, N_CHANNELS)).astype(np.float32))
+        np.save(ephys_path.joinpath(f'_iblqc_ephysTimeRms{band}.timestamps.npy'), rms_times)
+    freqs = np.linspace(0, 1250, 1025)
+    power = (1 / (1 + freqs[:, np.newaxis]) * rng.lognormal(np.log(1e-10), 0.2,
+                                                            (freqs.size, N_CHANNELS)))
+    np.save(ephys_path.joinpath('_iblqc_ephysSpectralDensityLF.freqs.npy'), freqs)
+    np.save(ephys_path.joinpath('_iblqc_ephysSpectralDensityLF.power.npy'), power)
+
+    return alf_path, ephys_path
+
+
+def profile(func, *args, **kwargs):
+    """
+    Time taken and peak memory allocated by a function call
+    :return: output of function, time in s, peak memory allocated in MB
+    :type: tuple
+    """
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = func(*args, **kwargs)
+    duration = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, duration, peak / 2 ** 20
+
+
+def benchmark_plot_data(alf_path, ephys_path, low_memory=False):
+    """
+    Time and memory profile each PlotData method. Memoized plot data is cleared before each
+    method so every method is computed, data shared between methods e.g spike data and the cluster
+    index is attributed to the first method that needs it
+    :param alf_path: path to alf folder
+    :type alf_path: Path
+    :param ephys_path: path to raw ephys qc folder
+    :type ephys_path: Path
+    :param low_memory: whether to run PlotData in low memory mode
+    :type low_memory: bool
+    :return: results for each method
+    :type: list of dict
+    """
+    results = []
+    plotdata, duration, peak = profile(PlotData, alf_path, ephys_path, cache=False,
+                                       low_memory=low_memory)
+    results.append({'method': '__init__', 'args': [], 'time_s': duration, 'peak_mb': peak})
+    for method, args in BENCHMARKS:
+        plotdata.products = {}
+        _, duration, peak = profile(getattr(plotdata, method), *args)
+        results.append({'method': method, 'args': [str(arg) for arg in args],
+                        'time_s': duration, 'peak_mb': peak})
+
+    return results
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=Path(__file__).parent,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes=SIZES, path=None, low_memory=False, keep=False):
+    """
+    Run benchmark for each number of spikes
+    :param sizes: numbers of spikes
+    :type sizes: list
+    :param path: folder in which to generate synthetic data, by default a temporary folder that
+                 is removed once the benchmark is done unless keep is True
+    :type path: Path
+    :param low_memory: whether to run PlotData in low memory mode
+    :type low_memory: bool
+    :param keep: whether to keep the synthetic data, otherwise it is deleted after each size
+    :type keep: bool
+    :return: report
+    :type: dict
+    """
+    tmp_path = None if path else Path(tempfile.mkdtemp(prefix='plot_data_benchmark_'))
+    path = Path(path or tmp_path)
+    report = {
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'low_memory': low_memory,
+        'benchmarks': []
+    }
+    try:
+        for n_spikes in sizes:
+            data_path = path.joinpath(f'{int(n_spikes)}_spikes')
+            if not data_path.joinpath('alf').exists():
+                t0 = time.perf_counter()
+                make_synthetic_data(data_path, n_spikes)
+                print(f'generated {int(n_spikes)} spikes in {time.perf_counter() - t0:.1f} s')
+            results = benchmark_plot_data(data_path.joinpath('alf'),
+                                          data_path.joinpath('raw_ephys_data'),
+                                          low_memory=low_memory)
+            for res in results:
+                print(f"{int(n_spikes)} spikes {res['method']}{tuple(res['args'])}: "
+                      f"{res['time_s']:.2f} s, {res['peak_mb']:.0f} MB")
+            report['benchmarks'].append({'n_spikes': int(n_spikes), 'results': results})
+            if not keep:
+                shutil.rmtree(data_path, ignore_errors=True)
+    finally:
+        if tmp_path and not keep:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    return report
+
+
+if __name__ == '__main__':
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark PlotData on synthetic data')
+    parser.add_argument('-s', '--sizes', nargs='+', type=float, default=SIZES,
+                        help='Numbers of spikes to benchmark')
+    parser.add_argument('-o', '--output', default='plot_data_benchmark.json',
+                        help='Path of json report')
+    parser.add_argument('-p', '--path', required=False,
+                        help='Folder in which to generate synthetic data')
+    parser.add_argument('-m', '--low_memory', action='store_true', help='Low memory mode')
+    parser.add_argument('-k', '--keep', action='store_true', help='Keep synthetic data')
+    args = parser.parse_args()
+
+    report = run(sizes=args.sizes, path=args.path, low_memory=args.low_memory, keep=args.keep)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'report written to {args.output}')
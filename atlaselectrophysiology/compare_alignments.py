@@ -4,10 +4,10 @@ from ibllib.pipes.ephys_alignment import EphysAlignment
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib
-import ibllib.atlas as atlas
+from atlaselectrophysiology.atlas_cache import get_atlas
 from pathlib import Path
 # Instantiate brain atlas and one
-brain_atlas = atlas.AllenAtlas(25)
+brain_atlas = get_atlas(25)
 one = ONE()
 
 fig_path = Path('C:/Users/Mayo/Documents/PYTHON/alignment_figures/scale_factor')
@@ -0,0 +1,195 @@
+from pathlib import Path
+import hashlib
+import json
+import shutil
+import uuid
+import numpy as np
+
+# Increment when the format of cached products changes to invalidate existing caches
+CACHE_VERSION = 1
+CACHE_DIR_NAME = '.plot_data_cache'
+# Arrays smaller than this are read into memory rather than memory mapped
+MMAP_MIN_BYTES = 2 ** 20
+# Bytes read from the start and end of each source file to hash its content
+HASH_BYTES = 2 ** 20
+
+
+def get_cache_path(alf_path):
+    """
+    Location of cache for products derived from data in an alf folder, next to the alf folder
+    :param alf_path: path to alf folder
+    :type alf_path: Path
+    :return: path to cache
+    :type: Path
+    """
+    return Path(alf_path).parent.joinpath(CACHE_DIR_NAME, Path(alf_path).name)
+
+
+def load_slice_images(loaddata, xyz_channels, cache_path):
+    """
+    Get slice images through the histology volumes along the track. Images are computed with
+    loaddata.get_slice_images the first time and stored in the cache, keyed by the location of the
+    track and the histology volumes. If a histology volume is missing the atlas image is shown in
+    its place, these images are not cached so the histology is shown once it is available
+    :param loaddata: LoadData or LoadDataLocal instance for the session
+    :param xyz_channels: coordinates of points along the track
+    :type xyz_channels: np.array
+    :param cache_path: folder in which to store cached products
+    :type cache_path: Path
+    :return: slice images
+    :type: dict
+    """
+    hist_paths = loaddata.get_histology_paths()
+    if any(path is None for path in hist_paths):
+        return loaddata.get_slice_images(xyz_channels, hist_paths)
+    cache = DerivedCache(cache_path, hist_paths)
+    track_key = hashlib.md5(np.ascontiguousarray(xyz_channels).tobytes()).hexdigest()
+    name = f'slice_images_{track_key}'
+    slice_data = cache.load(name)
+    if slice_data is not None:
+        return slice_data
+    slice_data = loaddata.get_slice_images(xyz_channels, hist_paths)
+    cache.save(name, slice_data)
+    return slice_data
+
+
+class DerivedCache:
+    """
+    On disk cache of products derived from alf data. Each product is stored in its own folder
+    containing a json file describing the structure of the product and one .npy file per array.
+    Large arrays are memory mapped when loaded. Products are keyed by the size, modification time
+    and content of the source files they were computed from, so they are invalidated
+    automatically when any of these files change
+    """
+    def __init__(self, cache_path, source_files):
+        """
+        :param cache_path: folder in which to store cached products
+        :type cache_path: Path
+        :param source_files: files from which cached products are derived
+        :type source_files: list of Path
+        """
+        self.cache_path = Path(cache_path)
+        self.source_key = self.hash_files(source_files)
+
+    @staticmethod
+    def hash_files(files):
+        """
+        Compute a hash from the name, size, modification time and content of a set of files. Only
+        the first and last HASH_BYTES of each file are hashed so the cost doesn't depend on the
+        size of the files. This catches files replaced by a copy that keeps the size and
+        modification time e.g cp -p, unless they only differ in the middle
+        :param files: files to hash
+        :type files: list of Path
+        :return: hash of files
+        :type: str
+        """
+        signature = [CACHE_VERSION]
+        for file in sorted(Path(f) for f in files):
+            stat = file.stat()
+            content = hashlib.md5()
+            with open(file, 'rb') as f:
+                content.update(f.read(HASH_BYTES))
+                if stat.st_size > HASH_BYTES:
+                    f.seek(max(stat.st_size - HASH_BYTES, HASH_BYTES))
+                    content.update(f.read(HASH_BYTES))
+            signature.append([file.name, stat.st_size, stat.st_mtime_ns, content.hexdigest()])
+        return hashlib.md5(json.dumps(signature).encode()).hexdigest()
+
+    def __contains__(self, name):
+        meta = self._read_meta(name)
+        return meta is not None and meta['key'] == self.source_key
+
+    def load(self, name):
+        """
+        Load a product from the cache, large arrays are memory mapped read only. Products that
+        can't be read e.g because files are missing or truncated are removed from the cache
+        :param name: name of product
+        :type name: str
+        :return: cached product, None if the product is not in the cache or is out of date
+        """
+        meta = self._read_meta(name)
+        if meta is None or meta['key'] != self.source_key:
+            return None
+        product_path = self.cache_path.joinpath(name)
+        arrays = []
+        try:
+            for i in range(meta['n_arrays']):
+                arr = np.load(product_path.joinpath(f'arr_{i}.npy'), mmap_mode='r')
+                arrays.append(arr if arr.nbytes >= MMAP_MIN_BYTES else np.array(arr))
+        except (OSError, ValueError) as err:
+            print(f'could not read {name} from cache: {err}')
+            shutil.rmtree(product_path, ignore_errors=True)
+            return None
+        return _unpack(meta['tree'], arrays)
+
+    def save(self, name, data):
+        """
+        Save a product to the cache. Products can be any nesting of dicts, lists and tuples
+        containing np.arrays, strings, numbers or None
+        :param name: name of product
+        :type name: str
+        :param data: product to save
+        """
+        arrays = []
+        meta = {'key': self.source_key, 'tree': _pack(data, arrays), 'n_arrays': len(arrays)}
+        # Write to a temporary folder first so partially written products are never read
+        tmp_path = self.cache_path.joinpath(f'.{name}_{uuid.uuid4().hex}')
+        try:
+            tmp_path.mkdir(parents=True)
+            for i, arr in enumerate(arrays):
+                np.save(tmp_path.joinpath(f'arr_{i}.npy'), arr, allow_pickle=False)
+            with open(tmp_path.joinpath('meta.json'), 'w') as f:
+                json.dump(meta, f)
+            product_path = self.cache_path.joinpath(name)
+            if product_path.exists():
+                shutil.rmtree(product_path, ignore_errors=True)
+            tmp_path.rename(product_path)
+        except OSError as err:
+            print(f'could not write {name} to cache: {err}')
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def clear(self):
+        """
+        Remove all products from the cache
+        """
+        shutil.rmtree(self.cache_path, ignore_errors=True)
+
+    def _read_meta(self, name):
+        try:
+            with open(self.cache_path.joinpath(name, 'meta.json'), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+def _pack(obj, arrays):
+    """
+    Convert a product into a json serialisable tree, arrays are replaced by their index in arrays
+    """
+    if isinstance(obj, np.ndarray):
+        arrays.append(obj)
+        return {'array': len(arrays) - 1}
+    elif isinstance(obj, dict):
+        return {'dict': [[key, _pack(val, arrays)] for key, val in obj.items()]}
+    elif isinstance(obj, (list, tuple)):
+        return {'tuple' if isinstance(obj, tuple) else 'list': [_pack(val, arrays) for val in obj]}
+    elif isinstance(obj, np.generic):
+        return {'value': obj.item()}
+    else:
+        return {'value': obj}
+
+
+def _unpack(tree, arrays):
+    """
+    Inverse of _pack
+    """
+    if 'array' in tree:
+        return arrays[tree['array']]
+    elif 'dict' in tree:
+        return {key: _unpack(val, arrays) for key, val in tree['dict']}
+    elif 'list' in tree:
+        return [_unpack(val, arrays) for val in tree['list']]
+    elif 'tuple' in tree:
+        return tuple(_unpack(val, arrays) for val in tree['tuple'])
+    else:
+        return tree['value']
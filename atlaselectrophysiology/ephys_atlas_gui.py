@@ -8,20 +8,94 @@ from ibllib.pipes.ephys_alignment import EphysAlignment
 import atlaselectrophysiology.plot_data as pd
 import atlaselectrophysiology.ColorBar as cb
 import atlaselectrophysiology.ephys_gui_setup as ephys_gui
+from atlaselectrophysiology.workers import JobManager
+from atlaselectrophysiology.derived_cache import load_slice_images, get_cache_path
+from atlaselectrophysiology.alignment_history import AlignmentHistory
+from atlaselectrophysiology.prerender import prefetch
+from atlaselectrophysiology.session_cache import SessionCache, SESSION_CACHE_MB
 from pathlib import Path
 
+# PlotData method, method arguments and index of output used to compute data for each plot
+PLOT_DATA = {
+    'scat_drift_data': ('get_depth_data_scatter', (), None),
+    'scat_fr_data': ('get_fr_p2t_data_scatter', (), 0),
+    'scat_p2t_data': ('get_fr_p2t_data_scatter', (), 1),
+    'scat_amp_data': ('get_fr_p2t_data_scatter', (), 2),
+    'img_corr_data': ('get_correlation_data_img', (), None),
+    'img_fr_data': ('get_fr_img', (), None),
+    'img_rms_APdata': ('get_rms_data_img_probe', ('AP',), 0),
+    'probe_rms_APdata': ('get_rms_data_img_probe', ('AP',), 1),
+    'img_rms_LFPdata': ('get_rms_data_img_probe', ('LF',), 0),
+    'probe_rms_LFPdata': ('get_rms_data_img_probe', ('LF',), 1),
+    'img_lfp_data': ('get_lfp_spectrum_data', (), 0),
+    'probe_lfp_data': ('get_lfp_spectrum_data', (), 1),
+    'line_fr_data': ('get_fr_amp_data_line', (), 0),
+    'line_amp_data': ('get_fr_amp_data_line', (), 1),
+    'probe_lfp_band': ('get_lfp_band_data', (), None)
+}
+# Plots of data for arguments chosen by the user, only computed when requested
+REQUESTED_PLOT_DATA = {'probe_lfp_band'}
+# Maximum rate in Hz at which the fit is previewed while reference lines are dragged
+PREVIEW_RATE = 30
+# Attributes of LoadData set when the data of a session is loaded, restored with a cached session
+LOADDATA_SESSION_ATTRS = ['sess_path', 'chn_coords', 'chn_depths', 'cluster_chns', 'xyz_picks',
+                          'resolved']
+
+
+def run_job(plotdata, filter_type, fn, *args):
+    """
+    Run a job for a session and unit filter, bound when the job is queued so that the session and
+    filter displayed can change while the job runs
+    :param plotdata: PlotData of session
+    :param filter_type: unit filter used to compute plot data
+    :type filter_type: str
+    :param fn: function to run
+    :param args: arguments to pass to fn
+    :return: session, unit filter and output of fn
+    :type: tuple
+    """
+    with plotdata.unit_filter(filter_type):
+        return plotdata, filter_type, fn(*args)
+
 
 class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
-    def __init__(self, offline=False):
+    def __init__(self, offline=False, low_memory=False, session_cache_mb=SESSION_CACHE_MB):
         super(MainWindow, self).__init__()
+        self.low_memory = low_memory
 
         self.init_variables()
         self.init_layout(self, offline=offline)
+        # Plot data is computed in the background so the GUI stays responsive
+        self.jobs = JobManager(self)
+        self.jobs.finished.connect(self.on_job_finished)
+        self.jobs.progress.connect(self.on_job_progress)
+        # Next session in the list is prepared on a single thread of its own, so that it doesn't
+        # hold up the plot data jobs of the current session
+        self.prefetch_jobs = JobManager(self, max_threads=1)
+        self.prefetch_jobs.finished.connect(self.on_prefetch_done)
+        self.prefetch_jobs.failed.connect(self.on_prefetch_done)
+        self.prefetch_id = None
+        # Sessions that have been prepared
+        self.prefetched = set()
+        # Session loaded while it was being prepared, it is displayed once ready
+        self.prefetch_load = None
+        # Moves of reference lines are coalesced into a single preview of the fit per interval
+        self.preview_timer = QtCore.QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(int(1000 / PREVIEW_RATE))
+        self.preview_timer.timeout.connect(self.plot_preview)
+        self.data_status = False
+        self.slice_data = None
+        self.plot_results = {}
         if not offline:
             self.loaddata = LoadData()
             self.populate_lists(self.loaddata.get_subjects(), self.subj_list, self.subj_combobox)
         else:
             self.loaddata = LoadDataLocal()
+        # Sessions that have been loaded are kept in memory so switching back to them is instant,
+        # the brain atlas is shared by all sessions so doesn't count towards the memory budget
+        self.session_cache = SessionCache(session_cache_mb, skip=[self.loaddata.brain_atlas])
+        self.session_key = None
         self.allen = self.loaddata.get_allen_csv()
         self.init_region_lookup(self.allen)
         self.configure = True
@@ -51,13 +125,8 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         # Initialise with linear fit scaling as default
         self.lin_fit = True
 
-        # Variables to keep track of number of fits (max 10)
-        self.max_idx = 10
-        self.idx = 0
-        self.current_idx = 0
-        self.total_idx = 0
-        self.last_idx = 0
-        self.diff_idx = 0
+        # History of fits, created once the data for a session is loaded
+        self.history = None
 
         # Variables to keep track of reference lines and points added
         self.line_status = True
@@ -75,8 +144,17 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         self.probe_plots = []
         self.img_cbars = []
         self.probe_cbars = []
-        self.scale_regions = np.empty((0, 1))
-        self.slice_lines = []
+        # Brain regions and scale factor along probe track, drawn as a single item each
+        self.hist_regions = None
+        self.hist_ref_regions = None
+        self.scale_regions = None
+        self.scale_cbar = None
+        self.selected_region = None
+        self.slice_type = 'hist_rd'
+        self.scatter_lod = None
+        self.fr_zoom = None
+        # Plots waiting for their data to be computed, keyed by plot function
+        self.plot_requests = {}
 
         # Variables to keep track of popup plots
         self.cluster_popups = []
@@ -84,8 +162,6 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         self.popup_status = True
 
         self.hist_data = {
-            'region': [0] * (self.max_idx + 1),
-            'axis_label': [0] * (self.max_idx + 1),
             'colour': []
         }
 
@@ -95,11 +171,6 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
             'colour': []
         }
 
-        self.scale_data = {
-            'region': [0] * (self.max_idx + 1),
-            'scale': [0] * (self.max_idx + 1)
-        }
-
         self.hist_nearby_x = None
         self.hist_nearby_y = None
         self.hist_nearby_col = None
@@ -107,9 +178,6 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         self.hist_nearby_parent_y = None
         self.hist_nearby_parent_col = None
 
-        self.track = [0] * (self.max_idx + 1)
-        self.features = [0] * (self.max_idx + 1)
-
     def set_axis(self, fig, ax, show=True, label=None, pen='k', ticks=True):
         """
         Show/hide and configure axis of figure
@@ -315,7 +383,9 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
 
     def plot_histology(self, fig, ax='left', movable=True):
         """
-        Plots histology figure - brain regions that intersect with probe track
+        Plots histology figure - brain regions that intersect with probe track. The regions and
+        probe lines are created the first time and afterwards updated in place, so that applying
+        a fit only moves the region boundaries
         :param fig: figure on which to plot
         :type fig: pyqtgraph PlotWidget
         :param ax: orientation of axis, must be one of 'left' (fig_hist) or 'right' (fig_hist_ref)
@@ -324,54 +394,43 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
                         fig_hist_ref
         :type movable: Bool
         """
-        fig.clear()
-        self.hist_regions = np.empty((0, 1))
+        region, axis_label = self.history.regions()
         axis = fig.getAxis(ax)
-        axis.setTicks([self.hist_data['axis_label'][self.idx]])
+        axis.setTicks([axis_label])
         axis.setZValue(10)
 
-        # Plot each histology region
-        for ir, reg in enumerate(self.hist_data['region'][self.idx]):
-            colour = QtGui.QColor(*self.hist_data['colour'][ir])
-            region = pg.LinearRegionItem(values=(reg[0], reg[1]),
-                                         orientation=pg.LinearRegionItem.Horizontal,
-                                         brush=colour, movable=False)
-            # Add a white line at the boundary between regions
-            bound = pg.InfiniteLine(pos=reg[0], angle=0, pen='w')
-            fig.addItem(region)
-            fig.addItem(bound)
-            # Need to keep track of each histology region for label pressed interaction
-            self.hist_regions = np.vstack([self.hist_regions, region])
-
-        self.selected_region = self.hist_regions[-2]
-
-        # Boundary for final region
-        bound = pg.InfiniteLine(pos=self.hist_data['region'][self.idx][-1][1], angle=0,
-                                pen='w')
-        fig.addItem(bound)
-        # Add dotted lines to plot to indicate region along probe track where electrode
-        # channels are distributed
-        self.tip_pos = pg.InfiniteLine(pos=self.probe_tip, angle=0, pen=self.kpen_dot,
-                                       movable=movable)
-        self.top_pos = pg.InfiniteLine(pos=self.probe_top, angle=0, pen=self.kpen_dot,
-                                       movable=movable)
+        if self.hist_regions is None:
+            # Items of a previous session are still displayed
+            fig.clear()
+            # Brain regions with a white line at the boundary between regions
+            self.hist_regions = ephys_gui.RegionsItem(pen='w')
+            self.hist_regions.sigRegionHovered.connect(self.on_region_hovered)
+            fig.addItem(self.hist_regions)
+            # Add dotted lines to plot to indicate region along probe track where electrode
+            # channels are distributed
+            self.tip_pos = pg.InfiniteLine(pos=self.probe_tip, angle=0, pen=self.kpen_dot,
+                                           movable=movable)
+            self.top_pos = pg.InfiniteLine(pos=self.probe_top, angle=0, pen=self.kpen_dot,
+                                           movable=movable)
+            self.tip_pos.sigPositionChanged.connect(self.tip_line_moved)
+            self.top_pos.sigPositionChanged.connect(self.top_line_moved)
+            fig.addItem(self.tip_pos)
+            fig.addItem(self.top_pos)
+
+        self.hist_regions.setData(region, [QtGui.QColor(*col) for col in self.hist_data['colour']])
+        self.selected_region = len(region) - 2
 
         # Lines can be moved to adjust location of channels along the probe track
         # Ensure distance between bottom and top channel is always constant at 3840um and that
         # lines can't be moved outside interpolation bounds
         # Add offset of 1um to keep within bounds of interpolation
         offset = 1
-        self.tip_pos.setBounds((self.track[self.idx][0] * 1e6 + offset,
-                                self.track[self.idx][-1] * 1e6 -
-                                (self.probe_top + offset)))
-        self.top_pos.setBounds((self.track[self.idx][0] * 1e6 + (self.probe_top + offset),
-                                self.track[self.idx][-1] * 1e6 - offset))
-        self.tip_pos.sigPositionChanged.connect(self.tip_line_moved)
-        self.top_pos.sigPositionChanged.connect(self.top_line_moved)
-
-        # Add lines to figure
-        fig.addItem(self.tip_pos)
-        fig.addItem(self.top_pos)
+        track = self.history.track
+        self.tip_pos.setBounds((track[0] * 1e6 + offset,
+                                track[-1] * 1e6 - (self.probe_top + offset)))
+        self.top_pos.setBounds((track[0] * 1e6 + (self.probe_top + offset),
+                                track[-1] * 1e6 - offset))
+        self.tip_pos.setPos(self.probe_tip)
 
     def plot_histology_ref(self, fig, ax='right', movable=False):
         """
@@ -385,35 +444,26 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         :type movable: Bool
         """
         fig.clear()
-        self.hist_ref_regions = np.empty((0, 1))
         axis = fig.getAxis(ax)
         axis.setTicks([self.hist_data_ref['axis_label']])
         axis.setZValue(10)
         self.set_axis(self.fig_hist_ref, 'bottom', pen='w')
 
-        # Plot each histology region
-        for ir, reg in enumerate(self.hist_data_ref['region']):
-            colour = QtGui.QColor(*self.hist_data['colour'][ir])
-            region = pg.LinearRegionItem(values=(reg[0], reg[1]),
-                                         orientation=pg.LinearRegionItem.Horizontal,
-                                         brush=colour, movable=False)
-            bound = pg.InfiniteLine(pos=reg[0], angle=0, pen='w')
-            fig.addItem(region)
-            fig.addItem(bound)
-            self.hist_ref_regions = np.vstack([self.hist_ref_regions, region])
-
-        bound = pg.InfiniteLine(pos=self.hist_data_ref['region'][-1][1], angle=0,
-                                pen='w')
-        fig.addItem(bound)
+        self.hist_ref_regions = ephys_gui.RegionsItem(pen='w')
+        self.hist_ref_regions.setData(self.hist_data_ref['region'],
+                                      [QtGui.QColor(*col) for col in self.hist_data['colour']])
+        self.hist_ref_regions.sigRegionHovered.connect(self.on_region_hovered)
+        fig.addItem(self.hist_ref_regions)
+
         # Add dotted lines to plot to indicate region along probe track where electrode
         # channels are distributed
-        self.tip_pos = pg.InfiniteLine(pos=self.probe_tip, angle=0, pen=self.kpen_dot,
-                                       movable=movable)
-        self.top_pos = pg.InfiniteLine(pos=self.probe_top, angle=0, pen=self.kpen_dot,
-                                       movable=movable)
+        tip_pos = pg.InfiniteLine(pos=self.probe_tip, angle=0, pen=self.kpen_dot,
+                                  movable=movable)
+        top_pos = pg.InfiniteLine(pos=self.probe_top, angle=0, pen=self.kpen_dot,
+                                  movable=movable)
         # Add lines to figure
-        fig.addItem(self.tip_pos)
-        fig.addItem(self.top_pos)
+        fig.addItem(tip_pos)
+        fig.addItem(top_pos)
 
     def plot_histology_nearby(self, fig, ax='right', movable=False):
         """
@@ -427,7 +477,7 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         :type movable: Bool
         """
         fig.clear()
-        self.hist_ref_regions = np.empty((0, 1))
+        self.hist_ref_regions = None
         axis = fig.getAxis(ax)
         axis.setTicks([self.hist_data_ref['axis_label']])
         axis.setZValue(10)
@@ -459,182 +509,201 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
 
         # Add dotted lines to plot to indicate region along probe track where electrode
         # channels are distributed
-        self.tip_pos = pg.InfiniteLine(pos=self.probe_tip, angle=0, pen=self.kpen_dot,
-                                       movable=movable)
-        self.top_pos = pg.InfiniteLine(pos=self.probe_top, angle=0, pen=self.kpen_dot,
-                                       movable=movable)
+        tip_pos = pg.InfiniteLine(pos=self.probe_tip, angle=0, pen=self.kpen_dot,
+                                  movable=movable)
+        top_pos = pg.InfiniteLine(pos=self.probe_top, angle=0, pen=self.kpen_dot,
+                                  movable=movable)
         # Add lines to figure
-        fig.addItem(self.tip_pos)
-        fig.addItem(self.top_pos)
+        fig.addItem(tip_pos)
+        fig.addItem(top_pos)
 
-    def offset_hist_data(self):
+    def offset_hist_data(self, offset=0):
         """
         Offset location of probe tip along probe track
+        :param offset: offset in um to apply in addition to the position of the probe tip line
+        :type offset: float
         """
-        self.track[self.idx] = (self.track[self.idx_prev] + self.tip_pos.value() / 1e6)
-        self.features[self.idx] = (self.features[self.idx_prev])
-
-        self.hist_data['region'][self.idx], self.hist_data['axis_label'][self.idx] \
-            = self.ephysalign.scale_histology_regions(self.features[self.idx],
-                                                      self.track[self.idx])
-        self.scale_data['region'][self.idx], self.scale_data['scale'][self.idx] \
-            = self.ephysalign.get_scale_factor(self.hist_data['region'][self.idx])
+        self.history.add(self.history.feature,
+                         self.history.track + (self.tip_pos.value() + offset) / 1e6)
 
     def scale_hist_data(self):
         """
         Scale brain regions along probe track
         """
+        self.history.add(*self.fit_lines())
+
+        # to automatically have lines go to correct position
+        # self.loaddata.track2feature(line_track, self.idx)
+
+    def fit_lines(self):
+        """
+        Fit of the current step to the positions of the reference lines
+        :return feature: feature reference points
+        :type feature: np.array
+        :return track: track reference points
+        :type track: np.array
+        """
+        feature_prev, track_prev = self.history.feature, self.history.track
         # Track --> histology plot
         line_track = np.array([line[0].pos().y() for line in self.lines_tracks]) / 1e6
         # Feature --> ephys data plots
         line_feature = np.array([line[0].pos().y() for line in self.lines_features]) / 1e6
-        depths_track = np.sort(np.r_[self.track[self.idx_prev][[0, -1]], line_track])
-
-        self.track[self.idx] = self.ephysalign.feature2track(depths_track,
-                                                             self.features[self.idx_prev],
-                                                             self.track[self.idx_prev])
+        depths_track = np.sort(np.r_[track_prev[[0, -1]], line_track])
 
-        self.features[self.idx] = np.sort(np.r_[self.features[self.idx_prev]
-                                                [[0, -1]], line_feature])
+        track = self.ephysalign.feature2track(depths_track, feature_prev, track_prev)
+        feature = np.sort(np.r_[feature_prev[[0, -1]], line_feature])
 
-        if (self.features[self.idx].size >= 5) & self.lin_fit:
-            self.features[self.idx], self.track[self.idx] = \
-                self.ephysalign.adjust_extremes_linear(self.features[self.idx],
-                                                       self.track[self.idx], self.extend_feature)
+        if (feature.size >= 5) & self.lin_fit:
+            feature, track = self.ephysalign.adjust_extremes_linear(feature, track,
+                                                                    self.extend_feature)
 
         else:
-            self.track[self.idx] = self.ephysalign.adjust_extremes_uniform(self.features[self.idx],
-                                                                           self.track[self.idx])
-        self.hist_data['region'][self.idx], self.hist_data['axis_label'][self.idx] \
-            = self.ephysalign.scale_histology_regions(self.features[self.idx],
-                                                      self.track[self.idx])
-        self.scale_data['region'][self.idx], self.scale_data['scale'][self.idx] \
-            = self.ephysalign.get_scale_factor(self.hist_data['region'][self.idx])
+            track = self.ephysalign.adjust_extremes_uniform(feature, track)
 
-        # to automatically have lines go to correct position
-        # self.loaddata.track2feature(line_track, self.idx)
+        return feature, track
 
     def plot_scale_factor(self):
         """
         Plots the scale factor applied to brain regions along probe track, displayed
         alongside histology figure
         """
-        self.fig_scale.clear()
-        self.scale_regions = np.empty((0, 1))
-        self.scale_factor = self.scale_data['scale'][self.idx]
-        scale_factor = self.scale_data['scale'][self.idx] - 0.5
+        region, self.scale_factor = self.history.scale_factor()
+        scale_factor = self.scale_factor - 0.5
         color_bar = cb.ColorBar('seismic')
-        cbar = color_bar.makeColourBar(20, 5, self.fig_scale_cb, min=0.5, max=1.5,
-                                       label='Scale Factor')
         colours = color_bar.map.mapToQColor(scale_factor)
 
-        for ir, reg in enumerate(self.scale_data['region'][self.idx]):
-            region = pg.LinearRegionItem(values=(reg[0], reg[1]),
-                                         orientation=pg.LinearRegionItem.Horizontal,
-                                         brush=colours[ir], movable=False)
-            bound = pg.InfiniteLine(pos=reg[0], angle=0, pen=colours[ir])
+        if self.scale_regions is None:
+            # Items of a previous session are still displayed
+            self.fig_scale.clear()
+            self.fig_scale_cb.clear()
+            self.scale_regions = ephys_gui.RegionsItem()
+            self.scale_regions.sigRegionHovered.connect(self.on_scale_region_hovered)
+            self.fig_scale.addItem(self.scale_regions)
+            self.scale_cbar = color_bar.makeColourBar(20, 5, self.fig_scale_cb, min=0.5, max=1.5,
+                                                      label='Scale Factor')
+            self.fig_scale_cb.addItem(self.scale_cbar)
+        self.scale_regions.setData(region, colours)
 
-            self.fig_scale.addItem(region)
-            self.fig_scale.addItem(bound)
-            self.scale_regions = np.vstack([self.scale_regions, region])
+        self.fig_scale.setYRange(min=self.probe_tip - self.probe_extra,
+                                 max=self.probe_top + self.probe_extra, padding=self.pad)
 
-        bound = pg.InfiniteLine(pos=self.scale_data['region'][self.idx][-1][1], angle=0,
-                                pen=colours[-1])
+    def plot_preview(self):
+        """
+        Triggered by the preview timer while reference lines are moved. Plots the brain regions,
+        scale factor and channels on the slice for the fit to the current positions of the
+        reference lines, without adding the fit to the history
+        """
+        if not self.preview_option.isChecked() or self.hist_regions is None:
+            return
+        feature, track = self.fit_lines()
+        region, axis_label = self.ephysalign.scale_histology_regions(feature, track)
+        self.fig_hist.getAxis('left').setTicks([axis_label])
+        self.hist_regions.setData(region, [QtGui.QColor(*col) for col in self.hist_data['colour']])
 
-        self.fig_scale.addItem(bound)
+        scale_region, self.scale_factor = self.ephysalign.get_scale_factor(region)
+        colours = cb.ColorBar('seismic').map.mapToQColor(self.scale_factor - 0.5)
+        self.scale_regions.setData(scale_region, colours)
 
-        self.fig_scale.setYRange(min=self.probe_tip - self.probe_extra,
-                                 max=self.probe_top + self.probe_extra, padding=self.pad)
-        self.fig_scale_cb.addItem(cbar)
+        xyz_channels = self.ephysalign.get_channel_locations(feature, track)
+        self.slice_chns.setData(x=xyz_channels[:, 0], y=xyz_channels[:, 2])
+
+    def request_preview(self):
+        """
+        Schedules a preview of the fit, moves made before the preview timer fires are coalesced
+        into the same preview
+        """
+        if self.preview_option.isChecked() and not self.preview_timer.isActive():
+            self.preview_timer.start()
 
     def plot_fit(self):
         """
         Plots the scale factor and offset applied to channels along depth of probe track
         relative to orignal position of channels
         """
-        self.fit_plot.setData(x=self.features[self.idx] * 1e6,
-                              y=self.track[self.idx] * 1e6)
-        self.fit_scatter.setData(x=self.features[self.idx] * 1e6,
-                                 y=self.track[self.idx] * 1e6)
+        feature, track = self.history.feature, self.history.track
+        self.fit_plot.setData(x=feature * 1e6, y=track * 1e6)
+        self.fit_scatter.setData(x=feature * 1e6, y=track * 1e6)
 
-        depth_lin = self.ephysalign.feature2track_lin(self.depth / 1e6, self.features[self.idx],
-                                                      self.track[self.idx])
+        depth_lin = self.ephysalign.feature2track_lin(self.depth / 1e6, feature, track)
         if np.any(depth_lin):
             self.fit_plot_lin.setData(x=self.depth, y=depth_lin * 1e6)
         else:
             self.fit_plot_lin.setData()
 
     def plot_slice(self, data, img_type):
-        self.fig_slice.clear()
-        self.slice_chns = []
-        self.slice_lines = []
-        img = pg.ImageItem()
-        img.setImage(data[img_type])
-
-        if img_type == 'label':
-            img.translate(data['offset'][0], data['offset'][1])
-            img.scale(data['scale'][0], data['scale'][1])
-            self.fig_slice_layout.removeItem(self.slice_item)
-            self.fig_slice_layout.addItem(self.fig_slice_hist_alt, 0, 1)
-            self.slice_item = self.fig_slice_hist_alt
-        else:
+        """
+        Plots slice image with trajectory and channels. The items on the slice figure are created
+        once, only their data is updated
+        :param data: slice images, None if they have not been computed yet
+        :type data: dict
+        :param img_type: type of image to display, 'hist_rd', 'hist_gr', 'ccf' or 'label'
+        :type img_type: str
+        """
+        # Slice images are computed in the background, image is shown once available
+        self.slice_type = img_type
+        label = img_type == 'label'
+        self.slice_img.setVisible(data is not None and not label)
+        self.slice_label_img.setVisible(data is not None and label)
+        if data is not None:
+            img = self.slice_label_img if label else self.slice_img
+            img.setImage(data[img_type])
+            img.resetTransform()
             img.translate(data['offset'][0], data['offset'][1])
             img.scale(data['scale'][0], data['scale'][1])
-            color_bar = cb.ColorBar('cividis')
-            lut = color_bar.getColourMap()
-            img.setLookupTable(lut)
-            self.fig_slice_layout.removeItem(self.slice_item)
-            self.fig_slice_hist.setImageItem(img)
-            self.fig_slice_hist.gradient.setColorMap(color_bar.map)
-            self.fig_slice_hist.autoHistogramRange()
-            self.fig_slice_layout.addItem(self.fig_slice_hist, 0, 1)
-            hist_levels = self.fig_slice_hist.getLevels()
-            hist_val, hist_count = img.getHistogram()
-            upper_idx = np.where(hist_count > 10)[0][-1]
-            upper_val = hist_val[upper_idx]
-            if hist_levels[0] != 0:
-                self.fig_slice_hist.setLevels(mn=hist_levels[0], mx=upper_val)
-            self.slice_item = self.fig_slice_hist
-
-        self.fig_slice.addItem(img)
-        self.traj_line = pg.PlotCurveItem()
-        self.traj_line.setData(x=self.xyz_track[:, 0], y=self.xyz_track[:, 2], pen=self.kpen_solid)
-        self.fig_slice.addItem(self.traj_line)
+
+            if label:
+                self.fig_slice_layout.removeItem(self.slice_item)
+                self.fig_slice_layout.addItem(self.fig_slice_hist_alt, 0, 1)
+                self.slice_item = self.fig_slice_hist_alt
+            else:
+                color_bar = cb.ColorBar('cividis')
+                lut = color_bar.getColourMap()
+                img.setLookupTable(lut)
+                self.fig_slice_layout.removeItem(self.slice_item)
+                self.fig_slice_hist.imageChanged(autoLevel=True)
+                self.fig_slice_hist.gradient.setColorMap(color_bar.map)
+                self.fig_slice_hist.autoHistogramRange()
+                self.fig_slice_layout.addItem(self.fig_slice_hist, 0, 1)
+                hist_levels = self.fig_slice_hist.getLevels()
+                hist_val, hist_count = img.getHistogram()
+                upper_idx = np.where(hist_count > 10)[0][-1]
+                upper_val = hist_val[upper_idx]
+                if hist_levels[0] != 0:
+                    self.fig_slice_hist.setLevels(mn=hist_levels[0], mx=upper_val)
+                self.slice_item = self.fig_slice_hist
+
+        self.traj_line.setData(x=self.xyz_track[:, 0], y=self.xyz_track[:, 2])
         self.plot_channels()
 
     def plot_channels(self):
-        self.channel_status = True
-        self.xyz_channels = self.ephysalign.get_channel_locations(self.features[self.idx],
-                                                                  self.track[self.idx])
-        if not self.slice_chns:
-            self.slice_lines = []
-            self.slice_chns = pg.ScatterPlotItem()
-            self.slice_chns.setData(x=self.xyz_channels[:, 0], y=self.xyz_channels[:, 2], pen='r',
-                                    brush='r')
-            self.fig_slice.addItem(self.slice_chns)
-            track_lines = self.ephysalign.get_perp_vector(self.features[self.idx],
-                                                          self.track[self.idx])
-
-            for ref_line in track_lines:
-                line = pg.PlotCurveItem()
-                line.setData(x=ref_line[:, 0], y=ref_line[:, 2], pen=self.kpen_dot)
-                self.fig_slice.addItem(line)
-                self.slice_lines.append(line)
+        """
+        Plots channels and lines perpendicular to the track at the reference points of the fit on
+        the slice figure. Lines are only created when a fit has more reference points than any
+        previous fit, lines that are not needed are cleared
+        """
+        self.xyz_channels = self.ephysalign.get_channel_locations(self.history.feature,
+                                                                  self.history.track)
+        self.slice_chns.setData(x=self.xyz_channels[:, 0], y=self.xyz_channels[:, 2])
+
+        track_lines = self.ephysalign.get_perp_vector(self.history.feature, self.history.track)
+        for _ in range(len(self.slice_lines), len(track_lines)):
+            line = pg.PlotCurveItem(pen=self.kpen_dot)
+            self.fig_slice.addItem(line)
+            self.slice_lines.append(line)
+        for iL, line in enumerate(self.slice_lines):
+            if iL < len(track_lines):
+                line.setData(x=track_lines[iL][:, 0], y=track_lines[iL][:, 2])
+            else:
+                line.clear()
+        self.show_channels()
 
-        else:
-            for line in self.slice_lines:
-                self.fig_slice.removeItem(line)
-            self.slice_lines = []
-            track_lines = self.ephysalign.get_perp_vector(self.features[self.idx],
-                                                          self.track[self.idx])
-
-            for ref_line in track_lines:
-                line = pg.PlotCurveItem()
-                line.setData(x=ref_line[:, 0], y=ref_line[:, 2], pen=self.kpen_dot)
-                self.fig_slice.addItem(line)
-                self.slice_lines.append(line)
-            self.slice_chns.setData(x=self.xyz_channels[:, 0], y=self.xyz_channels[:, 2], pen='r',
-                                    brush='r')
+    def show_channels(self):
+        """
+        Shows or hides trajectory, channels and perpendicular lines on slice figure according to
+        self.channel_status
+        """
+        for item in [self.traj_line, self.slice_chns] + self.slice_lines:
+            item.setVisible(self.channel_status)
 
     def plot_scatter(self, data):
         """
@@ -642,8 +711,11 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         param data: dictionary of data to plot
             {'x': x coordinate of data, np.array((npoints)), float
              'y': y coordinate of data, np.array((npoints)), float
-             'size': size of data points, np.array((npoints)), float
-             'colour': colour of data points, np.array((npoints)), QtGui.QColor
+             'size': size of data points, np.array((npoints)), float, or size of each entry in
+                     lut, np.array((ncolours)), float, if lut given
+             'colours': colour of data points, np.array((npoints)), float between 0 and 1, or
+                        index into lut, np.array((npoints)), uint8
+             'lut': optional lookup table of colours, np.array((ncolours, 4)), uint8 RGBA
              'xrange': range to display of x axis, np.array([min range, max range]), float
              'xaxis': label for xaxis, string
             }
@@ -657,8 +729,9 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
             [self.fig_img_cb.removeItem(cbar) for cbar in self.img_cbars]
             self.img_plots = []
             self.img_cbars = []
+            self.scatter_lod = None
+            self.fr_zoom = None
             connect = np.zeros(data['x'].size, dtype=int)
-            size = data['size'].tolist()
             symbol = data['symbol'].tolist()
 
             color_bar = cb.ColorBar(data['cmap'])
@@ -667,10 +740,16 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
             self.fig_img_cb.addItem(cbar)
             self.img_cbars.append(cbar)
 
-            if type(np.any(data['colours'])) == QtGui.QColor:
-                brush = data['colours'].tolist()
+            if 'lut' in data:
+                # Only create one brush per colour in lookup table and index into these, so no
+                # objects are created per data point
+                lut_brush = np.empty(data['lut'].shape[0], dtype=object)
+                lut_brush[:] = [pg.mkBrush(*col) for col in data['lut']]
+                brush = lut_brush[data['colours']]
+                size = data['size'][data['colours']]
             else:
                 brush = color_bar.map.mapToQColor(data['colours'])
+                size = data['size'].tolist()
 
             plot = pg.PlotDataItem()
             plot.setData(x=data['x'], y=data['y'], connect=connect,
@@ -690,6 +769,90 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
                 self.data = data['x']
                 self.data_plot.sigPointsClicked.connect(self.cluster_clicked)
 
+            if 'lod' in data:
+                self.scatter_lod = {
+                    'lod': data['lod'],
+                    'brush': lut_brush,
+                    'size': data['size']
+                }
+                self.on_img_range_changed()
+
+    def on_img_range_changed(self):
+        """
+        Triggered when the view range of the image plot changes. If a scatter plot with a level of
+        detail pyramid is displayed, updates the points shown so that finer levels are displayed as
+        the view range shrinks, while never drawing more than pd.MAX_SCATTER_POINTS. If the firing
+        rate image is displayed, requests the image of the visible time window at a finer
+        resolution
+        """
+        if self.fr_zoom is not None:
+            self.update_fr_window()
+        if self.scatter_lod is None:
+            return
+        lod = self.scatter_lod['lod']
+        xrange, yrange = self.fig_img.viewRange()
+        idx = pd.get_scatter_lod(lod, xrange, yrange)
+        colours = lod['colours'][idx]
+        self.data_plot.setData(x=lod['x'][idx], y=lod['y'][idx],
+                               connect=np.zeros(idx.size, dtype=int),
+                               symbolSize=self.scatter_lod['size'][colours],
+                               symbolBrush=self.scatter_lod['brush'][colours])
+
+    def update_fr_window(self):
+        """
+        Computes the firing rate image of the visible time window, with one time bin per pixel,
+        when this is finer than the image of the whole recording. The window is padded by half its
+        width on each side so that small pans don't need a new image
+        """
+        xrange, _ = self.fig_img.viewRange()
+        n_bins = max(int(self.fig_img.getViewBox().width()), 1)
+        width = xrange[1] - xrange[0]
+        t_bin = pd.fr_img_t_bin(width, n_bins)
+        if t_bin >= self.fr_zoom['t_bin']:
+            # Image of whole recording is fine enough, hide window
+            if self.fr_zoom['image'] is not None:
+                self.fr_zoom['image'].setVisible(False)
+            self.fr_zoom['window'] = None
+            self.fr_zoom['request'] = None
+            return
+        window = self.fr_zoom['window']
+        if (window is not None and window['t_bin'] == t_bin and
+                window['xrange'][0] <= max(xrange[0], self.xrange[0]) and
+                window['xrange'][1] >= min(xrange[1], self.xrange[1])):
+            return
+        request = (xrange[0] - width / 2, xrange[1] + width / 2, 2 * n_bins)
+        # Don't compute the same window again e.g if view is outside of the recording
+        if request == self.fr_zoom['request']:
+            return
+        if not self.jobs.is_pending('fr_img_window'):
+            self.fr_zoom['request'] = request
+            self.submit_job('fr_img_window', self.plotdata.get_fr_img_window, *request,
+                            priority=3)
+
+    def on_fr_window_computed(self, data):
+        """
+        Displays the firing rate image of a time window on top of the image of the whole
+        recording, using the same colour levels
+        """
+        if self.fr_zoom is None:
+            return
+        if data is not None and self.fr_zoom['request'] is not None:
+            if self.fr_zoom['image'] is None:
+                self.fr_zoom['image'] = pg.ImageItem()
+                self.fr_zoom['image'].setLookupTable(self.fr_zoom['lut'])
+                self.fig_img.addItem(self.fr_zoom['image'])
+                self.img_plots.append(self.fr_zoom['image'])
+            image = self.fr_zoom['image']
+            image.setImage(data['img'])
+            image.setLevels((self.fr_zoom['levels'][0], self.fr_zoom['levels'][1]))
+            image.resetTransform()
+            image.translate(data['offset'][0], data['offset'][1])
+            image.scale(data['scale'][0], data['scale'][1])
+            image.setVisible(True)
+            self.fr_zoom['window'] = data
+        # View may have changed while the window was being computed
+        self.update_fr_window()
+
     def plot_line(self, data):
         """
         Plots a 1D line plot with electrophysiology data
@@ -767,6 +930,9 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         param data: dictionary of data to plot
             {'img': image data, np.array((nx,ny)), float
              'scale': scaling to apply to each axis, np.array([xscale,yscale]), float
+             'offset': optional offset to apply to image, np.array([xoffset,yoffset]), float
+             't_bin': optional time bin of firing rate image, if given finer images of the
+                      visible time window are displayed when zooming in, float
              'level': colourbar extremes np.array([min val, max val]), float
              'cmap': colourmap to use, string
              'xrange': range to display of x axis, np.array([min range, max range]), float
@@ -784,11 +950,16 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
             self.set_axis(self.fig_img_cb, 'top', pen='w')
             self.img_plots = []
             self.img_cbars = []
+            self.scatter_lod = None
+            self.fr_zoom = None
 
             image = pg.ImageItem()
             image.setImage(data['img'])
+            if 'offset' in data:
+                image.translate(data['offset'][0], data['offset'][1])
             image.scale(data['scale'][0], data['scale'][1])
             cmap = data.get('cmap', [])
+            lut = None
             if cmap:
                 color_bar = cb.ColorBar(data['cmap'])
                 lut = color_bar.getColourMap()
@@ -811,6 +982,17 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
             self.data_plot = image
             self.xrange = data['xrange']
 
+            if 't_bin' in data:
+                self.fr_zoom = {
+                    't_bin': data['t_bin'],
+                    'levels': data['levels'],
+                    'lut': lut,
+                    'image': None,
+                    'window': None,
+                    'request': None
+                }
+                self.on_img_range_changed()
+
     """
     Interaction functions
     """
@@ -861,6 +1043,9 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         Triggered when Get Data button pressed, uses subject and session info to find eid and
         downloads and computes data needed for GUI display
         """
+        if not self.data_status and self.wait_for_prefetch():
+            return
+
         # Clear all plots from previous session
         [self.fig_img.removeItem(plot) for plot in self.img_plots]
         [self.fig_img.removeItem(cbar) for cbar in self.img_cbars]
@@ -872,11 +1057,21 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         self.init_variables()
 
         # Only run once
+        state = None
         if not self.data_status:
-            alf_path, ephys_path, self.chn_depths, self.sess_notes = self.loaddata.get_data()
-            self.xyz_picks = self.loaddata.get_xyzpicks()
+            self.store_session()
+            self.session_key = self.get_session_key()
+            state = self.session_cache.pop(self.session_key)
+            if state is None:
+                alf_path, ephys_path, self.chn_depths, self.sess_notes = \
+                    self.loaddata.get_data()
+                self.xyz_picks = self.loaddata.get_xyzpicks()
+            else:
+                self.restore_session(state)
 
-        if np.any(self.feature_prev):
+        if state is not None and self.is_start_alignment(state['start_alignment']):
+            self.ephysalign = state['ephysalign']
+        elif np.any(self.feature_prev):
             self.ephysalign = EphysAlignment(self.xyz_picks, self.chn_depths,
                                              track_prev=self.track_prev,
                                              feature_prev=self.feature_prev,
@@ -884,16 +1079,11 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         else:
             self.ephysalign = EphysAlignment(self.xyz_picks, self.chn_depths,
                                              brain_atlas=self.loaddata.brain_atlas)
+        self.start_alignment = (self.feature_prev, self.track_prev)
 
-        self.features[self.idx], self.track[self.idx], self.xyz_track \
-            = self.ephysalign.get_track_and_feature()
-
-        self.hist_data['region'][self.idx], self.hist_data['axis_label'][self.idx] \
-            = self.ephysalign.scale_histology_regions(self.features[self.idx],
-                                                      self.track[self.idx])
+        feature, track, self.xyz_track = self.ephysalign.get_track_and_feature()
+        self.history = AlignmentHistory(self.ephysalign, feature, track)
         self.hist_data['colour'] = self.ephysalign.region_colour
-        self.scale_data['region'][self.idx], self.scale_data['scale'][self.idx] \
-            = self.ephysalign.get_scale_factor(self.hist_data['region'][self.idx])
 
         self.hist_data_ref['region'], self.hist_data_ref['axis_label'] \
             = self.ephysalign.scale_histology_regions(self.ephysalign.track_extent,
@@ -901,21 +1091,16 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         self.hist_data_ref['colour'] = self.ephysalign.region_colour
 
         if not self.data_status:
-            self.plotdata = pd.PlotData(alf_path, ephys_path)
-            self.scat_drift_data = self.plotdata.get_depth_data_scatter()
-            (self.scat_fr_data, self.scat_p2t_data,
-             self.scat_amp_data) = self.plotdata.get_fr_p2t_data_scatter()
-            self.img_corr_data = self.plotdata.get_correlation_data_img()
-            self.img_fr_data = self.plotdata.get_fr_img()
-            self.img_rms_APdata, self.probe_rms_APdata = self.plotdata.get_rms_data_img_probe('AP')
-            self.img_rms_LFPdata, self.probe_rms_LFPdata = self.plotdata.get_rms_data_img_probe(
-                'LF')
-            self.img_lfp_data, self.probe_lfp_data = self.plotdata.get_lfp_spectrum_data()
-            self.line_fr_data, self.line_amp_data = self.plotdata.get_fr_amp_data_line()
-            self.slice_data = self.loaddata.get_slice_images(self.ephysalign.xyz_samples)
-
+            # Discard any plot data still being computed for the previous session
+            self.jobs.cancel()
+            if state is None:
+                self.filter_results = {}
+                self.plotdata = pd.PlotData(alf_path, ephys_path, low_memory=self.low_memory)
+                self.slice_data = None
             self.data_status = True
 
+        self.set_unit_filter('all')
+
         # Initialise checked plots
         self.img_init.setChecked(True)
         self.line_init.setChecked(True)
@@ -923,10 +1108,11 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         self.unit_init.setChecked(True)
         self.slice_init.setChecked(True)
 
-        # Initialise ephys plots
-        self.plot_image(self.img_fr_data)
-        self.plot_probe(self.probe_rms_APdata)
-        self.plot_line(self.line_fr_data)
+        # Initialise ephys plots, plots are displayed as soon as their data has been computed
+        self.request_plot('img_fr_data', self.plot_image)
+        self.request_plot('probe_rms_APdata', self.plot_probe)
+        self.request_plot('line_fr_data', self.plot_line)
+        self.compute_plot_data()
 
         # Initialise histology plots
         self.plot_histology_ref(self.fig_hist_ref)
@@ -944,6 +1130,109 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         # Only configure the view the first time the GUI is launched
         self.set_view(view=1, configure=self.configure)
         self.configure = False
+        self.prefetch_next_session()
+
+    def get_session_key(self):
+        """
+        Key identifying the selected session, the trajectory id in online mode and the folder in
+        offline mode
+        """
+        return str(self.loaddata.folder_path) if self.offline else self.loaddata.traj_id
+
+    def store_session(self):
+        """
+        Add the state of the displayed session to the session cache. Results of jobs still
+        computing plot data for the session are discarded, the jobs are queued again when the
+        session is displayed and read the products the discarded jobs memoized in its PlotData
+        """
+        if self.session_key is None:
+            return
+        self.session_cache.put(self.session_key, {
+            'loaddata': {attr: getattr(self.loaddata, attr) for attr in LOADDATA_SESSION_ATTRS
+                         if hasattr(self.loaddata, attr)},
+            'chn_depths': self.chn_depths,
+            'sess_notes': self.sess_notes,
+            'xyz_picks': self.xyz_picks,
+            'plotdata': self.plotdata,
+            'filter_results': self.filter_results,
+            'slice_data': self.slice_data,
+            'ephysalign': self.ephysalign,
+            'start_alignment': self.start_alignment
+        })
+
+    def restore_session(self, state):
+        """
+        Restore the state of a session from the session cache
+        :param state: state of session as stored by store_session
+        :type state: dict
+        """
+        for attr, val in state['loaddata'].items():
+            setattr(self.loaddata, attr, val)
+        self.chn_depths = state['chn_depths']
+        self.sess_notes = state['sess_notes']
+        self.xyz_picks = state['xyz_picks']
+        self.plotdata = state['plotdata']
+        self.filter_results = state['filter_results']
+        self.slice_data = state['slice_data']
+
+    def is_start_alignment(self, alignment):
+        """
+        Whether an alignment is the starting alignment currently selected
+        :param alignment: feature and track of alignment, None for the original alignment
+        :type alignment: tuple
+        """
+        return all((prev is None and align is None) or
+                   (prev is not None and align is not None and np.array_equal(prev, align))
+                   for prev, align in zip((self.feature_prev, self.track_prev), alignment))
+
+    def prefetch_next_session(self):
+        """
+        Download and compute the plot data of the session after the current one in the session
+        list in the background, so that it loads quickly when the user moves on to it
+        """
+        if self.offline or self.prefetch_id is not None:
+            return
+        idx = self.sess_combobox.currentIndex() + 1
+        if idx >= len(self.loaddata.sess):
+            return
+        sess = self.loaddata.sess[idx]
+        if sess['id'] in self.prefetched:
+            return
+        self.prefetch_id = sess['id']
+        self.prefetch_jobs.submit('prefetch', prefetch, sess, pd.UNIT_FILTERS,
+                                  self.low_memory)
+
+    def wait_for_prefetch(self):
+        """
+        If the selected session is being prepared in the background, display it once it is ready
+        rather than downloading and computing its data a second time. The GUI stays responsive
+        in the meantime
+        :return: whether loading the session is deferred
+        :type: bool
+        """
+        if self.prefetch_id is None or self.prefetch_id != self.loaddata.traj_id:
+            return False
+        self.prefetch_load = self.prefetch_id
+        self.statusBar().showMessage('Waiting for the session being prepared in the background')
+        return True
+
+    def on_prefetch_done(self, job, traj_id=None):
+        """
+        Triggered when preparing a session completes or fails. The session is loaded if it was
+        selected and loaded in the meantime, otherwise the session after the displayed one is
+        prepared
+        """
+        prefetch_id, self.prefetch_id = self.prefetch_id, None
+        prefetch_load, self.prefetch_load = self.prefetch_load, None
+        if traj_id is not None:
+            self.prefetched.add(traj_id)
+        if prefetch_load == prefetch_id == self.loaddata.traj_id and not self.data_status:
+            self.data_button_pressed()
+            return
+        if traj_id is not None:
+            self.statusBar().showMessage('Next session prepared', 2000)
+        if self.data_status:
+            self.prefetch_next_session()
 
     def compute_nearby_boundaries(self):
         nearby_bounds = self.ephysalign.get_nearest_boundary(self.ephysalign.xyz_samples,
@@ -971,20 +1260,161 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         else:
             self.plot_histology_ref(self.fig_hist_ref)
 
+    @staticmethod
+    def get_plot_job(name, args=()):
+        """
+        Name of job that computes data for plot, plots that share a PlotData method and arguments
+        share a job
+        :param name: name of plot, must be a key in PLOT_DATA
+        :type name: str
+        :param args: arguments passed to the PlotData method after those in PLOT_DATA
+        :type args: tuple
+        :return: name of job
+        :type: str
+        """
+        method, plot_args, _ = PLOT_DATA[name]
+        return '_'.join([method, *map(str, plot_args + tuple(args))])
+
+    def compute_plot_data(self):
+        """
+        Queue computation of slice images, cluster autocorrelograms and all plot data that has not
+        yet been computed. Jobs for plots that have been requested are started first
+        """
+        if self.slice_data is None:
+            self.submit_job('slice_data', load_slice_images, self.loaddata,
+                            self.ephysalign.xyz_samples, get_cache_path(self.plotdata.alf_path),
+                            priority=2)
+        requested = {self.get_plot_job(name, args): (name, args)
+                     for name, _, _, args in self.plot_requests.values()}
+        for job, (name, args) in requested.items():
+            if job not in self.plot_results:
+                self.submit_plot_job(name, args, priority=1)
+        for name in PLOT_DATA:
+            if name in REQUESTED_PLOT_DATA:
+                continue
+            if self.get_plot_job(name) not in self.plot_results:
+                self.submit_plot_job(name)
+        # Autocorrelograms of all clusters, so cluster popups open instantly
+        if 'get_autocorrs' not in self.plot_results:
+            self.submit_job('get_autocorrs', self.plotdata.get_autocorrs)
+
+    def submit_job(self, name, fn, *args, priority=0):
+        """
+        Queue a job for the displayed session and unit filter, see run_job
+        :param name: name of job
+        :type name: str
+        :param fn: function to run
+        :param args: arguments to pass to fn
+        :param priority: jobs with higher priority are started first
+        :type priority: int
+        """
+        self.jobs.submit(name, run_job, self.plotdata, self.plotdata.filter_type, fn, *args,
+                         priority=priority)
+
+    def submit_plot_job(self, name, args=(), priority=0):
+        method, plot_args, _ = PLOT_DATA[name]
+        self.submit_job(self.get_plot_job(name, args), getattr(self.plotdata, method),
+                        *plot_args, *args, priority=priority)
+
+    def request_plot(self, name, plot_func, key=None, args=()):
+        """
+        Display a plot. If the data for the plot is not available yet it is computed in the
+        background and the plot is displayed once complete, unless another plot has been requested
+        for the same figure in the meantime
+        :param name: name of plot, must be a key in PLOT_DATA
+        :type name: str
+        :param plot_func: function used to display the plot e.g self.plot_image
+        :param key: if given, plot data[key]
+        :type key: str
+        :param args: arguments passed to the PlotData method after those in PLOT_DATA e.g the
+        limits of a frequency band
+        :type args: tuple
+        """
+        job = self.get_plot_job(name, args)
+        if job in self.plot_results:
+            self.plot_requests.pop(plot_func.__name__, None)
+            plot_func(self.select_plot_data(name, self.plot_results[job], key))
+        else:
+            self.plot_requests[plot_func.__name__] = (name, plot_func, key, args)
+            self.submit_plot_job(name, args, priority=1)
+
+    @staticmethod
+    def select_plot_data(name, data, key=None):
+        output = PLOT_DATA[name][2]
+        data = data if output is None else data[output]
+        return data if key is None else data[key]
+
+    def on_job_finished(self, job, result):
+        plotdata, filter_type, result = result
+        # Discard results of a session or unit filter that is no longer displayed
+        if plotdata is not self.plotdata:
+            return
+        if job == 'slice_data':
+            self.slice_data = result
+            self.plot_slice(self.slice_data, self.slice_type)
+            return
+        if filter_type != self.plotdata.filter_type:
+            return
+        if job == 'fr_img_window':
+            self.on_fr_window_computed(result)
+            return
+        self.plot_results[job] = result
+        for func_name, (name, plot_func, key, args) in list(self.plot_requests.items()):
+            if self.get_plot_job(name, args) == job:
+                del self.plot_requests[func_name]
+                plot_func(self.select_plot_data(name, self.plot_results[job], key))
+
+    def on_job_progress(self, n_done, n_total, job):
+        if n_done < n_total:
+            self.statusBar().showMessage(f'Computing plot data: {n_done}/{n_total} complete, '
+                                         f'last updated {job}')
+        else:
+            self.statusBar().showMessage('Plot data computed', 2000)
+
+    def set_unit_filter(self, type):
+        """
+        Select the type of units displayed in plots. Plot data for each filter is kept, so
+        switching back to a filter displays its plots without any recomputation
+        :param type: type of unit 'all', 'good' or 'mua'
+        :type type: str
+        """
+        if type != self.plotdata.filter_type:
+            # Jobs for the previous filter are no longer needed, running jobs complete in the
+            # background as they use the filter they were queued with
+            self.jobs.cancel()
+            self.plotdata.filter_units(type)
+        self.plot_results = self.filter_results.setdefault(type, {})
+
     def filter_unit_pressed(self, type):
-        self.plotdata.filter_units(type)
-        self.scat_drift_data = self.plotdata.get_depth_data_scatter()
-        (self.scat_fr_data, self.scat_p2t_data,
-         self.scat_amp_data) = self.plotdata.get_fr_p2t_data_scatter()
-        self.img_corr_data = self.plotdata.get_correlation_data_img()
-        self.img_fr_data = self.plotdata.get_fr_img()
-        self.line_fr_data, self.line_amp_data = self.plotdata.get_fr_amp_data_line()
+        self.set_unit_filter(type)
         self.img_init.setChecked(True)
         self.line_init.setChecked(True)
         self.probe_init.setChecked(True)
-        self.plot_image(self.img_fr_data)
-        self.plot_probe(self.probe_rms_APdata)
-        self.plot_line(self.line_fr_data)
+        self.request_plot('img_fr_data', self.plot_image)
+        self.request_plot('probe_rms_APdata', self.plot_probe)
+        self.request_plot('line_fr_data', self.plot_line)
+        self.compute_plot_data()
+
+    def add_band_pressed(self):
+        """
+        Triggered when Add Frequency Band option selected in probe plots menu, adds an option to
+        display the lfp power in a frequency band chosen by the user
+        """
+        text, ok = QtWidgets.QInputDialog.getText(self, 'Add Frequency Band',
+                                                  'Frequency band (Hz) e.g 200 - 300')
+        if not ok:
+            return
+        try:
+            freq = [float(val) for val in text.split('-')]
+            assert len(freq) == 2 and freq[0] < freq[1]
+        except (ValueError, AssertionError):
+            print(f'{text} is not a valid frequency band')
+            return
+
+        probe = self.add_band_option(freq)
+        if self.data_status:
+            probe.setChecked(True)
+            self.request_plot('probe_lfp_band', self.plot_probe, args=tuple(freq))
 
     def fit_button_pressed(self):
         """
@@ -992,24 +1422,6 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         according to locations of reference lines on ephys and histology plots. Updates all plots
         and indices after scaling has been applied
         """
-        # Use a cyclic buffer of length self.max_idx to hold information about previous moves,
-        # when a new move is initiated ensures indexes are all correct so user can only access
-        # fixed number of previous or next moves
-        if self.current_idx < self.last_idx:
-            self.total_idx = np.copy(self.current_idx)
-            self.diff_idx = (np.mod(self.last_idx, self.max_idx) - np.mod(self.total_idx,
-                                                                          self.max_idx))
-            if self.diff_idx >= 0:
-                self.diff_idx = self.max_idx - self.diff_idx
-            else:
-                self.diff_idx = np.abs(self.diff_idx)
-        else:
-            self.diff_idx = self.max_idx - 1
-
-        self.total_idx += 1
-        self.current_idx += 1
-        self.idx_prev = np.copy(self.idx)
-        self.idx = np.mod(self.current_idx, self.max_idx)
         self.scale_hist_data()
         self.plot_histology(self.fig_hist)
         self.plot_scale_factor()
@@ -1018,6 +1430,8 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         self.remove_lines_points()
         self.add_lines_points()
         self.update_lines_points()
+        # Lines are moved to their fitted position, there is nothing left to preview
+        self.preview_timer.stop()
         self.fig_hist.setYRange(min=self.probe_tip - self.probe_extra,
                                 max=self.probe_top + self.probe_extra, padding=self.pad)
         self.update_string()
@@ -1028,23 +1442,16 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         locations of probe tip line on histology plot. Updates all plots and indices after offset
         has been applied
         """
+        self.apply_offset()
 
-        if self.current_idx < self.last_idx:
-            self.total_idx = np.copy(self.current_idx)
-            self.diff_idx = (np.mod(self.last_idx, self.max_idx) - np.mod(self.total_idx,
-                                                                          self.max_idx))
-            if self.diff_idx >= 0:
-                self.diff_idx = self.max_idx - self.diff_idx
-            else:
-                self.diff_idx = np.abs(self.diff_idx)
-        else:
-            self.diff_idx = self.max_idx - 1
-
-        self.total_idx += 1
-        self.current_idx += 1
-        self.idx_prev = np.copy(self.idx)
-        self.idx = np.mod(self.current_idx, self.max_idx)
-        self.offset_hist_data()
+    def apply_offset(self, offset=0):
+        """
+        Applies offset to brain regions according to location of probe tip line on histology plot
+        and an additional offset. Updates all plots after offset has been applied
+        :param offset: offset in um in addition to the position of the probe tip line
+        :type offset: float
+        """
+        self.offset_hist_data(offset)
         self.plot_histology(self.fig_hist)
         self.plot_scale_factor()
         self.plot_fit()
@@ -1052,6 +1459,7 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         self.remove_lines_points()
         self.add_lines_points()
         self.update_lines_points()
+        self.preview_timer.stop()
         self.fig_hist.setYRange(min=self.probe_tip - self.probe_extra,
                                 max=self.probe_top + self.probe_extra, padding=self.pad)
         self.update_string()
@@ -1060,17 +1468,15 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         """
         Triggered when Shift+down key pressed. Moves probe tip down by 50um and offsets data
         """
-        if self.track[self.idx][-1] - 50 / 1e6 >= np.max(self.chn_depths) / 1e6:
-            self.track[self.idx] -= 50 / 1e6
-            self.offset_button_pressed()
+        if self.history.track[-1] - 50 / 1e6 >= np.max(self.chn_depths) / 1e6:
+            self.apply_offset(-50)
 
     def moveup_button_pressed(self):
         """
         Triggered when Shift+down key pressed. Moves probe tip up by 50um and offsets data
         """
-        if self.track[self.idx][0] + 50 / 1e6 <= np.min(self.chn_depths) / 1e6:
-            self.track[self.idx] += 50 / 1e6
-            self.offset_button_pressed()
+        if self.history.track[0] + 50 / 1e6 <= np.min(self.chn_depths) / 1e6:
+            self.apply_offset(50)
 
     def toggle_labels_button_pressed(self):
         """
@@ -1106,17 +1512,7 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         Triggered when Shift+C key pressed. Shows/hides channels and trajectory on slice image
         """
         self.channel_status = not self.channel_status
-        if not self.channel_status:
-            self.fig_slice.removeItem(self.traj_line)
-            self.fig_slice.removeItem(self.slice_chns)
-            for line in self.slice_lines:
-                self.fig_slice.removeItem(line)
-
-        else:
-            self.fig_slice.addItem(self.traj_line)
-            self.fig_slice.addItem(self.slice_chns)
-            for line in self.slice_lines:
-                self.fig_slice.addItem(line)
+        self.show_channels()
 
     def delete_line_button_pressed(self):
         """
@@ -1138,17 +1534,12 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
             self.lines_features = np.delete(self.lines_features, line_idx, axis=0)
             self.lines_tracks = np.delete(self.lines_tracks, line_idx, axis=0)
             self.points = np.delete(self.points, line_idx, axis=0)
+            self.request_preview()
 
     def describe_labels_pressed(self):
-        if self.selected_region:
-            idx = np.where(self.hist_regions == self.selected_region)[0]
-            if not np.any(idx):
-                idx = np.where(self.hist_ref_regions == self.selected_region)[0]
-            if not np.any(idx):
-                idx = np.array([0])
-
+        if self.selected_region is not None:
             description, lookup = self.loaddata.get_region_description(
-                self.ephysalign.region_id[idx[0]][0])
+                self.ephysalign.region_id[self.selected_region][0])
             item = self.struct_list.findItems(lookup, flags=QtCore.Qt.MatchRecursive)
             model_item = self.struct_list.indexFromItem(item[0])
             self.struct_view.collapseAll()
@@ -1191,10 +1582,7 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         Triggered when right key pressed. Updates all plots and indices with next move. Ensures
         user cannot go past latest move
         """
-        if (self.current_idx < self.total_idx) & (self.current_idx >
-                                                  self.total_idx - self.max_idx):
-            self.current_idx += 1
-            self.idx = np.mod(self.current_idx, self.max_idx)
+        if self.history.redo():
             self.remove_lines_points()
             self.add_lines_points()
             self.plot_histology(self.fig_hist)
@@ -1207,15 +1595,9 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
 
     def prev_button_pressed(self):
         """
-        Triggered when left key pressed. Updates all plots and indices with previous move.
-        Ensures user cannot go back more than self.max_idx moves
+        Triggered when left key pressed. Updates all plots and indices with previous move
         """
-        if self.total_idx > self.last_idx:
-            self.last_idx = np.copy(self.total_idx)
-
-        if (self.current_idx > np.max([0, self.total_idx - self.diff_idx])):
-            self.current_idx -= 1
-            self.idx = np.mod(self.current_idx, self.max_idx)
+        if self.history.undo():
             self.remove_lines_points()
             self.add_lines_points()
             self.plot_histology(self.fig_hist)
@@ -1235,28 +1617,8 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         self.lines_features = np.empty((0, 3))
         self.lines_tracks = np.empty((0, 1))
         self.points = np.empty((0, 1))
-        if self.current_idx < self.last_idx:
-            self.total_idx = np.copy(self.current_idx)
-            self.diff_idx = (np.mod(self.last_idx, self.max_idx) - np.mod(self.total_idx,
-                                                                          self.max_idx))
-            if self.diff_idx >= 0:
-                self.diff_idx = self.max_idx - self.diff_idx
-            else:
-                self.diff_idx = np.abs(self.diff_idx)
-        else:
-            self.diff_idx = self.max_idx - 1
-
-        self.total_idx += 1
-        self.current_idx += 1
-        self.idx = np.mod(self.current_idx, self.max_idx)
-        self.track[self.idx] = np.copy(self.ephysalign.track_init)
-        self.features[self.idx] = np.copy(self.ephysalign.feature_init)
-        self.hist_data['region'][self.idx], self.hist_data['axis_label'][self.idx] \
-            = self.ephysalign.scale_histology_regions(self.features[self.idx],
-                                                      self.track[self.idx])
+        self.history.add(self.ephysalign.feature_init, self.ephysalign.track_init)
         self.hist_data['colour'] = self.ephysalign.region_colour
-        self.scale_data['region'][self.idx], self.scale_data['scale'][self.idx] \
-            = self.ephysalign.get_scale_factor(self.hist_data['region'][self.idx])
         self.plot_histology(self.fig_hist)
         self.plot_scale_factor()
         if np.any(self.feature_prev):
@@ -1277,7 +1639,7 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
 
         if upload == QtGui.QMessageBox.Yes:
             upload_channels = self.loaddata.upload_data(self.xyz_channels)
-            self.loaddata.update_alignments(self.features[self.idx], self.track[self.idx])
+            self.loaddata.update_alignments(self.history.feature, self.history.track)
             self.prev_alignments = self.loaddata.get_previous_alignments()
             self.populate_lists(self.prev_alignments, self.align_list, self.align_combobox)
             self.loaddata.get_starting_alignment(0)
@@ -1312,7 +1674,7 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
                                             QtGui.QMessageBox.Yes | QtGui.QMessageBox.No)
 
         if upload == QtGui.QMessageBox.Yes:
-            self.loaddata.upload_data(self.features[self.idx], self.track[self.idx],
+            self.loaddata.upload_data(self.history.feature, self.history.track,
                                       self.xyz_channels)
             self.prev_alignments = self.loaddata.get_previous_alignments()
             self.populate_lists(self.prev_alignments, self.align_list, self.align_combobox)
@@ -1398,6 +1760,19 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
                 pop.showMinimized()
             self.activateWindow()
 
+    def preview_option_changed(self, state):
+        """
+        Triggered when live preview checkbox is toggled. When switched off the plots show the
+        current fit again
+        """
+        self.preview_timer.stop()
+        if state == 0 and self.hist_regions is not None:
+            self.plot_histology(self.fig_hist)
+            self.plot_scale_factor()
+            self.plot_channels()
+        else:
+            self.request_preview()
+
     def lin_fit_option_changed(self, state):
         if state == 0:
             self.lin_fit = False
@@ -1409,8 +1784,12 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
     def cluster_clicked(self, item, point):
         point_pos = point[0].pos()
         clust_idx = np.argwhere(self.data == point_pos.x())[0][0]
+        # Points of cluster scatter plots are in the order of the cluster statistics table of the
+        # current unit filter
+        stats = self.plotdata.get_cluster_stats()
+        clust = stats['clusters'][clust_idx]
 
-        autocorr = self.plotdata.get_autocorr(clust_idx)
+        autocorr = self.plotdata.get_autocorr(clust)
         autocorr_plot = pg.PlotItem()
         autocorr_plot.setXRange(min=np.min(self.plotdata.t_autocorr),
                                 max=np.max(self.plotdata.t_autocorr))
@@ -1422,7 +1801,7 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
                      brush=self.bar_colour)
         autocorr_plot.addItem(plot)
 
-        template_wf = self.plotdata.get_template_wf(clust_idx)
+        template_wf = self.plotdata.get_template_wf(clust)
         template_plot = pg.PlotItem()
         plot = pg.PlotCurveItem()
         template_plot.setXRange(min=np.min(self.plotdata.t_template),
@@ -1432,6 +1811,16 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         plot.setData(x=self.plotdata.t_template, y=template_wf, pen=self.kpen_solid)
         template_plot.addItem(plot)
 
+        # Summary of cluster from cluster statistics table
+        duration = self.plotdata.get_recording_duration()
+        clust_info = pg.LabelItem(
+            f"{stats['count'][clust_idx]} spikes, "
+            f"{stats['count'][clust_idx] / duration:.2f} Sp/s<br>"
+            f"Amplitude {stats['amps']['mean'][clust_idx] * 1e6:.1f} \u00B1 "
+            f"{stats['amps']['std'][clust_idx] * 1e6:.1f} uV<br>"
+            f"Depth {stats['depths']['percentiles'][clust_idx, 0]:.0f} - "
+            f"{stats['depths']['percentiles'][clust_idx, -1]:.0f} um", color='k')
+
         clust_layout = pg.GraphicsLayout()
         clust_layout.addItem(autocorr_plot, 0, 0)
         clust_layout.addItem(template_plot, 1, 0)
@@ -1439,8 +1828,9 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         self.clust_win = ephys_gui.PopupWindow(title=f'Cluster {clust_idx}')
         self.clust_win.closed.connect(self.popup_closed)
         self.clust_win.moved.connect(self.popup_moved)
-        self.clust_win.popup_widget.addItem(autocorr_plot, 0, 0)
-        self.clust_win.popup_widget.addItem(template_plot, 1, 0)
+        self.clust_win.popup_widget.addItem(clust_info, 0, 0)
+        self.clust_win.popup_widget.addItem(autocorr_plot, 1, 0)
+        self.clust_win.popup_widget.addItem(template_plot, 2, 0)
         self.cluster_popups.append(self.clust_win)
         self.activateWindow()
 
@@ -1494,14 +1884,20 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
             self.selected_line = []
             if type(items[0]) == pg.InfiniteLine:
                 self.selected_line = items[0]
-            elif (items[0] == self.fig_scale) & (type(items[1]) == pg.LinearRegionItem):
-                idx = np.where(self.scale_regions == items[1])[0][0]
-                self.fig_scale_ax.setLabel('Scale Factor = ' +
-                                           str(np.around(self.scale_factor[idx], 2)))
-            elif (items[0] == self.fig_hist) & (type(items[1]) == pg.LinearRegionItem):
-                self.selected_region = items[1]
-            elif (items[0] == self.fig_hist_ref) & (type(items[1]) == pg.LinearRegionItem):
-                self.selected_region = items[1]
+
+    def on_region_hovered(self, item, idx):
+        """
+        Triggered when mouse hovers over a brain region in the histology plots. Selects the region
+        so it can be described with the label button
+        """
+        self.selected_region = idx
+
+    def on_scale_region_hovered(self, item, idx):
+        """
+        Triggered when mouse hovers over a region in the scale factor plot, displays the scale
+        factor of the region
+        """
+        self.fig_scale_ax.setLabel('Scale Factor = ' + str(np.around(self.scale_factor[idx], 2)))
 
     def update_lines_features(self, line):
         """
@@ -1519,6 +1915,7 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
 
         self.points[line_idx][0].setData(x=[self.lines_features[line_idx][0].pos().y()],
                                          y=[self.lines_tracks[line_idx][0].pos().y()])
+        self.request_preview()
 
     def update_lines_track(self, line):
         """
@@ -1531,6 +1928,7 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
 
         self.points[line_idx][0].setData(x=[self.lines_features[line_idx][0].pos().y()],
                                          y=[self.lines_tracks[line_idx][0].pos().y()])
+        self.request_preview()
 
     def tip_line_moved(self):
         """
@@ -1634,8 +2032,8 @@ class MainWindow(QtWidgets.QMainWindow, ephys_gui.Setup):
         """
         Updates text boxes to indicate to user which move they are looking at
         """
-        self.idx_string.setText(f"Current Index = {self.current_idx}")
-        self.tot_idx_string.setText(f"Total Index = {self.total_idx}")
+        self.idx_string.setText(f"Current Index = {self.history.current}")
+        self.tot_idx_string.setText(f"Total Index = {self.history.total}")
 
 
 if __name__ == '__main__':
@@ -1644,10 +2042,15 @@ if __name__ == '__main__':
 
     parser = argparse.ArgumentParser(description='Offline vs online mode')
     parser.add_argument('-o', '--offline', default=False, required=False, help='Offline mode')
+    parser.add_argument('-m', '--low_memory', action='store_true', required=False,
+                        help='Memory map spike data and store plot data as float32')
+    parser.add_argument('-c', '--session_cache_mb', type=float, default=SESSION_CACHE_MB,
+                        required=False, help='Memory budget in MB of sessions kept in memory')
     args = parser.parse_args()
 
     app = QtWidgets.QApplication([])
-    mainapp = MainWindow(offline=args.offline)
+    mainapp = MainWindow(offline=args.offline, low_memory=args.low_memory,
+                         session_cache_mb=args.session_cache_mb)
     # mainapp = MainWindow(offline=True)
     mainapp.show()
     app.exec_()
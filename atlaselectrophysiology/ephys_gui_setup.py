@@ -3,6 +3,7 @@ import pyqtgraph as pg
 import pyqtgraph.exporters
 import numpy as np
 from random import randrange
+from atlaselectrophysiology.plot_data import FREQ_BANDS, band_name
 pg.setConfigOption('background', 'w')
 pg.setConfigOption('foreground', 'k')
 
@@ -54,26 +55,29 @@ class Setup():
         # IMAGE PLOTS MENU BAR
         # Define all 2D scatter/ image plot options
         scatter_drift = QtGui.QAction('Amplitude', self, checkable=True, checked=False)
-        scatter_drift.triggered.connect(lambda: self.plot_scatter(self.scat_drift_data))
+        scatter_drift.triggered.connect(lambda: self.request_plot(
+            'scat_drift_data', self.plot_scatter))
         scatter_fr = QtGui.QAction('Cluster Amp vs Depth vs FR', self, checkable=True,
                                    checked=False)
-        scatter_fr.triggered.connect(lambda: self.plot_scatter(self.scat_fr_data))
+        scatter_fr.triggered.connect(lambda: self.request_plot('scat_fr_data', self.plot_scatter))
         scatter_p2t = QtGui.QAction('Cluster Amp vs Depth vs Duration', self, checkable=True,
                                     checked=False)
-        scatter_p2t.triggered.connect(lambda: self.plot_scatter(self.scat_p2t_data))
+        scatter_p2t.triggered.connect(lambda: self.request_plot(
+            'scat_p2t_data', self.plot_scatter))
         scatter_amp = QtGui.QAction('Cluster FR vs Depth vs Amp', self, checkable=True,
                                     checked=False)
-        scatter_amp.triggered.connect(lambda: self.plot_scatter(self.scat_amp_data))
+        scatter_amp.triggered.connect(lambda: self.request_plot(
+            'scat_amp_data', self.plot_scatter))
         img_fr = QtGui.QAction('Firing Rate', self, checkable=True, checked=True)
-        img_fr.triggered.connect(lambda: self.plot_image(self.img_fr_data))
+        img_fr.triggered.connect(lambda: self.request_plot('img_fr_data', self.plot_image))
         img_corr = QtGui.QAction('Correlation', self, checkable=True, checked=False)
-        img_corr.triggered.connect(lambda: self.plot_image(self.img_corr_data))
+        img_corr.triggered.connect(lambda: self.request_plot('img_corr_data', self.plot_image))
         img_rmsAP = QtGui.QAction('rms AP', self, checkable=True, checked=False)
-        img_rmsAP.triggered.connect(lambda: self.plot_image(self.img_rms_APdata))
+        img_rmsAP.triggered.connect(lambda: self.request_plot('img_rms_APdata', self.plot_image))
         img_rmsLFP = QtGui.QAction('rms LFP', self, checkable=True, checked=False)
-        img_rmsLFP.triggered.connect(lambda: self.plot_image(self.img_rms_LFPdata))
+        img_rmsLFP.triggered.connect(lambda: self.request_plot('img_rms_LFPdata', self.plot_image))
         img_LFP = QtGui.QAction('LFP Spectrum', self, checkable=True, checked=False)
-        img_LFP.triggered.connect(lambda: self.plot_image(self.img_lfp_data))
+        img_LFP.triggered.connect(lambda: self.request_plot('img_lfp_data', self.plot_image))
         # Initialise with firing rate 2D plot
         self.img_init = img_fr
 
@@ -105,9 +109,9 @@ class Setup():
         # LINE PLOTS MENU BAR
         # Define all 1D line plot options
         line_fr = QtGui.QAction('Firing Rate', self, checkable=True, checked=True)
-        line_fr.triggered.connect(lambda: self.plot_line(self.line_fr_data))
+        line_fr.triggered.connect(lambda: self.request_plot('line_fr_data', self.plot_line))
         line_amp = QtGui.QAction('Amplitude', self, checkable=True, checked=False)
-        line_amp.triggered.connect(lambda: self.plot_line(self.line_amp_data))
+        line_amp.triggered.connect(lambda: self.request_plot('line_amp_data', self.plot_line))
         # Initialise with firing rate 1D plot
         self.line_init = line_fr
         # Add menu bar for 1D line plot options
@@ -125,9 +129,11 @@ class Setup():
         # Define all 2D probe plot options
         # In two stages 1) RMS plots manually, 2) frequency plots in for loop
         probe_rmsAP = QtGui.QAction('rms AP', self, checkable=True, checked=True)
-        probe_rmsAP.triggered.connect(lambda: self.plot_probe(self.probe_rms_APdata))
+        probe_rmsAP.triggered.connect(lambda: self.request_plot(
+            'probe_rms_APdata', self.plot_probe))
         probe_rmsLFP = QtGui.QAction('rms LFP', self, checkable=True, checked=False)
-        probe_rmsLFP.triggered.connect(lambda: self.plot_probe(self.probe_rms_LFPdata))
+        probe_rmsLFP.triggered.connect(lambda: self.request_plot(
+            'probe_rms_LFPdata', self.plot_probe))
         # Initialise with rms of AP probe plot
         self.probe_init = probe_rmsAP
 
@@ -141,16 +147,22 @@ class Setup():
         probe_options.addAction(probe_rmsLFP)
         probe_options_group.addAction(probe_rmsLFP)
 
-        # Add the different frequency band options in a loop. These bands must be the same as
-        # defined in plot_data
-        freq_bands = np.vstack(([0, 4], [4, 10], [10, 30], [30, 80], [80, 200]))
-        for iF, freq in enumerate(freq_bands):
-            band = f"{freq[0]} - {freq[1]} Hz"
+        # Add the default frequency band options in a loop, data for these bands is computed
+        # along with the LFP spectrum
+        for freq in FREQ_BANDS:
+            band = band_name(freq)
             probe = QtGui.QAction(band, self, checkable=True, checked=False)
-            probe.triggered.connect(lambda checked, item=band: self.plot_probe(
-                                    self.probe_lfp_data[item]))
+            probe.triggered.connect(lambda checked, item=band: self.request_plot(
+                                    'probe_lfp_data', self.plot_probe, key=item))
             probe_options.addAction(probe)
             probe_options_group.addAction(probe)
+        # Option to add a frequency band specified by the user
+        self.probe_band_separator = probe_options.addSeparator()
+        probe_add_band = QtGui.QAction('Add Frequency Band...', self)
+        probe_add_band.triggered.connect(self.add_band_pressed)
+        probe_options.addAction(probe_add_band)
+        self.probe_options = probe_options
+        self.probe_options_group = probe_options_group
 
         # SLICE PLOTS MENU BAR
         # Define all coronal slice plot options
@@ -351,6 +363,21 @@ class Setup():
             nearby_info.triggered.connect(self.display_nearby_sessions)
             info_options.addAction(nearby_info)
 
+    def add_band_option(self, freq):
+        """
+        Add option to probe plots menu to display lfp power in a frequency band
+        :param freq: limits of band [min, max] in Hz
+        :type freq: list
+        :return: menu option
+        :type: QtGui.QAction
+        """
+        probe = QtGui.QAction(band_name(freq), self, checkable=True, checked=False)
+        probe.triggered.connect(lambda checked, item=tuple(freq): self.request_plot(
+                                'probe_lfp_band', self.plot_probe, args=item))
+        self.probe_options.insertAction(self.probe_band_separator, probe)
+        self.probe_options_group.addAction(probe)
+        return probe
+
     def init_interaction_features(self):
         """
         Create all interaction widgets that will be added to the GUI
@@ -541,6 +568,7 @@ class Setup():
         self.set_axis(self.fig_img, 'bottom')
         self.fig_data_ax = self.set_axis(self.fig_img, 'left',
                                          label='Distance from probe tip (uV)')
+        self.fig_img.sigRangeChanged.connect(self.on_img_range_changed)
 
         self.fig_img_cb = pg.PlotItem()
         self.fig_img_cb.setMaximumHeight(70)
@@ -667,6 +695,18 @@ class Setup():
         self.fig_slice_layout.layout.setColumnStretchFactor(1, 1)
         self.fig_slice_area.addItem(self.fig_slice_layout)
         self.slice_item = self.fig_slice_hist_alt
+        # Items on the slice figure are persistent and updated with the data of each session
+        self.slice_img = pg.ImageItem()
+        self.slice_img.setVisible(False)
+        self.fig_slice_hist.setImageItem(self.slice_img)
+        self.slice_label_img = pg.ImageItem()
+        self.slice_label_img.setVisible(False)
+        self.traj_line = pg.PlotCurveItem(pen=self.kpen_solid)
+        self.slice_chns = pg.ScatterPlotItem(pen='r', brush='r')
+        # Lines perpendicular to the track at each reference point, added as needed
+        self.slice_lines = []
+        for item in [self.slice_img, self.slice_label_img, self.traj_line, self.slice_chns]:
+            self.fig_slice.addItem(item)
 
         # Figure to show fit and offset applied by user
         self.fig_fit = pg.PlotWidget(background='w')
@@ -690,12 +730,16 @@ class Setup():
         self.lin_fit_option = QtGui.QCheckBox('Linear fit', self.fig_fit)
         self.lin_fit_option.setChecked(True)
         self.lin_fit_option.stateChanged.connect(self.lin_fit_option_changed)
+        self.preview_option = QtGui.QCheckBox('Live preview', self.fig_fit)
+        self.preview_option.setChecked(True)
+        self.preview_option.stateChanged.connect(self.preview_option_changed)
         self.on_fig_size_changed()
 
     def on_fig_size_changed(self):
         # fig_width = self.fig_fit_exporter.getTargetRect().width()
         # fig_height = self.fig_fit_exporter.getTargetRect().width()
         self.lin_fit_option.move(70, 10)
+        self.preview_option.move(70, 30)
 
 
 class PopupWindow(QtGui.QMainWindow):
@@ -723,3 +767,74 @@ class PopupWindow(QtGui.QMainWindow):
 
     def leaveEvent(self, event):
         self.moved.emit()
+
+
+class RegionsItem(pg.GraphicsObject):
+    """
+    Draws contiguous regions along the y axis, e.g brain regions along the probe track, as a single
+    item spanning the width of the view. Regions are updated in place with setData, so no items
+    are created or removed when the boundaries change
+    """
+    # Emitted with the item and index of region when the mouse hovers over a region
+    sigRegionHovered = QtCore.pyqtSignal(object, int)
+
+    def __init__(self, pen=None):
+        """
+        :param pen: pen used to draw boundaries between regions, if None boundaries aren't drawn
+        """
+        super(RegionsItem, self).__init__()
+        self.pen = None if pen is None else pg.mkPen(pen)
+        self.regions = np.empty((0, 2))
+        self.brushes = []
+
+    def setData(self, regions, colours):
+        """
+        :param regions: lower and upper bound of each region, np.array((n_regions, 2))
+        :type regions: np.array
+        :param colours: colour of each region
+        :type colours: list of QColor
+        """
+        self.prepareGeometryChange()
+        self.regions = np.sort(np.asarray(regions, dtype=float), axis=1)
+        self.brushes = [pg.mkBrush(col) for col in colours]
+        self.update()
+
+    def region_at(self, y):
+        """
+        Index of region at y position, None if y is outside of all regions
+        """
+        idx = np.where((self.regions[:, 0] <= y) & (self.regions[:, 1] > y))[0]
+        return idx[0] if idx.size else None
+
+    def dataBounds(self, axis, frac=1.0, orthoRange=None):
+        # Regions don't constrain the x range of the view as they span its width
+        if axis == 0 or self.regions.size == 0:
+            return None
+        return np.min(self.regions), np.max(self.regions)
+
+    def viewRangeChanged(self):
+        # Regions span the width of the view
+        self.prepareGeometryChange()
+
+    def boundingRect(self):
+        view = self.viewRect()
+        if view is None or self.regions.size == 0:
+            return QtCore.QRectF()
+        ymin, ymax = np.min(self.regions), np.max(self.regions)
+        return QtCore.QRectF(view.left(), ymin, view.width(), ymax - ymin)
+
+    def paint(self, p, *args):
+        rect = self.boundingRect()
+        for (y0, y1), brush in zip(self.regions, self.brushes):
+            p.fillRect(QtCore.QRectF(rect.left(), y0, rect.width(), y1 - y0), brush)
+        if self.pen is not None:
+            p.setPen(self.pen)
+            p.drawLines([QtCore.QLineF(rect.left(), y, rect.right(), y)
+                         for y in np.unique(self.regions)])
+
+    def hoverEvent(self, ev):
+        if ev.isExit():
+            return
+        idx = self.region_at(ev.pos().y())
+        if idx is not None:
+            self.sigRegionHovered.emit(self, idx)
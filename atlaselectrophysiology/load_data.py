@@ -8,16 +8,36 @@ from oneibl.one import ONE
 from pathlib import Path
 import alf.io
 import glob
-from atlaselectrophysiology.load_histology import download_histology_data, tif2nrrd
+from atlaselectrophysiology.load_histology import (download_histology_data, tif2nrrd,
+                                                   get_histology_slice)
+from atlaselectrophysiology.atlas_cache import get_atlas
 
 ONE_BASE_URL = "https://alyx.internationalbrainlab.org"
+# Dataset types downloaded for each session
+DATASET_TYPES = [
+    'spikes.depths',
+    'spikes.amps',
+    'spikes.times',
+    'spikes.clusters',
+    'channels.localCoordinates',
+    'channels.rawInd',
+    'clusters.metrics',
+    'clusters.peakToTrough',
+    'clusters.waveforms',
+    'clusters.channels',
+    '_iblqc_ephysTimeRms.rms',
+    '_iblqc_ephysTimeRms.timestamps',
+    '_iblqc_ephysSpectralDensity.freqs',
+    '_iblqc_ephysSpectralDensity.power',
+    '_iblqc_ephysSpectralDensity.amps'
+]
 
 
 class LoadData:
     def __init__(self, one=None, brain_atlas=None, testing=False, probe_id=None):
         from ibllib.qc.alignment_qc import AlignmentQC
         self.one = one or ONE(base_url=ONE_BASE_URL)
-        self.brain_atlas = brain_atlas or atlas.AllenAtlas(25)
+        self.brain_atlas = brain_atlas or get_atlas(25)
 
         if testing:
             self.probe_id = probe_id
@@ -113,6 +133,28 @@ class LoadData:
 
         return self.get_previous_alignments()
 
+    def get_info_from_insertion(self, probe_id):
+        """
+        Reads in all information about the session of a probe insertion, equivalent to get_info
+        without having to find the session from the subject lists
+        :param probe_id: id of probe insertion
+        :type probe_id: str
+        :return prev_align: list of previous alignments associated with session, if none just has
+        option for 'original' alignment
+        :type: list of strings
+        """
+        insertion = self.one.alyx.rest('insertions', 'read', id=probe_id)
+        sess = self.one.alyx.rest('sessions', 'read', id=insertion['session'])
+        self.n_sess = sess['number']
+        self.date = sess['start_time'][:10]
+        self.probe_label = insertion['name']
+        self.probe_id = probe_id
+        self.lab = sess['lab']
+        self.eid = insertion['session']
+        self.subj = sess['subject']
+
+        return self.get_previous_alignments()
+
     def get_previous_alignments(self):
 
         # Looks for any previous alignments
@@ -195,30 +237,12 @@ class LoadData:
         :return sess_notes: user notes associated with session
         :type: str
         """
-        dtypes = [
-            'spikes.depths',
-            'spikes.amps',
-            'spikes.times',
-            'spikes.clusters',
-            'channels.localCoordinates',
-            'channels.rawInd',
-            'clusters.metrics',
-            'clusters.peakToTrough',
-            'clusters.waveforms',
-            'clusters.channels',
-            '_iblqc_ephysTimeRms.rms',
-            '_iblqc_ephysTimeRms.timestamps',
-            '_iblqc_ephysSpectralDensity.freqs',
-            '_iblqc_ephysSpectralDensity.power',
-            '_iblqc_ephysSpectralDensity.amps'
-        ]
-
         print(self.subj)
         print(self.probe_label)
         print(self.date)
         print(self.eid)
 
-        _ = self.one.load(self.eid, dataset_types=dtypes, download_only=True)
+        _ = self.one.load(self.eid, dataset_types=DATASET_TYPES, download_only=True)
         self.sess_path = self.one.path_from_eid(self.eid)
 
         alf_path = Path(self.sess_path, 'alf', self.probe_label)
@@ -238,6 +262,24 @@ class LoadData:
 
         return alf_path, ephys_path, self.chn_depths, sess_notes
 
+    def download_data(self, sess):
+        """
+        Download all data associated with a session without selecting it, so that a session can
+        be prepared in the background while another session is displayed
+        :param sess: trajectory of session, one of self.sess
+        :type sess: dict
+        :return alf_path: path to folder containing alf format files
+        :type: Path
+        :return ephys_path: path to folder containing ephys files
+        :type: Path
+        """
+        eid = sess['session']['id']
+        _ = self.one.load(eid, dataset_types=DATASET_TYPES, download_only=True)
+        sess_path = self.one.path_from_eid(eid)
+
+        return (Path(sess_path, 'alf', sess['probe_name']),
+                Path(sess_path, 'raw_ephys_data', sess['probe_name']))
+
     def get_allen_csv(self):
         """
         Load in allen csv file
@@ -264,7 +306,13 @@ class LoadData:
 
         return self.xyz_picks
 
-    def get_slice_images(self, xyz_channels):
+    def get_histology_paths(self):
+        """
+        Find the red and green histology volumes of the subject, they are downloaded if they are
+        not available locally
+        :return: paths to red and green histology volumes in nrrd format, None if not found
+        :type: tuple of Path
+        """
         # First see if the histology file exists before attempting to connect with FlatIron and
         # download
         hist_dir = Path(self.sess_path.parent.parent, 'histology')
@@ -293,6 +341,20 @@ class LoadData:
                 hist_path_gr = files[0]
                 hist_path_rd = files[1]
 
+        return hist_path_rd, hist_path_gr
+
+    def get_slice_images(self, xyz_channels, hist_paths=None):
+        """
+        Slices through the histology volumes, the atlas image and the atlas labels along the track
+        :param xyz_channels: coordinates of points along the track
+        :type xyz_channels: np.array
+        :param hist_paths: paths to red and green histology volumes, as returned by
+                           get_histology_paths, found if not given
+        :type hist_paths: tuple of Path
+        :return: slice images
+        :type: dict
+        """
+        hist_path_rd, hist_path_gr = hist_paths or self.get_histology_paths()
         index = self.brain_atlas.bc.xyz2i(xyz_channels)[:, self.brain_atlas.xyz2dims]
         ccf_slice = self.brain_atlas.image[index[:, 0], :, index[:, 2]]
         ccf_slice = np.swapaxes(ccf_slice, 0, 1)
@@ -305,17 +367,13 @@ class LoadData:
         height = [self.brain_atlas.bc.i2z(index[0, 2]), self.brain_atlas.bc.i2z(index[-1, 2])]
 
         if hist_path_rd:
-            hist_atlas_rd = atlas.AllenAtlas(hist_path=hist_path_rd)
-            hist_slice_rd = hist_atlas_rd.image[index[:, 0], :, index[:, 2]]
-            hist_slice_rd = np.swapaxes(hist_slice_rd, 0, 1)
+            hist_slice_rd = get_histology_slice(hist_path_rd, index, self.brain_atlas)
         else:
             print('Could not find red histology image for this subject')
             hist_slice_rd = np.copy(ccf_slice)
 
         if hist_path_gr:
-            hist_atlas_gr = atlas.AllenAtlas(hist_path=hist_path_gr)
-            hist_slice_gr = hist_atlas_gr.image[index[:, 0], :, index[:, 2]]
-            hist_slice_gr = np.swapaxes(hist_slice_gr, 0, 1)
+            hist_slice_gr = get_histology_slice(hist_path_gr, index, self.brain_atlas)
         else:
             print('Could not find green histology image for this subject')
             hist_slice_gr = np.copy(ccf_slice)
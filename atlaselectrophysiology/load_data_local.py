@@ -5,6 +5,8 @@ from pathlib import Path
 import alf.io
 import glob
 import json
+from atlaselectrophysiology.load_histology import get_histology_slice
+from atlaselectrophysiology.atlas_cache import get_atlas
 
 # brain_atlas = atlas.AllenAtlas(25)
 
@@ -14,7 +16,7 @@ class LoadDataLocal:
         self.folder_path = []
         self.chn_coords = []
         self.sess_path = []
-        self.brain_atlas = atlas.AllenAtlas(25)
+        self.brain_atlas = get_atlas(25)
 
     def get_info(self, folder_path):
         """
@@ -89,22 +91,38 @@ class LoadDataLocal:
 
         return xyz_picks
 
-    def get_slice_images(self, xyz_channels):
-        # First see if the histology file exists before attempting to connect with FlatIron and
-        # download
-
+    def get_histology_paths(self):
+        """
+        Find the red and green histology volumes in the selected folder
+        :return: paths to red and green histology volumes in nrrd format, None if not found
+        :type: tuple of Path
+        """
         path_to_rd_image = glob.glob(str(self.folder_path) + '/*RD.nrrd')
         if path_to_rd_image:
             hist_path_rd = Path(path_to_rd_image[0])
         else:
-            hist_path_rd = []
+            hist_path_rd = None
 
         path_to_gr_image = glob.glob(str(self.folder_path) + '/*GR.nrrd')
         if path_to_gr_image:
             hist_path_gr = Path(path_to_gr_image[0])
         else:
-            hist_path_gr = []
+            hist_path_gr = None
 
+        return hist_path_rd, hist_path_gr
+
+    def get_slice_images(self, xyz_channels, hist_paths=None):
+        """
+        Slices through the histology volumes, the atlas image and the atlas labels along the track
+        :param xyz_channels: coordinates of points along the track
+        :type xyz_channels: np.array
+        :param hist_paths: paths to red and green histology volumes, as returned by
+                           get_histology_paths, found if not given
+        :type hist_paths: tuple of Path
+        :return: slice images
+        :type: dict
+        """
+        hist_path_rd, hist_path_gr = hist_paths or self.get_histology_paths()
         index = self.brain_atlas.bc.xyz2i(xyz_channels)[:, self.brain_atlas.xyz2dims]
         ccf_slice = self.brain_atlas.image[index[:, 0], :, index[:, 2]]
         ccf_slice = np.swapaxes(ccf_slice, 0, 1)
@@ -117,17 +135,13 @@ class LoadDataLocal:
         height = [self.brain_atlas.bc.i2z(index[0, 2]), self.brain_atlas.bc.i2z(index[-1, 2])]
 
         if hist_path_rd:
-            hist_atlas_rd = atlas.AllenAtlas(hist_path=hist_path_rd)
-            hist_slice_rd = hist_atlas_rd.image[index[:, 0], :, index[:, 2]]
-            hist_slice_rd = np.swapaxes(hist_slice_rd, 0, 1)
+            hist_slice_rd = get_histology_slice(hist_path_rd, index, self.brain_atlas)
         else:
             print('Could not find red histology image for this subject')
             hist_slice_rd = np.copy(ccf_slice)
 
         if hist_path_gr:
-            hist_atlas_gr = atlas.AllenAtlas(hist_path=hist_path_gr)
-            hist_slice_gr = hist_atlas_gr.image[index[:, 0], :, index[:, 2]]
-            hist_slice_gr = np.swapaxes(hist_slice_gr, 0, 1)
+            hist_slice_gr = get_histology_slice(hist_path_gr, index, self.brain_atlas)
         else:
             print('Could not find green histology image for this subject')
             hist_slice_gr = np.copy(ccf_slice)
@@ -2,6 +2,9 @@
 from pathlib import Path
 import requests
 import re
+import numpy as np
+import nrrd
+import ibllib.atlas as atlas
 from ibllib.io import params
 from oneibl.webclient import http_download_file
 import SimpleITK as sitk
@@ -79,3 +82,48 @@ def tif2nrrd(path_to_image):
         writer.Execute(new_img)
 
     return path_to_nrrd
+
+
+def nrrd2npy(path_to_nrrd, brain_atlas):
+    """
+    Convert histology volume to a npy file with the same ordering of axes as the image of the
+    brain atlas, image[iap, iml, idv], so that it can be memory mapped
+    :param path_to_nrrd: path to histology volume in nrrd format
+    :type path_to_nrrd: Path
+    :param brain_atlas: atlas with the same resolution as the histology volume
+    :type brain_atlas: AllenAtlas
+    :return: path to histology volume in npy format
+    :type: Path
+    """
+    path_to_npy = Path(path_to_nrrd.parent, path_to_nrrd.stem + '.npy')
+    if not path_to_npy.exists():
+        volume, _ = nrrd.read(str(path_to_nrrd), index_order='C')  # ml, dv, ap
+        volume = np.transpose(volume, (2, 0, 1))
+        if volume.shape != brain_atlas.image.shape:
+            # Let the atlas reorder the volume if its ordering differs from the one above
+            volume = atlas.AllenAtlas(hist_path=path_to_nrrd).image
+        # Write to a temporary file so an interrupted conversion is not mistaken for a volume
+        path_to_tmp = Path(path_to_npy.parent, path_to_npy.name + '.part')
+        with open(path_to_tmp, 'wb') as f:
+            np.save(f, volume)
+        path_to_tmp.replace(path_to_npy)
+
+    return path_to_npy
+
+
+def get_histology_slice(path_to_nrrd, index, brain_atlas):
+    """
+    Get slice through histology volume. The volume is memory mapped so only the voxels of the
+    slice are read from disk
+    :param path_to_nrrd: path to histology volume in nrrd format
+    :type path_to_nrrd: Path
+    :param index: ap, ml and dv indices of the points along the track
+    :type index: np.array((n_points, 3))
+    :param brain_atlas: atlas with the same resolution as the histology volume
+    :type brain_atlas: AllenAtlas
+    :return: slice image
+    :type: np.array((n_ml, n_points))
+    """
+    volume = np.load(nrrd2npy(Path(path_to_nrrd), brain_atlas), mmap_mode='r')
+    hist_slice = volume[index[:, 0], :, index[:, 2]]
+    return np.swapaxes(hist_slice, 0, 1)
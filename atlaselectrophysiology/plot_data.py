@@ -1,38 +1,551 @@
 from matplotlib import cm
 from pathlib import Path
+import contextlib
+import functools
+import threading
 import numpy as np
 import alf.io
-from brainbox.processing import bincount2D
-from brainbox.population import xcorr
-import scipy
-from PyQt5 import QtGui
+from brainbox.core import Bunch
+from atlaselectrophysiology.derived_cache import DerivedCache, get_cache_path
 
 N_BNK = 4
 BNK_SIZE = 10
 AUTOCORR_BIN_SIZE = 0.25 / 1000
 AUTOCORR_WIN_SIZE = 10 / 1000
 FS = 30000
+# Default frequency bands in which to show LFP power on probe, in Hz
+FREQ_BANDS = np.vstack(([0, 4], [4, 10], [10, 30], [30, 80], [80, 200]))
+# Maximum number of points drawn at once in spike scatter plots
+MAX_SCATTER_POINTS = 100000
+# Number of spikes processed at once when computing autocorrelograms
+AUTOCORR_CHUNK_SIZE = 2 ** 22
+# Number of spikes processed at once when computing the correlation image
+CORR_CHUNK_SIZE = 2 ** 14
+# Number of spikes read at once when streaming spike data
+SPIKE_CHUNK_SIZE = 2 ** 22
+# Percentiles of spike depths, amplitudes and times computed for each cluster
+CLUSTER_PERCENTILES = np.array([10, 50, 90])
+# Number of time bins of the firing rate image, about the width of the image in pixels
+FR_IMG_N_BINS = 2000
+# Finest time bin of the firing rate image in s, and depth bin in um
+FR_IMG_MIN_T_BIN = 0.01
+FR_IMG_D_BIN = 5
+# Unit filters available in the GUI
+UNIT_FILTERS = ['all', 'good', 'mua']
+# Files from which cached plot data is derived
+CACHE_SOURCES = ['spikes.*', 'clusters.*', 'channels.*', '_iblqc_*']
 np.seterr(divide='ignore', invalid='ignore')
 
 
+def cached_product(filtered=True, disk=True):
+    """
+    Decorator for PlotData methods that compute plot data. Products are computed the first time
+    they are requested and memoized, per method, method arguments and, if filtered is True, per
+    unit filter. If disk is True products are also stored in the on disk cache.
+    :param filtered: whether output depends on the units selected with PlotData.filter_units
+    :type filtered: bool
+    :param disk: whether to store product in the on disk cache
+    :type disk: bool
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args):
+            name = '_'.join([func.__name__, *map(str, args)] +
+                            ([self.filter_type] if filtered else []))
+            use_cache = disk and self.cache is not None
+            # Only compute each product once if it is requested from several threads
+            with self._product_locks.setdefault(name, threading.Lock()):
+                product = self.products.get(name)
+                if product is None and use_cache:
+                    product = self.cache.load(name)
+                if product is None:
+                    data = func(self, *args)
+                    product = {'data': data}
+                    if use_cache:
+                        self.cache.save(name, product)
+                self.products[name] = product
+            return product['data']
+        return wrapper
+    return decorator
+
+
+def get_scatter_lod(lod, xrange, yrange, max_points=MAX_SCATTER_POINTS):
+    """
+    Finds the spikes to display in a scatter plot for the current view range. Chooses the finest
+    level of the level of detail pyramid for which the number of spikes within the view range
+    does not exceed max_points. Spike times must be sorted
+    :param lod: level of detail pyramid, as returned in 'lod' key of get_depth_data_scatter
+    :type lod: dict
+    :param xrange: time range of view [min, max]
+    :type xrange: list or np.array
+    :param yrange: depth range of view [min, max]
+    :type yrange: list or np.array
+    :param max_points: maximum number of spikes to return
+    :type max_points: int
+    :return idx: index of spikes to display
+    :type idx: np.array
+    """
+    strides = lod['strides']
+    i0, i1 = np.searchsorted(lod['x'], xrange)
+    # Estimate proportion of spikes in time window that lie within the depth range from the
+    # coarsest level
+    coarse = slice(int(np.ceil(i0 / strides[-1])) * strides[-1], i1, strides[-1])
+    coarse_y = lod['y'][coarse]
+    frac = np.mean((coarse_y >= yrange[0]) & (coarse_y <= yrange[1])) if coarse_y.size else 1
+    # Limit both the number of spikes displayed and the number of spikes scanned
+    n_view = max((i1 - i0) * frac / max_points, (i1 - i0) / (16 * max_points))
+    stride = strides[min(np.searchsorted(strides, n_view), strides.size - 1)]
+    # Align window to the level so spikes shown don't change when panning
+    idx = np.arange(int(np.ceil(i0 / stride)) * stride, i1, stride)
+    y = lod['y'][idx]
+    idx = idx[(y >= yrange[0]) & (y <= yrange[1])]
+    if idx.size > max_points:
+        idx = idx[::int(np.ceil(idx.size / max_points))]
+
+    return idx
+
+
+def load_object_mmap(alf_path, obj):
+    """
+    Load an alf object, .npy files are memory mapped read only rather than read into memory
+    :param alf_path: path to alf folder
+    :type alf_path: Path
+    :param obj: name of alf object e.g 'spikes'
+    :type obj: str
+    :return: alf object
+    :type: Bunch
+    """
+    out = Bunch()
+    for file in sorted(Path(alf_path).glob(f'{obj}.*')):
+        attr = file.name.split('.')[1]
+        if file.suffix == '.npy':
+            out[attr] = np.load(file, mmap_mode='r')
+        else:
+            out[attr] = alf.io.load_file_content(file)
+    return out
+
+
+def fr_img_t_bin(duration, n_bins=FR_IMG_N_BINS, min_bin=FR_IMG_MIN_T_BIN):
+    """
+    Time bin of firing rate image, the smallest of 1, 2 or 5 x 10^n s for which duration is
+    split into at most n_bins bins. Rounding means small changes in duration don't change the bin
+    :param duration: duration of image in s
+    :type duration: float
+    :param n_bins: maximum number of time bins
+    :type n_bins: int
+    :param min_bin: smallest time bin
+    :type min_bin: float
+    :return: time bin in s
+    :type: float
+    """
+    t_bin = max(duration / n_bins, min_bin)
+    exp = 10 ** np.floor(np.log10(t_bin))
+    return next(mult * exp for mult in [1, 2, 5, 10] if mult * exp >= t_bin * (1 - 1e-9))
+
+
+def band_name(freq):
+    """
+    Name of frequency band e.g '4 - 10 Hz'
+    :param freq: limits of band [min, max] in Hz
+    :type freq: list or np.array
+    :return: name of band
+    :type: str
+    """
+    return f"{freq[0]:g} - {freq[1]:g} Hz"
+
+
+def average_chn_depth(data, chn_depth, chn_depth_eq):
+    """
+    Average values of channels that are at the same depth on the probe
+    :param data: values for each channel, shape (n_samples, n_channels)
+    :type data: np.array
+    :param chn_depth: index of first channel at each depth
+    :type chn_depth: np.array
+    :param chn_depth_eq: index of second channel at each depth, same as chn_depth if only one
+                         channel at that depth
+    :type chn_depth_eq: np.array
+    :return: values at each depth, shape (n_samples, n_depths)
+    :type: np.array
+    """
+    return (data[:, chn_depth] + data[:, chn_depth_eq]) / 2
+
+
+def median_subtract(data):
+    """
+    Subtract the median of each sample to remove bands, the average median is added back so
+    values make sense
+    :param data: shape (n_samples, n_depths)
+    :type data: np.array
+    :return: median subtracted data
+    :type: np.array
+    """
+    median = np.median(data, axis=1)
+    return data - median[:, np.newaxis] + np.mean(median)
+
+
+def chunk_arrays(*arrays, chunk_size=SPIKE_CHUNK_SIZE):
+    """
+    Split arrays into chunks, e.g to pass in memory arrays to functions that take chunks of spikes
+    :param arrays: arrays of the same size
+    :type arrays: np.array
+    :param chunk_size: number of elements in each chunk
+    :type chunk_size: int
+    :return: generator of tuples of np.array, one per array
+    """
+    for start in range(0, arrays[0].size, chunk_size):
+        yield tuple(arr[start:start + chunk_size] for arr in arrays)
+
+
+def bincount2D_chunked(chunks, xbin, ybin, xlim, ylim, weights=False):
+    """
+    Chunked equivalent of brainbox.processing.bincount2D with bin sizes. Counts, and sums of
+    weights, are accumulated over chunks of points so that arrays larger than memory can be binned
+    by streaming them from memory mapped files. Points outside of the limits are ignored
+    :param chunks: iterable of tuples (x, y) or, if weights, (x, y, weights) of np.array
+    :param xbin: size of x bins
+    :type xbin: float
+    :param ybin: size of y bins
+    :type ybin: float
+    :param xlim: x limits [min, max]
+    :type xlim: list
+    :param ylim: y limits [min, max]
+    :type ylim: list
+    :param weights: whether chunks contain weights
+    :type weights: bool
+    :return counts: number of points in each bin, shape (ny, nx)
+    :type counts: np.array
+    :return sums: sum of weights in each bin, shape (ny, nx), None if not weights
+    :type sums: np.array
+    :return xscale: x of each x bin
+    :type xscale: np.array
+    :return yscale: y of each y bin
+    :type yscale: np.array
+    """
+    # Same bins as bincount2D
+    xscale = np.arange(xlim[0], xlim[1] + xbin / 2, xbin)
+    yscale = np.arange(ylim[0], ylim[1] + ybin / 2, ybin)
+    nx, ny = xscale.size, yscale.size
+    counts = np.zeros(ny * nx)
+    sums = np.zeros(ny * nx) if weights else None
+    for chunk in chunks:
+        xind = np.floor((chunk[0] - xlim[0]) / xbin)
+        yind = np.floor((chunk[1] - ylim[0]) / ybin)
+        # Comparisons with nan are False so points with nan coordinates are also removed
+        valid = (xind >= 0) & (xind < nx) & (yind >= 0) & (yind < ny)
+        ind = (yind[valid] * nx + xind[valid]).astype(np.int64)
+        counts += np.bincount(ind, minlength=ny * nx)
+        if weights:
+            sums += np.bincount(ind, weights=chunk[2][valid], minlength=ny * nx)
+
+    return (counts.reshape(ny, nx), None if sums is None else sums.reshape(ny, nx),
+            xscale, yscale)
+
+
+def binned_corrcoef(chunks, t_bin, d_bin, tlim, ylim, chunk_size=CORR_CHUNK_SIZE):
+    """
+    Correlation coefficients between the spike counts in different depth bins, equivalent to
+    np.corrcoef of the count matrix returned by bincount2D. Counts are accumulated over chunks of
+    spikes as sums and cross products per depth bin, so the full count matrix is never held in
+    memory. Spike times must be sorted
+    :param chunks: iterable of tuples (times, depths) of np.array, e.g from chunk_arrays
+    :param t_bin: size of time bins
+    :type t_bin: float
+    :param d_bin: size of depth bins
+    :type d_bin: float
+    :param tlim: time limits [min, max], times of first and last spike
+    :type tlim: list
+    :param ylim: depth limits [min, max]
+    :type ylim: list
+    :param chunk_size: number of spikes to bin at once, chunks are split into chunks of this size
+    :type chunk_size: int
+    :return corr: correlation coefficients, shape (n_depths, n_depths)
+    :type corr: np.array
+    :return depth_scale: depth of each depth bin
+    :type depth_scale: np.array
+    """
+    # Same bins as bincount2D
+    t_min = tlim[0]
+    n_times = np.arange(t_min, tlim[1] + t_bin / 2, t_bin).size
+    depth_scale = np.arange(ylim[0], ylim[1] + d_bin / 2, d_bin)
+    n_depths = depth_scale.size
+
+    sums = np.zeros(n_depths)
+    cross = np.zeros((n_depths, n_depths))
+    # Counts of the last time bin of a chunk, which may continue into the next chunk
+    carry = None
+    carry_bin = None
+    for times, depths in chunks:
+        d_ind = np.floor((depths - ylim[0]) / d_bin)
+        valid = (d_ind >= 0) & (d_ind < n_depths)
+        if not np.all(valid):
+            times, d_ind = times[valid], d_ind[valid]
+        d_ind = d_ind.astype(np.int64)
+        for start in range(0, times.size, chunk_size):
+            t_ind = np.floor((times[start:start + chunk_size] - t_min) / t_bin).astype(np.int64)
+            # Only time bins containing spikes contribute to sums and cross products
+            new_bin = np.r_[True, t_ind[1:] != t_ind[:-1]]
+            col = np.cumsum(new_bin) - 1
+            bins = t_ind[new_bin]
+            counts = np.bincount(d_ind[start:start + chunk_size] * bins.size + col,
+                                 minlength=n_depths * bins.size).reshape(n_depths, bins.size)
+            counts = counts.astype(np.float64)
+            if carry is not None:
+                if bins[0] == carry_bin:
+                    counts[:, 0] += carry
+                else:
+                    sums += carry
+                    cross += np.outer(carry, carry)
+            # Last time bin may continue into the next chunk
+            carry = counts[:, -1].copy()
+            carry_bin = bins[-1]
+            counts = counts[:, :-1]
+            sums += np.sum(counts, axis=1)
+            cross += counts @ counts.T
+    if carry is not None:
+        sums += carry
+        cross += np.outer(carry, carry)
+
+    # Sums and cross products of counts are integers, combine them exactly before dividing
+    sums = np.rint(sums).astype(np.int64)
+    cross = np.rint(cross).astype(np.int64)
+    cov = (n_times * cross - np.outer(sums, sums)) / (n_times * (n_times - 1))
+    std = np.sqrt(np.diag(cov))
+    corr = cov / std[:, np.newaxis] / std[np.newaxis, :]
+    np.clip(corr, -1, 1, out=corr)
+
+    return corr, depth_scale
+
+
+class ClusterIndex:
+    """
+    Index of spikes sorted by cluster. Spikes are ordered with a stable argsort of their cluster,
+    so within each cluster spikes keep their original order, and the spikes of the i th cluster
+    are order[offsets[i]:offsets[i + 1]]
+    """
+    def __init__(self, spike_clusters):
+        """
+        :param spike_clusters: cluster of each spike
+        :type spike_clusters: np.array
+        """
+        self.order = np.argsort(spike_clusters, kind='stable')
+        sorted_clusters = spike_clusters[self.order]
+        start = np.flatnonzero(np.r_[True, sorted_clusters[1:] != sorted_clusters[:-1]])
+        start = start[start < sorted_clusters.size]
+        self.clusters = sorted_clusters[start]
+        self.offsets = np.r_[start, sorted_clusters.size]
+
+    @property
+    def counts(self):
+        return np.diff(self.offsets)
+
+    def cluster_pos(self, clusters):
+        """
+        Position of clusters in index, clusters without spikes are ignored
+        :param clusters: cluster ids
+        :type clusters: np.array
+        :return: position of each cluster in self.clusters
+        :type: np.array
+        """
+        clusters = np.atleast_1d(clusters)
+        pos = np.searchsorted(self.clusters, clusters)
+        found = pos < self.clusters.size
+        found[found] = self.clusters[pos[found]] == clusters[found]
+        return pos[found]
+
+    def spikes(self, cluster):
+        """
+        Indices of spikes in a cluster
+        :param cluster: cluster id
+        :type cluster: int
+        :return: spike indices
+        :type: np.array
+        """
+        pos = np.searchsorted(self.clusters, cluster)
+        if pos == self.clusters.size or self.clusters[pos] != cluster:
+            return self.order[:0]
+        return self.order[self.offsets[pos]:self.offsets[pos + 1]]
+
+    def spike_idx(self, clusters):
+        """
+        Indices of spikes in a set of clusters, sorted
+        :param clusters: cluster ids
+        :type clusters: np.array
+        :return: spike indices
+        :type: np.array
+        """
+        pos = np.unique(self.cluster_pos(clusters))
+        starts = self.offsets[pos]
+        counts = self.offsets[pos + 1] - starts
+        # Concatenate the slice of order for each cluster
+        idx = np.repeat(starts - np.r_[0, np.cumsum(counts)[:-1]], counts) + \
+            np.arange(np.sum(counts))
+        return np.sort(self.order[idx])
+
+    def reduceat(self, ufunc, values):
+        """
+        Reduce values over the spikes of each cluster. Values must be in cluster order, i.e
+        indexed with self.order, so that the spikes of each cluster are contiguous
+        :param ufunc: reduction e.g np.add
+        :type ufunc: np.ufunc
+        :param values: value for each spike in cluster order, e.g values[self.order]
+        :type values: np.array
+        :return: reduced value for each cluster
+        :type: np.array
+        """
+        return ufunc.reduceat(values, self.offsets[:-1])
+
+
+def compute_autocorrs(spike_times, cluster_index, bin_size, window_size,
+                      chunk_size=AUTOCORR_CHUNK_SIZE):
+    """
+    Autocorrelograms of all clusters, equivalent to calling brainbox.population.xcorr on the
+    spikes of each cluster individually. Using the cluster sorted spike index, pairs of spikes in
+    the same cluster are counted for increasing shifts until no spike has a matching spike within
+    the window. Clusters are processed in chunks of about chunk_size spikes
+    :param spike_times: spike times, must be sorted
+    :type spike_times: np.array
+    :param cluster_index: cluster sorted spike index
+    :type cluster_index: ClusterIndex
+    :param bin_size: size of autocorrelogram bins in s
+    :type bin_size: float
+    :param window_size: size of autocorrelogram window in s
+    :type window_size: float
+    :param chunk_size: approximate number of spikes to process at once
+    :type chunk_size: int
+    :return clusters: cluster ids
+    :type clusters: np.array
+    :return autocorrs: autocorrelogram of each cluster, shape (n_clusters, n_bins)
+    :type autocorrs: np.array
+    """
+    winsize_bins = 2 * int(.5 * window_size / bin_size) + 1
+    n_bins = winsize_bins // 2 + 1
+
+    clusters = cluster_index.clusters
+    bounds = cluster_index.offsets
+    counts = np.zeros((clusters.size, n_bins), dtype=np.int32)
+
+    i_clust = 0
+    while i_clust < clusters.size:
+        # Chunk of whole clusters
+        j_clust = max(np.searchsorted(bounds, bounds[i_clust] + chunk_size, side='right') - 1,
+                      i_clust + 1)
+        times = spike_times[cluster_index.order[bounds[i_clust]:bounds[j_clust]]]
+        clust = np.repeat(np.arange(j_clust - i_clust), np.diff(bounds[i_clust:j_clust + 1]))
+        # Spikes that may still have a matching spike at the next shift
+        active = np.arange(times.size)
+        shift = 1
+        while active.size:
+            active = active[active + shift < times.size]
+            diff = np.round((times[active + shift] - times[active]) / bin_size).astype(np.int64)
+            keep = (clust[active + shift] == clust[active]) & (diff <= winsize_bins / 2)
+            active = active[keep]
+            counts[i_clust:j_clust] += np.bincount(
+                clust[active] * n_bins + diff[keep],
+                minlength=(j_clust - i_clust) * n_bins).reshape(-1, n_bins).astype(np.int32)
+            shift += 1
+        i_clust = j_clust
+
+    autocorrs = np.c_[counts[:, 1:][:, ::-1], counts]
+
+    return clusters, autocorrs
+
+
+def compute_cluster_stats(cluster_index, spike_data, percentiles=CLUSTER_PERCENTILES):
+    """
+    Statistics of spike attributes for each cluster. The count, mean, standard deviation, min and
+    max of each attribute are computed with reductions over the cluster sorted spikes.
+    Percentiles are approximated by the nearest rank within each cluster
+    :param cluster_index: cluster sorted spike index
+    :type cluster_index: ClusterIndex
+    :param spike_data: spike attributes to compute statistics for e.g {'amps': spikes['amps']}
+    :type spike_data: dict
+    :param percentiles: percentiles to compute, between 0 and 100
+    :type percentiles: np.array
+    :return: cluster ids in 'clusters', number of spikes in 'count' and for each attribute a dict
+             with 'mean', 'std', 'min', 'max' and 'percentiles', shape (n_clusters, n_percentiles)
+    :type: dict
+    """
+    count = cluster_index.counts
+    start = cluster_index.offsets[:-1]
+    clust = np.repeat(np.arange(count.size), count)
+    # Index of spike at each percentile for each cluster
+    rank = start[:, np.newaxis] + np.floor(np.outer(count - 1, percentiles / 100)).astype(int)
+
+    stats = {'clusters': cluster_index.clusters, 'count': count}
+    for attr, data in spike_data.items():
+        values = data[cluster_index.order].astype(np.float64)
+        mean = cluster_index.reduceat(np.add, values) / count
+        var = cluster_index.reduceat(np.add, values ** 2) / count - mean ** 2
+        # Sort values within each cluster to find percentiles
+        values_sorted = values[np.lexsort((values, clust))]
+        stats[attr] = {
+            'mean': mean,
+            'std': np.sqrt(np.clip(var, 0, None)),
+            'min': cluster_index.reduceat(np.minimum, values),
+            'max': cluster_index.reduceat(np.maximum, values),
+            'percentiles': values_sorted[rank]
+        }
+
+    return stats
+
+
+def select_clusters(stats, keep):
+    """
+    Select rows of cluster statistics table
+    :param stats: cluster statistics, as returned by compute_cluster_stats
+    :type stats: dict
+    :param keep: boolean mask or index of clusters to keep
+    :type keep: np.array
+    :return: cluster statistics for selected clusters
+    :type: dict
+    """
+    return {key: select_clusters(val, keep) if isinstance(val, dict) else val[keep]
+            for key, val in stats.items()}
+
+
 class PlotData:
-    def __init__(self, alf_path, ephys_path):
+    def __init__(self, alf_path, ephys_path, cache=True, low_memory=False):
+        """
+        :param alf_path: path to alf folder containing spike sorting data
+        :type alf_path: Path
+        :param ephys_path: path to folder containing raw ephys qc data
+        :type ephys_path: Path
+        :param cache: whether to store plot data in on disk cache
+        :type cache: bool
+        :param low_memory: if True, spike and cluster data is memory mapped and spike data used
+                           for plots is stored as float32/ int32
+        :type low_memory: bool
+        """
         self.alf_path = alf_path
         self.ephys_path = ephys_path
+        self.low_memory = low_memory
 
         self.chn_coords = np.load(Path(self.alf_path, 'channels.localCoordinates.npy'))
         self.chn_ind = np.load(Path(self.alf_path, 'channels.rawInd.npy'))
-        # See if spike data is available
-        try:
-            self.spikes = alf.io.load_object(self.alf_path, 'spikes')
-            self.spike_data_status = True
-        except Exception:
+        self.cache = self.init_cache() if cache else None
+        # Products that have already been computed
+        self.products = {}
+        # Products may be computed concurrently from worker threads, guards lazily loaded data
+        self._lock = threading.RLock()
+        self._lfp_cumsum = None
+        self._product_locks = {}
+        # See if spike data is available, spikes are only loaded into memory once needed
+        self._spikes = None
+        # Spike indices and filtered spike data, per unit filter
+        self._cluster_index = None
+        self._spike_idx = {}
+        self._kp_idx = {}
+        self._spike_data = {}
+        self._time_range = {}
+        # Unit filter used by jobs computing plot data on worker threads, see unit_filter
+        self._thread_filter = threading.local()
+        self.spike_data_status = alf.io.exists(self.alf_path, 'spikes')
+        if not self.spike_data_status:
             print('spike data was not found, some plots will not display')
-            self.spike_data_status = False
 
+        self.filter_units('all')
         try:
-            self.clusters = alf.io.load_object(self.alf_path, 'clusters')
-            self.filter_units('all')
+            self.clusters = self.load_object(self.alf_path, 'clusters')
             self.cluster_data_status = True
             self.compute_timescales()
         except Exception:
@@ -55,45 +568,242 @@ class PlotData:
             print('lfp data was not found, some plots will not display')
             self.lfp_data_status = False
 
-    def filter_units(self, type):
-        if type == 'all':
-            self.spike_idx = np.arange(self.spikes['clusters'].size)
-            self.kp_idx = np.where(~np.isnan(self.spikes['depths'][self.spike_idx]))[0]
+    def init_cache(self):
+        """
+        Create on disk cache for derived plot data, located next to the alf folder
+        :return: cache
+        :type: DerivedCache
+        """
+        sources = set()
+        for folder in {Path(self.alf_path), Path(self.ephys_path)}:
+            for pattern in CACHE_SOURCES:
+                sources.update(folder.glob(pattern))
+        return DerivedCache(get_cache_path(self.alf_path), sources)
+
+    def load_object(self, alf_path, obj):
+        if self.low_memory:
+            return load_object_mmap(alf_path, obj)
+        else:
+            return alf.io.load_object(alf_path, obj)
+
+    @property
+    def spikes(self):
+        with self._lock:
+            if self._spikes is None:
+                self._spikes = self.load_object(self.alf_path, 'spikes')
+        return self._spikes
+
+    @property
+    def cluster_index(self):
+        """
+        Cluster sorted spike index, built once the first time spikes are needed
+        :type: ClusterIndex
+        """
+        with self._lock:
+            if self._cluster_index is None:
+                self._cluster_index = ClusterIndex(self.spikes['clusters'])
+        return self._cluster_index
+
+    @property
+    def filter_clusters(self):
+        # Ids of clusters selected by unit filter
+        return np.where(self.clusters.metrics.ks2_label == self.filter_type)[0]
+
+    @property
+    def spike_idx(self):
+        with self._lock:
+            if self.filter_type not in self._spike_idx:
+                if self.filter_type == 'all':
+                    spike_idx = np.arange(self.spikes['clusters'].size)
+                else:
+                    spike_idx = self.cluster_index.spike_idx(self.filter_clusters)
+                self._spike_idx[self.filter_type] = spike_idx.astype(self.index_dtype,
+                                                                     copy=False)
+        return self._spike_idx[self.filter_type]
+
+    @property
+    def kp_idx(self):
+        with self._lock:
+            if self.filter_type not in self._kp_idx:
+                kp_idx = np.where(~np.isnan(self.get_spike_data('depths', kp=False)))[0]
+                self._kp_idx[self.filter_type] = kp_idx.astype(self.index_dtype, copy=False)
+        return self._kp_idx[self.filter_type]
+
+    @property
+    def index_dtype(self):
+        if self.low_memory and self.spikes['clusters'].size < np.iinfo(np.int32).max:
+            return np.int32
         else:
-            clust = np.where(self.clusters.metrics.ks2_label == type)
-            self.spike_idx = np.where(np.isin(self.spikes['clusters'], clust))[0]
-            self.kp_idx = np.where(~np.isnan(self.spikes['depths'][self.spike_idx]))[0]
+            return np.int64
+
+    def get_spike_data(self, attr, kp=True):
+        """
+        Get spike attribute for the units selected with filter_units. Filtered arrays are computed
+        once per filter and shared between plots. In low memory mode they are stored as float32 or
+        int32
+        :param attr: name of spike attribute e.g 'times'
+        :type attr: str
+        :param kp: whether to only include spikes with a valid depth
+        :type kp: bool
+        :return: spike attribute
+        :type: np.array
+        """
+        key = (self.filter_type, attr, kp)
+        with self._lock:
+            if key not in self._spike_data:
+                if kp:
+                    data = self.get_spike_data(attr, kp=False)[self.kp_idx]
+                else:
+                    data = self.spikes[attr][self.spike_idx]
+                if self.low_memory:
+                    dtype = np.float32 if np.issubdtype(data.dtype, np.floating) else np.int32
+                    data = data.astype(dtype, copy=False)
+                self._spike_data[key] = data
+        return self._spike_data[key]
+
+    def spike_chunks(self, attrs, tlim=None, reverse=False, chunk_size=SPIKE_CHUNK_SIZE):
+        """
+        Iterate over attributes of the spikes of the units selected with filter_units that have a
+        valid depth, in chunks of spikes sorted by time. In low memory mode chunks are read from
+        the memory mapped spike files and filtered as they are read, so the memory used does not
+        grow with the number of spikes
+        :param attrs: names of spike attributes e.g ['times', 'depths']
+        :type attrs: list of str
+        :param tlim: if given, only spikes within time limits [min, max]
+        :type tlim: list
+        :param reverse: whether to start from the end of the recording
+        :type reverse: bool
+        :param chunk_size: number of spikes read at once
+        :type chunk_size: int
+        :return: generator of tuples of np.array, one per attribute
+        """
+        if self.low_memory:
+            data = [self.spikes[attr] for attr in attrs]
+            times = self.spikes['times']
+            clusters = None if self.filter_type == 'all' else self.filter_clusters
+        else:
+            data = [self.get_spike_data(attr) for attr in attrs]
+            times = self.get_spike_data('times')
+        i0, i1 = (0, times.size) if tlim is None else (np.searchsorted(times, tlim[0]),
+                                                       np.searchsorted(times, tlim[1],
+                                                                       side='right'))
+        starts = range(i0, i1, chunk_size)
+        for start in (reversed(starts) if reverse else starts):
+            sl = slice(start, min(start + chunk_size, i1))
+            if not self.low_memory:
+                yield tuple(d[sl] for d in data)
+                continue
+            keep = ~np.isnan(self.spikes['depths'][sl])
+            if clusters is not None:
+                keep &= np.isin(self.spikes['clusters'][sl], clusters)
+            yield tuple(np.asarray(d[sl])[keep] for d in data)
+
+    def spike_time_range(self):
+        """
+        Times of the first and last spike of the units selected with filter_units that have a
+        valid depth
+        :return: np.array([min, max])
+        """
+        with self._lock:
+            if self.filter_type not in self._time_range:
+                tmin = next(t[0] for t, in self.spike_chunks(['times']) if t.size)
+                tmax = next(t[-1] for t, in self.spike_chunks(['times'], reverse=True) if t.size)
+                self._time_range[self.filter_type] = np.array([tmin, tmax])
+        return self._time_range[self.filter_type]
+
+    @property
+    def filter_type(self):
+        return getattr(self._thread_filter, 'type', self._filter_type)
+
+    def filter_units(self, type):
+        # Spike indices and data for each filter are computed the first time the filter is used
+        # and kept so switching between filters requires no recomputation
+        with self._lock:
+            self._filter_type = type
+
+    @contextlib.contextmanager
+    def unit_filter(self, type):
+        """
+        Select the units used by the current thread, without changing the filter selected with
+        filter_units. Jobs computing plot data on worker threads use this so the filter can be
+        changed while they run
+        :param type: type of unit 'all', 'good' or 'mua'
+        :type type: str
+        """
+        prev_type = getattr(self._thread_filter, 'type', None)
+        self._thread_filter.type = type
+        try:
+            yield
+        finally:
+            if prev_type is None:
+                del self._thread_filter.type
+            else:
+                self._thread_filter.type = prev_type
+
+    def compute_products(self, filters=UNIT_FILTERS):
+        """
+        Compute all plot data that is stored in the on disk cache, for each unit filter. Used to
+        warm the cache before a session is opened in the GUI
+        :param filters: unit filters to compute plot data for
+        :type filters: list of str
+        """
+        self.get_rms_data_img_probe('AP')
+        self.get_rms_data_img_probe('LF')
+        self.get_lfp_spectrum_data()
+        if self.spike_data_status:
+            self.get_all_cluster_stats()
+            self.get_autocorrs()
+            for type in filters:
+                with self.unit_filter(type):
+                    self.get_fr_p2t_data_scatter()
+                    self.get_fr_img()
+                    self.get_fr_amp_data_line()
+                    self.get_correlation_data_img()
 
 # Plots that require spike and cluster data
+    @cached_product(disk=False)
     def get_depth_data_scatter(self):
         if not self.spike_data_status:
             data_scatter = None
             return data_scatter
         else:
             A_BIN = 10
-            amp_range = np.quantile(self.spikes['amps'][self.spike_idx], [0, 0.9])
+            spike_amps = self.get_spike_data('amps', kp=False)
+            spike_times = self.get_spike_data('times', kp=False)
+            spike_depths = self.get_spike_data('depths', kp=False)
+            amp_range = np.quantile(spike_amps, [0, 0.9])
             amp_bins = np.linspace(amp_range[0], amp_range[1], A_BIN)
             colour_bin = np.linspace(0.0, 1.0, A_BIN)
-            colours = (cm.get_cmap('BuPu')(colour_bin)[np.newaxis, :, :3][0]) * 255
-            spikes_colours = np.empty(self.spikes['amps'][self.spike_idx].size, dtype=object)
-            spikes_size = np.empty(self.spikes['amps'][self.spike_idx].size)
-            for iA in range(amp_bins.size - 1):
-                idx = np.where((self.spikes['amps'][self.spike_idx] > amp_bins[iA]) &
-                               (self.spikes['amps'][self.spike_idx] <= amp_bins[iA + 1]))[0]
+            # Lookup table of RGBA colour and marker size for each amplitude bin
+            colours = (cm.get_cmap('BuPu')(colour_bin[:-1]) * 255).astype(np.uint8)
+            sizes = np.arange(A_BIN - 1) / (A_BIN / 4)
+            # Index of amplitude bin for each spike, amplitudes beyond the range of amp_bins are
+            # assigned to the first or last bin
+            spikes_colours = np.digitize(spike_amps, amp_bins[1:-1], right=True).astype(np.uint8)
 
-                spikes_colours[idx] = QtGui.QColor(*colours[iA])
-                spikes_size[idx] = iA / (A_BIN / 4)
+            # Level of detail pyramid, level n contains every 2**n th spike. Levels are strided
+            # views on the spike arrays so no data is copied
+            n_levels = int(np.ceil(np.log2(max(spike_times.size / MAX_SCATTER_POINTS, 1)))) + 1
+            lod = {
+                'x': spike_times,
+                'y': spike_depths,
+                'colours': spikes_colours,
+                'strides': 2 ** np.arange(n_levels)
+            }
+            # Start by displaying the coarsest level
+            stride = lod['strides'][-1]
 
             data_scatter = {
-                'x': self.spikes['times'][self.spike_idx][0:-1:100],
-                'y': self.spikes['depths'][self.spike_idx][0:-1:100],
+                'x': spike_times[::stride],
+                'y': spike_depths[::stride],
                 'levels': amp_range * 1e6,
-                'colours': spikes_colours[0:-1:100],
+                'colours': spikes_colours[::stride],
+                'lut': colours,
+                'lod': lod,
                 'pen': None,
-                'size': spikes_size[0:-1:100],
+                'size': sizes,
                 'symbol': np.array('o'),
-                'xrange': np.array([np.min(self.spikes['times'][self.spike_idx][0:-1:100]),
-                                    np.max(self.spikes['times'][self.spike_idx][0:-1:100])]),
+                'xrange': np.array([np.min(spike_times), np.max(spike_times)]),
                 'xaxis': 'Time (s)',
                 'title': 'Amplitude (uV)',
                 'cmap': 'BuPu',
@@ -102,6 +812,7 @@ class PlotData:
 
             return data_scatter
 
+    @cached_product()
     def get_fr_p2t_data_scatter(self):
         if not self.spike_data_status:
             data_fr_scatter = None
@@ -109,14 +820,12 @@ class PlotData:
             data_amp_scatter = None
             return data_fr_scatter, data_p2t_scatter, data_amp_scatter
         else:
-            (clu,
-             spike_depths,
-             spike_amps,
-             n_spikes) = self.compute_spike_average(self.spikes['clusters'][self.spike_idx],
-                                                    self.spikes['depths'][self.spike_idx],
-                                                    self.spikes['amps'][self.spike_idx])
-            spike_amps = spike_amps * 1e6
-            fr = n_spikes / np.max(self.spikes['times'])
+            stats = self.get_cluster_stats()
+            clu = stats['clusters']
+            spike_depths = stats['depths']['mean']
+            spike_amps = stats['amps']['mean'] * 1e6
+            n_spikes = stats['count']
+            fr = n_spikes / self.get_recording_duration()
             fr_norm, fr_levels = self.normalise_data(fr, lquant=0, uquant=1)
 
             data_fr_scatter = {
@@ -179,50 +888,107 @@ class PlotData:
 
             return data_fr_scatter, data_p2t_scatter, data_amp_scatter
 
+    @cached_product(filtered=False)
+    def get_all_cluster_stats(self):
+        """
+        Table of statistics for each cluster, see compute_cluster_stats
+        """
+        if not self.spike_data_status:
+            return None
+        spike_data = {attr: self.spikes[attr] for attr in ['depths', 'amps', 'times']}
+        return compute_cluster_stats(self.cluster_index, spike_data)
+
+    @cached_product(disk=False)
+    def get_cluster_stats(self):
+        """
+        Table of statistics for each cluster of the units selected with filter_units. Units are
+        filtered by cluster so this is a selection of rows of get_all_cluster_stats
+        """
+        stats = self.get_all_cluster_stats()
+        if stats is None or self.filter_type == 'all':
+            return stats
+        return select_clusters(stats, np.isin(stats['clusters'], self.filter_clusters))
+
+    def get_recording_duration(self):
+        """
+        Time of the last spike, found from the cluster statistics table so that spikes don't need
+        to be loaded once the table has been computed or read from the cache
+        """
+        return np.max(self.get_all_cluster_stats()['times']['max'])
+
+    @cached_product()
     def get_fr_img(self):
+        """
+        Firing rate image of the whole recording. The time bin is chosen from the length of the
+        recording so that the image has about FR_IMG_N_BINS time bins, finer detail of a time
+        window is given by get_fr_img_window
+        """
         if not self.spike_data_status:
             data_img = None
             return data_img
         else:
-            T_BIN = 0.05
-            D_BIN = 5
-            n, times, depths = bincount2D(self.spikes['times'][self.spike_idx][self.kp_idx],
-                                          self.spikes['depths'][self.spike_idx][self.kp_idx],
-                                          T_BIN, D_BIN, ylim=[0, np.max(self.chn_coords[:, 1])])
-            img = n.T / T_BIN
-            xscale = (times[-1] - times[0]) / img.shape[0]
-            yscale = (depths[-1] - depths[0]) / img.shape[1]
-
-            data_img = {
-                'img': img,
-                'scale': np.array([xscale, yscale]),
-                'levels': np.quantile(np.mean(img, axis=0), [0, 1]),
-                'xrange': np.array([times[0], times[-1]]),
+            tlim = self.spike_time_range()
+            data_img = self.get_fr_img_window(tlim[0], tlim[1])
+            data_img.update({
+                'levels': np.quantile(np.mean(data_img['img'], axis=0), [0, 1]),
+                'xrange': tlim,
                 'xaxis': 'Time (s)',
                 'cmap': 'binary',
                 'title': 'Firing Rate'
-            }
+            })
 
             return data_img
 
+    def get_fr_img_window(self, tmin, tmax, n_bins=FR_IMG_N_BINS):
+        """
+        Firing rate image of a time window, with the time bin chosen so that the window has at
+        most n_bins time bins. Not memoized as a new window is computed each time the user zooms
+        :param tmin: start of window in s
+        :type tmin: float
+        :param tmax: end of window in s
+        :type tmax: float
+        :param n_bins: maximum number of time bins, e.g the width of the display in pixels
+        :type n_bins: int
+        :return: image as float32 np.array((ntimes, ndepths)), time bin, and scale and offset of
+                 image
+        :type: dict
+        """
+        if not self.spike_data_status:
+            return None
+        t_bin = fr_img_t_bin(tmax - tmin, n_bins)
+        tlim = self.spike_time_range()
+        # Align bins to multiples of the time bin so overlapping windows line up
+        tmin = np.floor(max(tmin, tlim[0]) / t_bin) * t_bin
+        tmax = min(tmax, tlim[1])
+        if tmax < tmin:
+            return None
+        n, _, times, depths = bincount2D_chunked(
+            self.spike_chunks(['times', 'depths'], tlim=[tmin, tmax]), t_bin, FR_IMG_D_BIN,
+            xlim=[tmin, tmax], ylim=[0, np.max(self.chn_coords[:, 1])])
+
+        data_img = {
+            'img': (n.T / t_bin).astype(np.float32),
+            't_bin': t_bin,
+            'scale': np.array([t_bin, FR_IMG_D_BIN]),
+            'offset': np.array([tmin, depths[0]]),
+            'xrange': np.array([tmin, tmin + n.shape[1] * t_bin])
+        }
+
+        return data_img
+
+    @cached_product()
     def get_fr_amp_data_line(self):
         if not self.spike_data_status:
             data_fr_line = None
             data_amp_line = None
             return data_fr_line, data_amp_line
         else:
-            T_BIN = np.max(self.spikes['times'])
+            T_BIN = self.get_recording_duration()
             D_BIN = 10
-            nspikes, times, depths = bincount2D(self.spikes['times'][self.spike_idx][self.kp_idx],
-                                                self.spikes['depths'][self.spike_idx][self.kp_idx],
-                                                T_BIN, D_BIN,
-                                                ylim=[0, np.max(self.chn_coords[:, 1])])
-
-            amp, times, depths = bincount2D(self.spikes['amps'][self.spike_idx][self.kp_idx],
-                                            self.spikes['depths'][self.spike_idx][self.kp_idx],
-                                            T_BIN, D_BIN, ylim=[0, np.max(self.chn_coords[:, 1])],
-                                            weights=self.spikes['amps'][self.spike_idx]
-                                            [self.kp_idx])
+            nspikes, amp, times, depths = bincount2D_chunked(
+                self.spike_chunks(['times', 'depths', 'amps']), T_BIN, D_BIN,
+                xlim=self.spike_time_range(), ylim=[0, np.max(self.chn_coords[:, 1])],
+                weights=True)
             mean_fr = nspikes[:, 0] / T_BIN
             mean_amp = np.divide(amp[:, 0], nspikes[:, 0]) * 1e6
             mean_amp[np.isnan(mean_amp)] = 0
@@ -245,6 +1011,7 @@ class PlotData:
 
             return data_fr_line, data_amp_line
 
+    @cached_product()
     def get_correlation_data_img(self):
         if not self.spike_data_status:
             data_img = None
@@ -252,10 +1019,9 @@ class PlotData:
         else:
             T_BIN = 0.05
             D_BIN = 40
-            R, times, depths = bincount2D(self.spikes['times'][self.spike_idx][self.kp_idx],
-                                          self.spikes['depths'][self.spike_idx][self.kp_idx],
-                                          T_BIN, D_BIN, ylim=[0, np.max(self.chn_coords[:, 1])])
-            corr = np.corrcoef(R)
+            corr, depths = binned_corrcoef(self.spike_chunks(['times', 'depths']), T_BIN, D_BIN,
+                                           tlim=self.spike_time_range(),
+                                           ylim=[0, np.max(self.chn_coords[:, 1])])
             corr[np.isnan(corr)] = 0
             scale = (np.max(depths) - np.min(depths)) / corr.shape[0]
             data_img = {
@@ -269,6 +1035,7 @@ class PlotData:
             }
             return data_img
 
+    @cached_product(filtered=False)
     def get_rms_data_img_probe(self, format):
         # Finds channels that are at equivalent depth on probe and averages rms values for each
         # time point at same depth togehter
@@ -295,23 +1062,8 @@ class PlotData:
 
         # Img data
         _rms = np.take(rms_amps, self.chn_ind, axis=1)
-        _, self.chn_depth, chn_count = np.unique(self.chn_coords[:, 1], return_index=True,
-                                                 return_counts=True)
-        self.chn_depth_eq = np.copy(self.chn_depth)
-        self.chn_depth_eq[np.where(chn_count == 2)] += 1
-
-        def avg_chn_depth(a):
-            return(np.mean([a[self.chn_depth], a[self.chn_depth_eq]], axis=0))
-
-        def get_median(a):
-            return(np.median(a))
-
-        def median_subtract(a):
-            return(a - np.median(a))
-        img = np.apply_along_axis(avg_chn_depth, 1, _rms * 1e6)
-        median = np.mean(np.apply_along_axis(get_median, 1, img))
-        # Medium subtract to remove bands, but add back average median so values make sense
-        img = np.apply_along_axis(median_subtract, 1, img) + median
+        self.compute_chn_depth()
+        img = median_subtract(average_chn_depth(_rms * 1e6, self.chn_depth, self.chn_depth_eq))
         levels = np.quantile(img, [0.1, 0.9])
         xscale = (rms_times[-1] - rms_times[0]) / img.shape[0]
         yscale = (np.max(self.chn_coords[:, 1]) - np.min(self.chn_coords[:, 1])) / img.shape[1]
@@ -348,14 +1100,13 @@ class PlotData:
 
         return data_img, data_probe
 
+    @cached_product(filtered=False)
     def get_lfp_spectrum_data(self):
-        freq_bands = np.vstack(([0, 4], [4, 10], [10, 30], [30, 80], [80, 200]))
         data_probe = {}
         if not self.lfp_data_status:
             data_img = None
-            for freq in freq_bands:
-                lfp_band_data = {f"{freq[0]} - {freq[1]} Hz": None}
-                data_probe.update(lfp_band_data)
+            for freq in FREQ_BANDS:
+                data_probe[band_name(freq)] = None
 
             return data_img, data_probe
         else:
@@ -365,15 +1116,8 @@ class PlotData:
                                 (self.lfp_freq < freq_range[1]))[0]
             _lfp = np.take(self.lfp_power[freq_idx], self.chn_ind, axis=1)
             _lfp_dB = 10 * np.log10(_lfp)
-            _, self.chn_depth, chn_count = np.unique(self.chn_coords[:, 1], return_index=True,
-                                                     return_counts=True)
-            self.chn_depth_eq = np.copy(self.chn_depth)
-            self.chn_depth_eq[np.where(chn_count == 2)] += 1
-
-            def avg_chn_depth(a):
-                return(np.mean([a[self.chn_depth], a[self.chn_depth_eq]], axis=0))
-
-            img = np.apply_along_axis(avg_chn_depth, 1, _lfp_dB)
+            self.compute_chn_depth()
+            img = average_chn_depth(_lfp_dB, self.chn_depth, self.chn_depth_eq)
             levels = np.quantile(img, [0.1, 0.9])
             xscale = (freq_range[-1] - freq_range[0]) / img.shape[0]
             yscale = (np.max(self.chn_coords[:, 1]) - np.min(self.chn_coords[:, 1])) / img.shape[1]
@@ -389,38 +1133,97 @@ class PlotData:
             }
 
             # Power spectrum in bands on probe
-            for freq in freq_bands:
-                freq_idx = np.where((self.lfp_freq >= freq[0]) & (self.lfp_freq < freq[1]))[0]
-                lfp_avg = np.mean(self.lfp_power[freq_idx], axis=0)[self.chn_ind]
-                lfp_avg_dB = 10 * np.log10(lfp_avg)
-                probe_img, probe_scale, probe_offset = self.arrange_channels2banks(lfp_avg_dB)
-                probe_levels = np.quantile(lfp_avg_dB, [0.1, 0.9])
-
-                lfp_band_data = {f"{freq[0]} - {freq[1]} Hz": {
-                    'img': probe_img,
-                    'scale': probe_scale,
-                    'offset': probe_offset,
-                    'level': probe_levels,
-                    'cmap': 'viridis',
-                    'xaxis': 'Time (s)',
-                    'xrange': np.array([0 * BNK_SIZE, (N_BNK) * BNK_SIZE]),
-                    'title': f"{freq[0]} - {freq[1]} Hz (dB)"}
-                }
-                data_probe.update(lfp_band_data)
+            for freq in FREQ_BANDS:
+                data_probe[band_name(freq)] = self.get_lfp_band_data(*freq)
 
             return data_img, data_probe
 
-    def get_autocorr(self, clust_idx):
-        idx = np.where(self.spikes['clusters'] == self.clust_id[clust_idx])[0]
-        autocorr = xcorr(self.spikes['times'][idx], self.spikes['clusters'][idx],
-                         AUTOCORR_BIN_SIZE, AUTOCORR_WIN_SIZE)
+    @property
+    def lfp_cumsum(self):
+        """
+        Cumulative sum of lfp power over frequency, with a leading row of zeros, so that the
+        total power in any frequency band is the difference of two rows
+        :type: np.array
+        """
+        with self._lock:
+            if self._lfp_cumsum is None:
+                self._lfp_cumsum = np.cumsum(np.r_[np.zeros((1, self.lfp_power.shape[1])),
+                                                   self.lfp_power], axis=0)
+        return self._lfp_cumsum
+
+    @cached_product(filtered=False, disk=False)
+    def get_lfp_band_data(self, freq_min, freq_max):
+        """
+        Average lfp power in frequency band for each channel, arranged on probe. The power is
+        found from the cumulative spectrum so the cost does not depend on the width of the band.
+        Bands that contain no frequency bin are widened to the first bin above freq_min, or the
+        last bin of the spectrum
+        :param freq_min: lower limit of band (inclusive) in Hz
+        :type freq_min: float
+        :param freq_max: upper limit of band (exclusive) in Hz
+        :type freq_max: float
+        :return: probe data
+        :type: dict
+        """
+        if not self.lfp_data_status:
+            return None
+        idx_min, idx_max = np.searchsorted(self.lfp_freq, [freq_min, freq_max])
+        idx_min = min(idx_min, self.lfp_freq.size - 1)
+        idx_max = max(idx_max, idx_min + 1)
+        lfp_avg = ((self.lfp_cumsum[idx_max] - self.lfp_cumsum[idx_min]) /
+                   (idx_max - idx_min))[self.chn_ind]
+        lfp_avg_dB = 10 * np.log10(lfp_avg)
+        probe_img, probe_scale, probe_offset = self.arrange_channels2banks(lfp_avg_dB)
+        probe_levels = np.quantile(lfp_avg_dB, [0.1, 0.9])
+
+        data_probe = {
+            'img': probe_img,
+            'scale': probe_scale,
+            'offset': probe_offset,
+            'level': probe_levels,
+            'cmap': 'viridis',
+            'xaxis': 'Time (s)',
+            'xrange': np.array([0 * BNK_SIZE, (N_BNK) * BNK_SIZE]),
+            'title': f"{band_name(np.array([freq_min, freq_max]))} (dB)"
+        }
+
+        return data_probe
+
+    @cached_product(filtered=False)
+    def get_autocorrs(self):
+        """
+        Autocorrelograms of all clusters, see compute_autocorrs
+        """
+        if not self.spike_data_status:
+            return None
+        return compute_autocorrs(self.spikes['times'], self.cluster_index,
+                                 AUTOCORR_BIN_SIZE, AUTOCORR_WIN_SIZE)
 
-        return autocorr[0, 0, :]
+    def get_autocorr(self, clust):
+        """
+        Autocorrelogram of a cluster
+        :param clust: cluster id
+        :type clust: int
+        """
+        clusters, autocorrs = self.get_autocorrs()
+        return autocorrs[np.searchsorted(clusters, clust)]
 
-    def get_template_wf(self, clust_idx):
-        template_wf = (self.clusters['waveforms'][self.clust_id[clust_idx], :, 0])
+    def get_template_wf(self, clust):
+        """
+        Template waveform of a cluster on its first channel, in uV
+        :param clust: cluster id
+        :type clust: int
+        """
+        template_wf = (self.clusters['waveforms'][clust, :, 0])
         return template_wf * 1e6
 
+    def compute_chn_depth(self):
+        # Finds index of channels that are at equivalent depths on the probe
+        _, self.chn_depth, chn_count = np.unique(self.chn_coords[:, 1], return_index=True,
+                                                 return_counts=True)
+        self.chn_depth_eq = np.copy(self.chn_depth)
+        self.chn_depth_eq[np.where(chn_count == 2)] += 1
+
     def arrange_channels2banks(self, data):
         Y_OFFSET = 20
         bnk_data = []
@@ -442,17 +1245,6 @@ class PlotData:
 
         return bnk_data, bnk_scale, bnk_offset
 
-    def compute_spike_average(self, spike_clusters, spike_depth, spike_amp):
-        clust, inverse, counts = np.unique(spike_clusters, return_inverse=True, return_counts=True)
-        _spike_depth = scipy.sparse.csr_matrix((spike_depth, (inverse,
-                                                np.zeros(inverse.size, dtype=int))))
-        _spike_amp = scipy.sparse.csr_matrix((spike_amp, (inverse,
-                                              np.zeros(inverse.size, dtype=int))))
-        spike_depth_avg = np.ravel(_spike_depth.toarray()) / counts
-        spike_amp_avg = np.ravel(_spike_amp.toarray()) / counts
-        self.clust_id = clust
-        return clust, spike_depth_avg, spike_amp_avg, counts
-
     def compute_timescales(self):
         self.t_autocorr = 1e3 * np.arange((AUTOCORR_WIN_SIZE / 2) - AUTOCORR_WIN_SIZE,
                                           (AUTOCORR_WIN_SIZE / 2) + AUTOCORR_BIN_SIZE,
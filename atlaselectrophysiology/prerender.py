@@ -0,0 +1,152 @@
+"""
+Compute the plot data and slice images displayed in the alignment GUI for a list of probe
+insertions or local folders and store them in the on disk cache, so that the sessions open
+without waiting for the data to be computed.
+
+e.g for probe insertions on Alyx
+python prerender.py <probe_id_1> <probe_id_2>
+
+e.g for local folders, as used with the GUI in offline mode
+python prerender.py -l <folder_1> <folder_2>
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+import time
+import traceback
+from ibllib.pipes.ephys_alignment import EphysAlignment
+from atlaselectrophysiology.plot_data import PlotData, UNIT_FILTERS
+from atlaselectrophysiology.derived_cache import load_slice_images, get_cache_path
+
+# LoadData instance of each worker process, or in the GUI of the thread that prepares sessions in
+# the background. The brain atlas is only loaded once per process
+_loaddata = {}
+
+
+def get_loaddata(local=False):
+    if local not in _loaddata:
+        if local:
+            from atlaselectrophysiology.load_data_local import LoadDataLocal
+            _loaddata[local] = LoadDataLocal()
+        else:
+            from atlaselectrophysiology.load_data import LoadData
+            _loaddata[local] = LoadData()
+    return _loaddata[local]
+
+
+def prerender(target, local=False, filters=UNIT_FILTERS):
+    """
+    Compute all plot data and slice images for a session and store them in the cache
+    :param target: probe insertion id or, if local, path to folder containing data
+    :type target: str
+    :param local: whether target is a local folder
+    :type local: bool
+    :param filters: unit filters to compute plot data for
+    :type filters: list of str
+    :return: time taken in s
+    :type: float
+    """
+    t0 = time.time()
+    loaddata = get_loaddata(local)
+    if local:
+        loaddata.get_info(Path(target))
+    else:
+        loaddata.get_info_from_insertion(target)
+    alf_path, ephys_path, chn_depths, _ = loaddata.get_data()
+    xyz_picks = loaddata.get_xyzpicks()
+
+    plotdata = PlotData(alf_path, ephys_path)
+    plotdata.compute_products(filters)
+
+    ephysalign = EphysAlignment(xyz_picks, chn_depths, brain_atlas=loaddata.brain_atlas)
+    load_slice_images(loaddata, ephysalign.xyz_samples, get_cache_path(alf_path))
+
+    return time.time() - t0
+
+
+def prefetch(sess, filters=UNIT_FILTERS, low_memory=False):
+    """
+    Download the data of a session and compute its plot data. Used by the GUI to prepare the next
+    session in the background. ONE is not thread safe, so data is downloaded with a LoadData
+    instance of its own rather than the one of the GUI
+    :param sess: trajectory of session, one of LoadData.sess
+    :type sess: dict
+    :param filters: unit filters to compute plot data for
+    :type filters: list of str
+    :param low_memory: whether to compute plot data in low memory mode
+    :type low_memory: bool
+    :return: id of trajectory of session
+    :type: str
+    """
+    alf_path, ephys_path = get_loaddata().download_data(sess)
+    plotdata = PlotData(alf_path, ephys_path, low_memory=low_memory)
+    plotdata.compute_products(filters)
+
+    return sess['id']
+
+
+def prerender_all(targets, local=False, filters=UNIT_FILTERS, n_workers=2):
+    """
+    Prerender a list of sessions in a process pool
+    :param targets: probe insertion ids or, if local, paths to folders containing data
+    :type targets: list of str
+    :param local: whether targets are local folders
+    :type local: bool
+    :param filters: unit filters to compute plot data for
+    :type filters: list of str
+    :param n_workers: number of processes
+    :type n_workers: int
+    :return: targets that could not be prerendered
+    :type: list of str
+    """
+    failed = []
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = {executor.submit(_prerender, target, local, filters): target
+                   for target in targets}
+        for iF, future in enumerate(as_completed(futures)):
+            target = futures[future]
+            duration, err = future.result()
+            if err is None:
+                print(f'{iF + 1}/{len(targets)} {target}: done in {duration:.1f} s')
+            else:
+                print(f'{iF + 1}/{len(targets)} {target}: failed\n{err}')
+                failed.append(target)
+
+    return failed
+
+
+def _prerender(target, local, filters):
+    # Errors are returned rather than raised so that the traceback of the worker is reported
+    try:
+        return prerender(target, local=local, filters=filters), None
+    except Exception:
+        return None, traceback.format_exc()
+
+
+if __name__ == '__main__':
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Precompute alignment GUI data for sessions')
+    parser.add_argument('targets', nargs='*', help='Probe insertion ids or local folders')
+    parser.add_argument('-l', '--local', action='store_true',
+                        help='Targets are local folders, as used in offline mode')
+    parser.add_argument('-f', '--file', required=False,
+                        help='Text file with one probe insertion id or folder per line')
+    parser.add_argument('-n', '--n_workers', type=int, default=2, help='Number of processes')
+    parser.add_argument('-u', '--units', nargs='+', default=UNIT_FILTERS, choices=UNIT_FILTERS,
+                        help='Unit filters to compute plot data for')
+    args = parser.parse_args()
+
+    targets = list(args.targets)
+    if args.file:
+        with open(args.file, 'r') as f:
+            targets += [line.strip() for line in f if line.strip()]
+    if not targets:
+        parser.error('no probe insertions or folders given')
+
+    failed = prerender_all(targets, local=args.local, filters=args.units,
+                           n_workers=args.n_workers)
+    if failed:
+        print(f'Could not prerender {len(failed)} of {len(targets)} sessions:')
+        print('\n'.join(failed))
+        raise SystemExit(1)
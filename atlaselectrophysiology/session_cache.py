@@ -0,0 +1,101 @@
+from collections import OrderedDict
+import mmap
+import types
+import numpy as np
+
+# Default memory budget of the sessions kept in memory by the alignment GUI
+SESSION_CACHE_MB = 4096
+
+
+def get_nbytes(obj, skip=(), seen=None):
+    """
+    Estimate the memory held by the arrays of an object, found by walking containers and object
+    attributes. Arrays that share memory are counted once and memory mapped arrays are not
+    counted as their pages are held by the page cache. Arrays are memory mapped when their root
+    buffer is a mmap, np.memmap instances made by e.g. astype hold their data in memory
+    :param obj: object to estimate size of
+    :param skip: objects that are not walked, e.g. data shared between sessions
+    :type skip: list
+    :param seen: ids of objects and array buffers that have already been counted
+    :type seen: set
+    :return: estimated number of bytes
+    :type: int
+    """
+    seen = set() if seen is None else seen
+    if any(obj is other for other in skip):
+        return 0
+    if isinstance(obj, np.ndarray):
+        # Memory is held by the array at the root of a chain of views
+        while isinstance(obj.base, np.ndarray):
+            obj = obj.base
+        if id(obj) in seen or isinstance(obj.base, mmap.mmap):
+            return 0
+        seen.add(id(obj))
+        return obj.nbytes
+    if id(obj) in seen or isinstance(obj, (type, types.ModuleType, types.FunctionType,
+                                           types.MethodType)):
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, dict):
+        return sum(get_nbytes(val, skip, seen) for val in obj.values())
+    elif isinstance(obj, (list, tuple, set)):
+        return sum(get_nbytes(val, skip, seen) for val in obj)
+    elif hasattr(obj, '__dict__'):
+        return get_nbytes(vars(obj), skip, seen)
+    else:
+        return 0
+
+
+class SessionCache:
+    """
+    Least recently used cache of the state of sessions loaded in the alignment GUI, so that
+    switching back to a session doesn't require its data to be loaded and computed again. Sessions
+    are evicted once the memory held by the cached sessions exceeds the memory budget
+    """
+    def __init__(self, max_mb=SESSION_CACHE_MB, skip=()):
+        """
+        :param max_mb: memory budget in MB
+        :type max_mb: float
+        :param skip: objects that are shared between sessions, not counted in the memory budget
+        :type skip: list
+        """
+        self.max_bytes = max_mb * 2 ** 20
+        self.skip = list(skip)
+        self.sessions = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.sessions
+
+    def __len__(self):
+        return len(self.sessions)
+
+    @property
+    def nbytes(self):
+        return sum(nbytes for _, nbytes in self.sessions.values())
+
+    def put(self, key, state):
+        """
+        Add the state of a session as the most recently used, least recently used sessions are
+        evicted to stay within the memory budget
+        :param key: key identifying the session
+        :param state: state of the session
+        :type state: dict
+        """
+        self.sessions.pop(key, None)
+        nbytes = get_nbytes(state, self.skip)
+        if nbytes > self.max_bytes:
+            return
+        self.sessions[key] = (state, nbytes)
+        while self.nbytes > self.max_bytes:
+            self.sessions.popitem(last=False)
+
+    def pop(self, key):
+        """
+        Remove the state of a session from the cache
+        :param key: key identifying the session
+        :return: state of session, None if the session is not cached
+        :type: dict
+        """
+        state = self.sessions.pop(key, None)
+        return None if state is None else state[0]
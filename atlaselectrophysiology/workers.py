@@ -0,0 +1,115 @@
+from PyQt5 import QtCore
+import traceback
+
+
+class WorkerSignals(QtCore.QObject):
+    """
+    Signals emitted by a Worker, QRunnable is not a QObject so cannot emit signals itself
+    """
+    finished = QtCore.pyqtSignal(int, str, object)
+    error = QtCore.pyqtSignal(int, str, str)
+
+
+class Worker(QtCore.QRunnable):
+    """
+    Runs a function on a thread of a QThreadPool and emits its result
+    """
+    def __init__(self, generation, name, fn, *args):
+        super(Worker, self).__init__()
+        self.generation = generation
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args)
+        except Exception:
+            self.signals.error.emit(self.generation, self.name, traceback.format_exc())
+        else:
+            self.signals.finished.emit(self.generation, self.name, result)
+
+
+class JobManager(QtCore.QObject):
+    """
+    Computes named jobs concurrently on a QThreadPool. Results are delivered on the main thread
+    through the finished signal so they can be used directly to update plots
+    """
+    finished = QtCore.pyqtSignal(str, object)
+    failed = QtCore.pyqtSignal(str)
+    progress = QtCore.pyqtSignal(int, int, str)
+
+    def __init__(self, parent=None, max_threads=None):
+        """
+        :param parent: parent QObject
+        :param max_threads: maximum number of jobs to run at once, defaults to number of cores
+        :type max_threads: int
+        """
+        super(JobManager, self).__init__(parent)
+        self.pool = QtCore.QThreadPool(self)
+        if max_threads is not None:
+            self.pool.setMaxThreadCount(max_threads)
+        # Incremented when jobs are cancelled so results of cancelled jobs are ignored
+        self.generation = 0
+        self.pending = set()
+        self.n_done = 0
+        self.n_total = 0
+
+    def submit(self, name, fn, *args, priority=0):
+        """
+        Queue a job, jobs with the same name as a pending job are ignored
+        :param name: name of job, passed to finished signal with result
+        :type name: str
+        :param fn: function to run
+        :param args: arguments to pass to fn
+        :param priority: jobs with higher priority are started first
+        :type priority: int
+        :return: whether job was queued
+        :type: bool
+        """
+        if name in self.pending:
+            return False
+        worker = Worker(self.generation, name, fn, *args)
+        worker.signals.finished.connect(self.on_finished)
+        worker.signals.error.connect(self.on_error)
+        self.pending.add(name)
+        self.n_total += 1
+        self.pool.start(worker, priority)
+        self.progress.emit(self.n_done, self.n_total, name)
+        return True
+
+    def is_pending(self, name):
+        return name in self.pending
+
+    def cancel(self):
+        """
+        Remove queued jobs and discard the results of running jobs. Running jobs can't be
+        interrupted, they complete in the background so the calling thread is not blocked
+        """
+        self.pool.clear()
+        self.generation += 1
+        self.pending = set()
+        self.n_done = 0
+        self.n_total = 0
+
+    def on_finished(self, generation, name, result):
+        if generation != self.generation:
+            return
+        self._job_done(name)
+        self.finished.emit(name, result)
+
+    def on_error(self, generation, name, err):
+        if generation != self.generation:
+            return
+        print(f'could not compute {name}:\n{err}')
+        self._job_done(name)
+        self.failed.emit(name)
+
+    def _job_done(self, name):
+        self.pending.discard(name)
+        self.n_done += 1
+        self.progress.emit(self.n_done, self.n_total, name)
+        if not self.pending:
+            self.n_done = 0
+            self.n_total = 0
@@ -11,7 +11,7 @@ from PyQt5 import QtWidgets, uic
 from PyQt5.QtGui import QTransform
 import pyqtgraph as pg
 
-from ibllib.atlas import AllenAtlas
+from atlaselectrophysiology.atlas_cache import get_atlas
 import qt
 
 
@@ -169,7 +169,7 @@ class Controller(PgImageController):
     """
     def __init__(self, qmain: TopView, res=25):
         super(Controller, self).__init__(qmain)
-        self.atlas = AllenAtlas(res)
+        self.atlas = get_atlas(res)
         self.fig_top = self.qwidget = qmain
         # Setup Coronal slice: width: ml, height: dv, depth: ap
         self.fig_coronal = SliceView(qmain, waxis=0, haxis=2, daxis=1)
@@ -6,6 +6,7 @@ from PyQt5 import QtCore, QtWidgets, uic
 from iblapps import qt
 from iblapps.qt_matplotlib import BaseMplCanvas
 import ibllib.atlas as atlas
+from atlaselectrophysiology.atlas_cache import get_atlas
 
 # Make sure that we are using QT5
 matplotlib.use('Qt5Agg')
@@ -22,7 +23,7 @@ class Model:
         self.ap_um = ap_um
         # load the brain atlas
         if brain_atlas is None:
-            self.brain_atlas = atlas.AllenAtlas(res_um=25)
+            self.brain_atlas = get_atlas(res_um=25)
         else:
             self.brain_atlas = brain_atlas
 
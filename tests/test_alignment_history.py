@@ -0,0 +1,100 @@
+import unittest
+import numpy as np
+from atlaselectrophysiology.alignment_history import AlignmentHistory
+
+
+class CountingAlignment:
+    # Stand in for EphysAlignment that records the calls used to compute region data
+    def __init__(self):
+        self.n_regions = 0
+        self.n_scale = 0
+
+    def scale_histology_regions(self, feature, track):
+        self.n_regions += 1
+        return np.c_[track[:-1], track[1:]] * 1e6, feature
+
+    def get_scale_factor(self, region):
+        self.n_scale += 1
+        return region, np.diff(region, axis=1)[:, 0]
+
+
+class TestAlignmentHistory(unittest.TestCase):
+    def setUp(self):
+        self.ephysalign = CountingAlignment()
+        self.history = AlignmentHistory(self.ephysalign, np.array([0, 1, 2]),
+                                        np.array([0, 1, 2]), cache_size=3)
+
+    def add_steps(self, n):
+        for i in range(n):
+            self.history.add(np.array([0, 1, 2]), np.array([0, 1, 2]) + i + 1)
+
+    def test_undo_redo(self):
+        self.assertFalse(self.history.undo())
+        self.assertFalse(self.history.redo())
+        # More steps than the previous 10 slot buffer
+        self.add_steps(15)
+        self.assertEqual(self.history.total, 15)
+        for i in range(15):
+            self.assertTrue(self.history.undo())
+        self.assertFalse(self.history.undo())
+        np.testing.assert_array_equal(self.history.track, [0, 1, 2])
+        self.assertTrue(self.history.redo())
+        np.testing.assert_array_equal(self.history.track, [1, 2, 3])
+
+    def test_add_after_undo(self):
+        self.add_steps(5)
+        self.history.undo()
+        self.history.undo()
+        self.history.add(np.array([0, 1, 2]), np.array([10, 11, 12]))
+        self.assertEqual(self.history.current, 4)
+        self.assertEqual(self.history.total, 4)
+        self.assertFalse(self.history.redo())
+        np.testing.assert_array_equal(self.history.track, [10, 11, 12])
+
+    def test_steps_are_copies(self):
+        track = np.array([0., 1., 2.])
+        self.history.add(np.array([0, 1, 2]), track)
+        track += 1
+        np.testing.assert_array_equal(self.history.track, [0, 1, 2])
+
+    def test_memoize(self):
+        self.add_steps(4)
+        region, _ = self.history.regions()
+        np.testing.assert_array_equal(region, [[4e6, 5e6], [5e6, 6e6]])
+        _, scale = self.history.scale_factor()
+        np.testing.assert_array_equal(scale, [1e6, 1e6])
+        self.history.regions()
+        self.history.scale_factor()
+        self.assertEqual(self.ephysalign.n_regions, 1)
+        self.assertEqual(self.ephysalign.n_scale, 1)
+
+        # Moving back and forth within the cache size doesn't recompute regions
+        for _ in range(2):
+            self.history.undo()
+            self.history.regions()
+        self.history.redo()
+        self.history.redo()
+        self.history.regions()
+        self.assertEqual(self.ephysalign.n_regions, 3)
+
+        # Least recently used step, step 3, is evicted once cache size is exceeded
+        for _ in range(3):
+            self.history.undo()
+        self.history.regions()
+        self.assertEqual(self.ephysalign.n_regions, 4)
+        self.history.redo()
+        self.history.redo()
+        self.history.regions()
+        self.assertEqual(self.ephysalign.n_regions, 5)
+
+    def test_memo_discarded_on_add(self):
+        self.add_steps(2)
+        self.history.regions()
+        self.history.undo()
+        self.history.add(np.array([0, 1, 2]), np.array([10, 11, 12]))
+        region, _ = self.history.regions()
+        np.testing.assert_array_equal(region, [[10e6, 11e6], [11e6, 12e6]])
+
+
+if __name__ == "__main__":
+    unittest.main(exit=False)
@@ -0,0 +1,44 @@
+import unittest
+import tempfile
+from pathlib import Path
+import numpy as np
+from atlaselectrophysiology import atlas_cache
+
+
+class VolumeAtlas:
+    # Stand in for a brain atlas, with volumes large enough to be memory mapped
+    def __init__(self):
+        self.image = np.random.rand(64, 64, 64)
+        self.label = np.random.randint(0, 1000, (64, 64, 64))
+        self.dims2xyz = np.array([1, 0, 2])
+        self.res_um = 25
+
+    def slice(self, idx):
+        return self.image[idx]
+
+
+class TestAtlasCache(unittest.TestCase):
+    def test_save_read_atlas(self):
+        brain_atlas = VolumeAtlas()
+        with tempfile.TemporaryDirectory() as tdir:
+            atlas_path = Path(tdir, 'atlas')
+            self.assertTrue(atlas_cache.save_atlas(brain_atlas, atlas_path))
+            # Saving again, as another process would, keeps the existing atlas
+            self.assertTrue(atlas_cache.save_atlas(brain_atlas, atlas_path))
+            self.assertEqual([path.name for path in Path(tdir).iterdir()], ['atlas'])
+
+            cached = atlas_cache.read_atlas(atlas_path)
+            self.assertIsInstance(cached, VolumeAtlas)
+            for key in ['image', 'label']:
+                self.assertIsInstance(getattr(cached, key), np.memmap)
+                self.assertFalse(getattr(cached, key).flags.writeable)
+                np.testing.assert_array_equal(getattr(cached, key), getattr(brain_atlas, key))
+            self.assertNotIsInstance(cached.dims2xyz, np.memmap)
+            np.testing.assert_array_equal(cached.dims2xyz, brain_atlas.dims2xyz)
+            self.assertEqual(cached.res_um, 25)
+            np.testing.assert_array_equal(cached.slice(3), brain_atlas.slice(3))
+            del cached
+
+
+if __name__ == "__main__":
+    unittest.main(exit=False)
@@ -0,0 +1,160 @@
+import unittest
+import tempfile
+import os
+from pathlib import Path
+import numpy as np
+from atlaselectrophysiology.derived_cache import (DerivedCache, MMAP_MIN_BYTES, HASH_BYTES,
+                                                  load_slice_images)
+
+
+class SliceLoadData:
+    # Stand in for LoadData that counts the slice images computed
+    def __init__(self, hist_paths):
+        self.hist_paths = hist_paths
+        self.n_slices = 0
+
+    def get_histology_paths(self):
+        return self.hist_paths
+
+    def get_slice_images(self, xyz_channels, hist_paths):
+        self.n_slices += 1
+        return {'hist_rd': np.full((4, xyz_channels.shape[0]), self.n_slices),
+                'scale': np.array([1., 1.])}
+
+
+class TestDerivedCache(unittest.TestCase):
+    def setUp(self):
+        self.tdir = tempfile.TemporaryDirectory()
+        self.source = Path(self.tdir.name, 'spikes.times.npy')
+        np.save(self.source, np.arange(10))
+        self.cache_path = Path(self.tdir.name, 'cache')
+        self.cache = DerivedCache(self.cache_path, [self.source])
+        self.product = {
+            'img': np.random.rand(MMAP_MIN_BYTES // 8 + 1),
+            'levels': [np.array([0, 1]), 'hot'],
+            'scale': (1.5, None),
+            'n': np.int64(3)
+        }
+
+    def tearDown(self):
+        self.tdir.cleanup()
+
+    def test_save_load(self):
+        self.assertNotIn('product', self.cache)
+        self.assertIsNone(self.cache.load('product'))
+        self.cache.save('product', self.product)
+        self.assertIn('product', self.cache)
+
+        product = DerivedCache(self.cache_path, [self.source]).load('product')
+        self.assertEqual(product.keys(), self.product.keys())
+        # Large arrays are memory mapped, small arrays are read into memory
+        self.assertIsInstance(product['img'], np.memmap)
+        self.assertNotIsInstance(product['levels'][0], np.memmap)
+        np.testing.assert_array_equal(product['img'], self.product['img'])
+        np.testing.assert_array_equal(product['levels'][0], [0, 1])
+        self.assertEqual(product['levels'][1], 'hot')
+        self.assertEqual(product['scale'], (1.5, None))
+        self.assertEqual(product['n'], 3)
+        del product
+
+    def test_invalidate(self):
+        self.cache.save('product', self.product)
+        # Source modified without changing its size
+        stat = self.source.stat()
+        os.utime(self.source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        cache = DerivedCache(self.cache_path, [self.source])
+        self.assertNotIn('product', cache)
+        self.assertIsNone(cache.load('product'))
+
+        # Source with a different size
+        cache.save('product', self.product)
+        np.save(self.source, np.arange(20))
+        cache = DerivedCache(self.cache_path, [self.source])
+        self.assertNotIn('product', cache)
+        self.assertIsNone(cache.load('product'))
+
+        # Source replaced by a file with the same size and modification time, e.g with cp -p
+        cache.save('product', self.product)
+        stat = self.source.stat()
+        np.save(self.source, np.arange(20)[::-1])
+        os.utime(self.source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.source.stat().st_size, stat.st_size)
+        cache = DerivedCache(self.cache_path, [self.source])
+        self.assertNotIn('product', cache)
+        self.assertIsNone(cache.load('product'))
+
+    def test_hash_large_file(self):
+        # Content at the end of files larger than the bytes hashed at the start is hashed
+        data = np.zeros(2 * HASH_BYTES // 8)
+        np.save(self.source, data)
+        stat = self.source.stat()
+        key = DerivedCache.hash_files([self.source])
+        data[-1] = 1
+        np.save(self.source, data)
+        os.utime(self.source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertNotEqual(DerivedCache.hash_files([self.source]), key)
+
+    def test_corrupt(self):
+        self.cache.save('product', self.product)
+        product_path = self.cache_path.joinpath('product')
+        # Truncated array file
+        arr_file = product_path.joinpath('arr_0.npy')
+        with open(arr_file, 'r+b') as f:
+            f.truncate(arr_file.stat().st_size // 2)
+        self.assertIsNone(self.cache.load('product'))
+        self.assertFalse(product_path.exists())
+
+        # Partially written meta data
+        self.cache.save('product', self.product)
+        with open(product_path.joinpath('meta.json'), 'w') as f:
+            f.write('{"key": ')
+        self.assertNotIn('product', self.cache)
+        self.assertIsNone(self.cache.load('product'))
+
+        # Missing array file
+        self.cache.save('product', self.product)
+        product_path.joinpath('arr_1.npy').unlink()
+        self.assertIsNone(self.cache.load('product'))
+        self.cache.save('product', self.product)
+        self.assertIsNotNone(self.cache.load('product'))
+
+
+class TestLoadSliceImages(unittest.TestCase):
+    def setUp(self):
+        self.tdir = tempfile.TemporaryDirectory()
+        self.hist_paths = (Path(self.tdir.name, 'RD.nrrd'), Path(self.tdir.name, 'GR.nrrd'))
+        for path in self.hist_paths:
+            path.write_bytes(b'nrrd')
+        self.cache_path = Path(self.tdir.name, 'cache')
+        self.xyz = np.random.rand(10, 3)
+
+    def tearDown(self):
+        self.tdir.cleanup()
+
+    def test_cached(self):
+        loaddata = SliceLoadData(self.hist_paths)
+        load_slice_images(loaddata, self.xyz, self.cache_path)
+        slice_data = load_slice_images(loaddata, self.xyz, self.cache_path)
+        self.assertEqual(loaddata.n_slices, 1)
+        np.testing.assert_array_equal(slice_data['hist_rd'], 1)
+        # Another track
+        load_slice_images(loaddata, self.xyz + 1, self.cache_path)
+        self.assertEqual(loaddata.n_slices, 2)
+
+        # Histology volume replaced
+        self.hist_paths[1].write_bytes(b'new nrrd')
+        slice_data = load_slice_images(loaddata, self.xyz, self.cache_path)
+        self.assertEqual(loaddata.n_slices, 3)
+        np.testing.assert_array_equal(slice_data['hist_rd'], 3)
+
+    def test_missing_histology(self):
+        # Atlas image shown in place of missing histology is not cached
+        loaddata = SliceLoadData((self.hist_paths[0], None))
+        load_slice_images(loaddata, self.xyz, self.cache_path)
+        load_slice_images(loaddata, self.xyz, self.cache_path)
+        self.assertEqual(loaddata.n_slices, 2)
+        self.assertFalse(self.cache_path.exists())
+
+
+if __name__ == "__main__":
+    unittest.main(exit=False)
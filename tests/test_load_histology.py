@@ -0,0 +1,78 @@
+import unittest
+from unittest import mock
+import tempfile
+from pathlib import Path
+import numpy as np
+import nrrd
+from atlaselectrophysiology import load_histology
+
+
+class VolumeAtlas:
+    # Stand in for a brain atlas, image[iap, iml, idv]
+    def __init__(self, shape=(12, 10, 8)):
+        self.image = np.zeros(shape)
+
+
+class TestHistologyNpy(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.tdir = tempfile.TemporaryDirectory()
+        self.brain_atlas = VolumeAtlas()
+        # Histology volume as stored in nrrd files, volume[iml, idv, iap]
+        self.volume = np.random.randint(0, 2 ** 16, (10, 8, 12)).astype(np.uint16)
+        self.nrrd_path = Path(self.tdir.name, 'STD_ds_RD.nrrd')
+        nrrd.write(str(self.nrrd_path), self.volume, index_order='C')
+        self.npy_path = Path(self.tdir.name, 'STD_ds_RD.npy')
+
+    def tearDown(self):
+        self.tdir.cleanup()
+
+    def test_nrrd2npy(self):
+        self.assertEqual(load_histology.nrrd2npy(self.nrrd_path, self.brain_atlas), self.npy_path)
+        volume = np.load(self.npy_path)
+        self.assertEqual(volume.shape, self.brain_atlas.image.shape)
+        np.testing.assert_array_equal(volume, np.transpose(self.volume, (2, 0, 1)))
+        self.assertEqual([path.name for path in Path(self.tdir.name).iterdir()
+                          if path.suffix == '.part'], [])
+
+    def test_interrupted_conversion(self):
+        # Partial file left by an interrupted conversion is not used, and is replaced
+        part_path = Path(self.tdir.name, 'STD_ds_RD.npy.part')
+        part_path.write_bytes(b'\x93NUMPY')
+        load_histology.nrrd2npy(self.nrrd_path, self.brain_atlas)
+        self.assertFalse(part_path.exists())
+        np.testing.assert_array_equal(np.load(self.npy_path),
+                                      np.transpose(self.volume, (2, 0, 1)))
+
+    def test_existing_npy(self):
+        np.save(self.npy_path, np.ones(self.brain_atlas.image.shape))
+        load_histology.nrrd2npy(self.nrrd_path, self.brain_atlas)
+        np.testing.assert_array_equal(np.load(self.npy_path), 1)
+
+    def test_shape_mismatch(self):
+        # Volumes with another ordering of axes are reordered by the atlas
+        brain_atlas = VolumeAtlas((10, 8, 12))
+        image = np.random.rand(10, 8, 12)
+        with mock.patch.object(load_histology.atlas, 'AllenAtlas') as allen_atlas:
+            allen_atlas.return_value.image = image
+            load_histology.nrrd2npy(self.nrrd_path, brain_atlas)
+        allen_atlas.assert_called_once_with(hist_path=self.nrrd_path)
+        np.testing.assert_array_equal(np.load(self.npy_path), image)
+
+    def test_get_histology_slice(self):
+        index = np.c_[np.arange(8) + 2, np.zeros(8, dtype=int), np.arange(8)]
+        hist_slice = load_histology.get_histology_slice(self.nrrd_path, index, self.brain_atlas)
+        # Slice of the volume read from the nrrd file
+        volume, _ = nrrd.read(str(self.nrrd_path), index_order='C')
+        volume = np.transpose(volume, (2, 0, 1))
+        np.testing.assert_array_equal(hist_slice,
+                                      np.swapaxes(volume[index[:, 0], :, index[:, 2]], 0, 1))
+        self.assertEqual(hist_slice.shape, (10, 8))
+        # Slicing the memory mapped volume again gives the same slice
+        np.testing.assert_array_equal(
+            load_histology.get_histology_slice(self.nrrd_path, index, self.brain_atlas),
+            hist_slice)
+
+
+if __name__ == "__main__":
+    unittest.main(exit=False)
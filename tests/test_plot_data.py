@@ -0,0 +1,401 @@
+import unittest
+import tempfile
+import threading
+import numpy as np
+from matplotlib import cm
+from brainbox.processing import bincount2D
+from brainbox.population import xcorr
+from atlaselectrophysiology.plot_data import (average_chn_depth, median_subtract, binned_corrcoef,
+                                              compute_cluster_stats, ClusterIndex, PlotData,
+                                              fr_img_t_bin, chunk_arrays, bincount2D_chunked,
+                                              compute_autocorrs, AUTOCORR_BIN_SIZE,
+                                              AUTOCORR_WIN_SIZE, get_scatter_lod,
+                                              MAX_SCATTER_POINTS, FREQ_BANDS)
+from atlaselectrophysiology import benchmark
+
+
+def average_chn_depth_ref(data, chn_depth, chn_depth_eq):
+    # Original implementation applied along each time sample
+    def avg_chn_depth(a):
+        return (np.mean([a[chn_depth], a[chn_depth_eq]], axis=0))
+    return np.apply_along_axis(avg_chn_depth, 1, data)
+
+
+def median_subtract_ref(data):
+    # Original implementation applied along each time sample
+    def get_median(a):
+        return (np.median(a))
+
+    def median_subtract(a):
+        return (a - np.median(a))
+    median = np.mean(np.apply_along_axis(get_median, 1, data))
+    return np.apply_along_axis(median_subtract, 1, data) + median
+
+
+class TestRmsDepthAverage(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        # Neuropixel 1.0 geometry, two channels at each depth
+        chn_depths = np.repeat(np.arange(20, 3860, 20), 2)
+        # Remove one channel so that a depth has a single channel
+        chn_depths = np.delete(chn_depths, 10)
+        _, self.chn_depth, chn_count = np.unique(chn_depths, return_index=True,
+                                                 return_counts=True)
+        self.chn_depth_eq = np.copy(self.chn_depth)
+        self.chn_depth_eq[np.where(chn_count == 2)] += 1
+        self.rms = np.random.rand(2000, chn_depths.size) * 1e-5 * 1e6
+
+    def test_average_chn_depth(self):
+        img = average_chn_depth(self.rms, self.chn_depth, self.chn_depth_eq)
+        img_ref = average_chn_depth_ref(self.rms, self.chn_depth, self.chn_depth_eq)
+        self.assertEqual(img.shape, (self.rms.shape[0], self.chn_depth.size))
+        np.testing.assert_array_equal(img, img_ref)
+
+    def test_median_subtract(self):
+        img = average_chn_depth(self.rms, self.chn_depth, self.chn_depth_eq)
+        np.testing.assert_array_equal(median_subtract(img), median_subtract_ref(img))
+
+    def test_rms_image(self):
+        img_ref = median_subtract_ref(average_chn_depth_ref(self.rms, self.chn_depth,
+                                                            self.chn_depth_eq))
+        img = median_subtract(average_chn_depth(self.rms, self.chn_depth, self.chn_depth_eq))
+        np.testing.assert_array_equal(img, img_ref)
+
+
+class TestBinnedCorrcoef(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        n_spikes = 200000
+        self.times = np.sort(np.random.uniform(0, 600, n_spikes))
+        self.depths = np.random.uniform(0, 3840, n_spikes)
+        # Synchronous activity at two depths so that some bins are correlated
+        burst = np.random.choice(n_spikes, 5000, replace=False)
+        self.depths[burst] = np.random.choice([200, 2000], burst.size)
+
+    def test_binned_corrcoef(self):
+        R, _, depths_ref = bincount2D(self.times, self.depths, 0.05, 40, ylim=[0, 3840])
+        corr_ref = np.corrcoef(R)
+        # Chunk sizes that split time bins across chunks and that contain a single chunk
+        for chunk_size in [7, 2 ** 14, self.times.size]:
+            corr, depths = binned_corrcoef(chunk_arrays(self.times, self.depths), 0.05, 40,
+                                           tlim=[self.times[0], self.times[-1]], ylim=[0, 3840],
+                                           chunk_size=chunk_size)
+            np.testing.assert_array_equal(depths, depths_ref)
+            np.testing.assert_allclose(corr, corr_ref, rtol=0, atol=1e-12)
+
+    def test_bincount2D_chunked(self):
+        amps = np.random.rand(self.times.size)
+        r_ref, times_ref, depths_ref = bincount2D(self.times, self.depths, 1, 5, ylim=[0, 3840])
+        w_ref, _, _ = bincount2D(self.times, self.depths, 1, 5, ylim=[0, 3840], weights=amps)
+        for chunk_size in [30000, self.times.size]:
+            r, w, times, depths = bincount2D_chunked(
+                chunk_arrays(self.times, self.depths, amps, chunk_size=chunk_size), 1, 5,
+                xlim=[self.times[0], self.times[-1]], ylim=[0, 3840], weights=True)
+            np.testing.assert_array_equal(r, r_ref)
+            np.testing.assert_allclose(w, w_ref, rtol=0, atol=1e-12)
+            np.testing.assert_array_equal(times, times_ref)
+            np.testing.assert_array_equal(depths, depths_ref)
+
+
+class TestClusterIndex(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.spike_clusters = np.random.randint(0, 50, 20000)
+        # Cluster without any spikes
+        self.spike_clusters[self.spike_clusters == 10] = 11
+        self.index = ClusterIndex(self.spike_clusters)
+
+    def test_spikes(self):
+        for clust in [0, 10, 11, 49, 100]:
+            np.testing.assert_array_equal(self.index.spikes(clust),
+                                          np.where(self.spike_clusters == clust)[0])
+
+    def test_spike_idx(self):
+        clusters = np.array([2, 10, 11, 30, 100])
+        np.testing.assert_array_equal(self.index.spike_idx(clusters),
+                                      np.where(np.isin(self.spike_clusters, clusters))[0])
+
+    def test_reduceat(self):
+        np.testing.assert_array_equal(self.index.reduceat(np.add, np.ones(self.index.order.size)),
+                                      np.bincount(self.spike_clusters)[self.index.clusters])
+        values = np.random.rand(self.spike_clusters.size)
+        np.testing.assert_allclose(
+            self.index.reduceat(np.add, values[self.index.order]),
+            np.bincount(self.spike_clusters, weights=values)[self.index.clusters])
+
+
+class TestAutocorrs(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        n_spikes = 20000
+        self.spike_times = np.sort(np.random.uniform(0, 20, n_spikes))
+        # Duplicate spike times, within and across clusters
+        self.spike_times[1000:1010] = self.spike_times[1000]
+        self.spike_clusters = np.random.randint(0, 30, n_spikes)
+        # Cluster without any spikes and cluster with a single spike
+        self.spike_clusters[self.spike_clusters == 10] = 11
+        self.spike_clusters[self.spike_clusters == 20] = 21
+        self.spike_clusters[0] = 20
+        self.index = ClusterIndex(self.spike_clusters)
+
+    def test_compute_autocorrs(self):
+        for chunk_size in [1, 100, 2 ** 22]:
+            clusters, autocorrs = compute_autocorrs(self.spike_times, self.index,
+                                                    AUTOCORR_BIN_SIZE, AUTOCORR_WIN_SIZE,
+                                                    chunk_size=chunk_size)
+            np.testing.assert_array_equal(clusters, np.unique(self.spike_clusters))
+            self.assertNotIn(10, clusters)
+            for clust, autocorr in zip(clusters, autocorrs):
+                idx = np.where(self.spike_clusters == clust)[0]
+                autocorr_ref = xcorr(self.spike_times[idx], self.spike_clusters[idx],
+                                     AUTOCORR_BIN_SIZE, AUTOCORR_WIN_SIZE)[0, 0, :]
+                np.testing.assert_array_equal(autocorr, autocorr_ref)
+            self.assertFalse(np.any(autocorrs[clusters == 20]))
+
+
+class TestClusterStats(unittest.TestCase):
+    def test_compute_cluster_stats(self):
+        np.random.seed(0)
+        spike_clusters = np.random.randint(0, 50, 20000)
+        spike_amps = np.random.rand(spike_clusters.size)
+        stats = compute_cluster_stats(ClusterIndex(spike_clusters), {'amps': spike_amps},
+                                      percentiles=np.array([0, 50, 100]))
+        np.testing.assert_array_equal(stats['clusters'], np.unique(spike_clusters))
+        for iC, clust in enumerate(stats['clusters']):
+            amps = spike_amps[spike_clusters == clust]
+            self.assertEqual(stats['count'][iC], amps.size)
+            self.assertAlmostEqual(stats['amps']['mean'][iC], np.mean(amps))
+            self.assertAlmostEqual(stats['amps']['std'][iC], np.std(amps))
+            self.assertEqual(stats['amps']['min'][iC], np.min(amps))
+            self.assertEqual(stats['amps']['max'][iC], np.max(amps))
+            np.testing.assert_array_equal(stats['amps']['percentiles'][iC],
+                                          [np.min(amps), np.sort(amps)[(amps.size - 1) // 2],
+                                           np.max(amps)])
+
+
+class TestFrImg(unittest.TestCase):
+    def setUp(self):
+        self.tdir = tempfile.TemporaryDirectory()
+        alf_path, ephys_path = benchmark.make_synthetic_data(self.tdir.name, 1e6)
+        self.plotdata = PlotData(alf_path, ephys_path, cache=False)
+
+    def tearDown(self):
+        self.tdir.cleanup()
+
+    def test_fr_img_t_bin(self):
+        self.assertAlmostEqual(fr_img_t_bin(7200, 2000), 5)
+        self.assertAlmostEqual(fr_img_t_bin(100, 2000), 0.05)
+        self.assertAlmostEqual(fr_img_t_bin(1, 2000), 0.01)
+
+    def test_fr_img_window(self):
+        times = self.plotdata.get_spike_data('times')
+        img = self.plotdata.get_fr_img()
+        self.assertEqual(img['img'].dtype, np.float32)
+        self.assertLessEqual(img['img'].shape[0], 2000 + 1)
+        window = self.plotdata.get_fr_img_window(20, 21)
+        self.assertLess(window['t_bin'], img['t_bin'])
+        n_spikes = np.sum((times >= window['xrange'][0]) & (times <= 21))
+        self.assertAlmostEqual(np.sum(window['img']) * window['t_bin'], n_spikes, places=2)
+
+    def test_low_memory(self):
+        # Spike data streamed from memory mapped files matches spike data held in memory
+        plotdata = PlotData(self.plotdata.alf_path, self.plotdata.ephys_path, cache=False,
+                            low_memory=True)
+        for type in ['all', 'good']:
+            self.plotdata.filter_units(type)
+            plotdata.filter_units(type)
+            chunks = list(plotdata.spike_chunks(['times', 'depths'], chunk_size=100000))
+            self.assertGreater(len(chunks), 1)
+            for iA, attr in enumerate(['times', 'depths']):
+                np.testing.assert_array_equal(np.concatenate([chunk[iA] for chunk in chunks]),
+                                              self.plotdata.get_spike_data(attr))
+            np.testing.assert_array_equal(plotdata.get_fr_img()['img'],
+                                          self.plotdata.get_fr_img()['img'])
+            np.testing.assert_allclose(plotdata.get_correlation_data_img()['img'],
+                                       self.plotdata.get_correlation_data_img()['img'])
+
+
+class TestDepthScatter(unittest.TestCase):
+    def setUp(self):
+        self.tdir = tempfile.TemporaryDirectory()
+        alf_path, ephys_path = benchmark.make_synthetic_data(self.tdir.name, 1e6)
+        self.plotdata = PlotData(alf_path, ephys_path, cache=False)
+
+    def tearDown(self):
+        self.tdir.cleanup()
+
+    def test_colours_sizes(self):
+        data = self.plotdata.get_depth_data_scatter()
+        lod = data['lod']
+        amps = self.plotdata.get_spike_data('amps', kp=False)
+        amp_bins = np.linspace(*np.quantile(amps, [0, 0.9]), 10)
+        colours = cm.get_cmap('BuPu')(np.linspace(0, 1, 10)) * 255
+        # Original implementation, colour and size assigned to the spikes of each amplitude bin
+        for iA in range(amp_bins.size - 1):
+            idx = np.where((amps > amp_bins[iA]) & (amps <= amp_bins[iA + 1]))[0]
+            self.assertGreater(idx.size, 0)
+            np.testing.assert_array_equal(
+                data['lut'][lod['colours'][idx], :3],
+                np.broadcast_to(colours[iA, :3].astype(np.uint8), (idx.size, 3)))
+            np.testing.assert_array_equal(data['size'][lod['colours'][idx]], iA / (10 / 4))
+        # Spikes outside of the amplitude bins are assigned to the first or last bin
+        np.testing.assert_array_equal(lod['colours'][amps <= amp_bins[0]], 0)
+        np.testing.assert_array_equal(lod['colours'][amps > amp_bins[-1]], amp_bins.size - 2)
+        # Scatter is first displayed at the coarsest level of detail
+        stride = lod['strides'][-1]
+        np.testing.assert_array_equal(data['colours'], lod['colours'][::stride])
+        np.testing.assert_array_equal(data['x'], self.plotdata.get_spike_data('times',
+                                                                              kp=False)[::stride])
+
+    def test_levels(self):
+        data = self.plotdata.get_depth_data_scatter()
+        lod = data['lod']
+        times = self.plotdata.get_spike_data('times', kp=False)
+        # Full resolution level contains every spike, each level has half the spikes of the
+        # previous one
+        np.testing.assert_array_equal(lod['strides'], 2 ** np.arange(lod['strides'].size))
+        np.testing.assert_array_equal(lod['x'], times)
+        self.assertEqual(lod['y'].size, times.size)
+        self.assertEqual(lod['colours'].size, times.size)
+        # Coarsest level is the first level with at most MAX_SCATTER_POINTS spikes, and is the
+        # level displayed first
+        self.assertLessEqual(times[::lod['strides'][-1]].size, MAX_SCATTER_POINTS)
+        self.assertGreater(times[::lod['strides'][-2]].size, MAX_SCATTER_POINTS)
+        self.assertEqual(data['x'].size, times[::lod['strides'][-1]].size)
+
+
+class TestScatterLod(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.n_spikes = 2 ** 20
+        self.lod = {'x': np.sort(np.random.uniform(0, 1000, self.n_spikes)),
+                    'y': np.random.uniform(0, 3840, self.n_spikes),
+                    'strides': 2 ** np.arange(6)}
+        self.max_points = self.n_spikes // 32
+
+    def test_whole_recording(self):
+        # Coarsest level
+        idx = get_scatter_lod(self.lod, [0, 1000], [0, 3840], max_points=self.max_points)
+        np.testing.assert_array_equal(idx, np.arange(0, self.n_spikes, 32))
+        # Coarsest level thinned to max_points
+        idx = get_scatter_lod(self.lod, [0, 1000], [0, 3840], max_points=1000)
+        self.assertLessEqual(idx.size, 1000)
+        self.assertEqual(np.sum(idx % 32), 0)
+
+    def test_zoom(self):
+        x, y = self.lod['x'], self.lod['y']
+        # Full resolution level contains every spike in the view
+        idx = get_scatter_lod(self.lod, [100, 101], [0, 3840], max_points=self.max_points)
+        np.testing.assert_array_equal(idx, np.where((x >= 100) & (x < 101))[0])
+        # Level chosen from the number of spikes within the depth range
+        idx = get_scatter_lod(self.lod, [0, 1000], [1000, 1200], max_points=self.max_points)
+        in_range = np.where((y >= 1000) & (y <= 1200))[0]
+        np.testing.assert_array_equal(idx, in_range[in_range % 2 == 0])
+
+
+class TestLfpBands(unittest.TestCase):
+    def setUp(self):
+        self.tdir = tempfile.TemporaryDirectory()
+        alf_path, ephys_path = benchmark.make_synthetic_data(self.tdir.name, 1e5)
+        self.plotdata = PlotData(alf_path, ephys_path, cache=False)
+
+    def tearDown(self):
+        self.tdir.cleanup()
+
+    def test_band_power(self):
+        freqs = self.plotdata.lfp_freq
+        # Default bands, bands at the edges of the spectrum, a band extending beyond the end of
+        # the spectrum and a band that aligns with frequency bins
+        bands = np.r_[FREQ_BANDS, [[freqs[0], freqs[5]], [1000, freqs[-1]], [1000, 2000],
+                                   [freqs[10], freqs[20]]]]
+        for freq_min, freq_max in bands:
+            # Original implementation, mean over the frequency bins in the band
+            freq_idx = np.where((freqs >= freq_min) & (freqs < freq_max))[0]
+            self.assertGreater(freq_idx.size, 0)
+            lfp_avg = np.mean(self.plotdata.lfp_power[freq_idx], axis=0)[self.plotdata.chn_ind]
+            img_ref, _, _ = self.plotdata.arrange_channels2banks(10 * np.log10(lfp_avg))
+            data = self.plotdata.get_lfp_band_data(freq_min, freq_max)
+            for bnk_img, bnk_img_ref in zip(data['img'], img_ref):
+                np.testing.assert_allclose(bnk_img, bnk_img_ref, rtol=1e-10)
+        _, data_probe = self.plotdata.get_lfp_spectrum_data()
+        self.assertEqual(len(data_probe), len(FREQ_BANDS))
+
+    def test_band_without_bins(self):
+        # Bands between two frequency bins or beyond the spectrum use a single bin
+        freqs = self.plotdata.lfp_freq
+        bands = [[freqs[10] + 0.1, freqs[11] - 0.1], [freqs[10], freqs[10]],
+                 [freqs[-1] + 1, freqs[-1] + 2]]
+        for (freq_min, freq_max), idx in zip(bands, [11, 10, freqs.size - 1]):
+            lfp_avg = self.plotdata.lfp_power[idx][self.plotdata.chn_ind]
+            img_ref, _, _ = self.plotdata.arrange_channels2banks(10 * np.log10(lfp_avg))
+            data = self.plotdata.get_lfp_band_data(freq_min, freq_max)
+            for bnk_img, bnk_img_ref in zip(data['img'], img_ref):
+                np.testing.assert_allclose(bnk_img, bnk_img_ref, rtol=1e-10)
+            self.assertTrue(np.all(np.isfinite(data['level'])))
+
+
+class TestUnitFilter(unittest.TestCase):
+    def setUp(self):
+        self.tdir = tempfile.TemporaryDirectory()
+        alf_path, ephys_path = benchmark.make_synthetic_data(self.tdir.name, 1e5)
+        self.plotdata = PlotData(alf_path, ephys_path, cache=False)
+
+    def tearDown(self):
+        self.tdir.cleanup()
+
+    def test_filter_round_trip(self):
+        # The GUI reuses the scatter data of all units when switching back from good units, so the
+        # scatter method is not called again
+        fr_scatter, _, _ = self.plotdata.get_fr_p2t_data_scatter()
+        self.plotdata.filter_units('good')
+        good_scatter, _, _ = self.plotdata.get_fr_p2t_data_scatter()
+        self.assertLess(good_scatter['x'].size, fr_scatter['x'].size)
+        self.plotdata.filter_units('all')
+
+        stats = self.plotdata.get_cluster_stats()
+        np.testing.assert_array_equal(stats['amps']['mean'] * 1e6, fr_scatter['x'])
+        clusters, autocorrs = self.plotdata.get_autocorrs()
+        spike_clusters = self.plotdata.spikes['clusters']
+        for clust_idx in [0, stats['clusters'].size - 1]:
+            clust = stats['clusters'][clust_idx]
+            self.assertEqual(stats['count'][clust_idx], np.sum(spike_clusters == clust))
+            np.testing.assert_array_equal(self.plotdata.get_autocorr(clust),
+                                          autocorrs[clusters == clust][0])
+            np.testing.assert_array_equal(self.plotdata.get_template_wf(clust),
+                                          self.plotdata.clusters['waveforms'][clust, :, 0] * 1e6)
+
+    def test_thread_unit_filter(self):
+        # Plot data computed on a worker thread uses the filter bound to the thread, not the one
+        # selected with filter_units
+        good = {}
+
+        def compute():
+            with self.plotdata.unit_filter('good'):
+                good['type'] = self.plotdata.filter_type
+                good['times'] = self.plotdata.get_spike_data('times')
+
+        thread = threading.Thread(target=compute)
+        thread.start()
+        thread.join()
+        self.assertEqual(good['type'], 'good')
+        self.assertEqual(self.plotdata.filter_type, 'all')
+        self.assertLess(good['times'].size, self.plotdata.get_spike_data('times').size)
+        self.plotdata.filter_units('good')
+        np.testing.assert_array_equal(good['times'], self.plotdata.get_spike_data('times'))
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_benchmark(self):
+        with tempfile.TemporaryDirectory() as tdir:
+            report = benchmark.run(sizes=[20000], path=tdir)
+        results = report['benchmarks'][0]['results']
+        self.assertEqual(report['benchmarks'][0]['n_spikes'], 20000)
+        self.assertEqual([res['method'] for res in results],
+                         ['__init__'] + [method for method, _ in benchmark.BENCHMARKS])
+        for res in results:
+            self.assertGreaterEqual(res['time_s'], 0)
+            self.assertGreaterEqual(res['peak_mb'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main(exit=False)
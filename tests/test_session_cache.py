@@ -0,0 +1,63 @@
+import unittest
+import tempfile
+from pathlib import Path
+import numpy as np
+from atlaselectrophysiology.session_cache import SessionCache, get_nbytes
+
+
+class Session:
+    def __init__(self, n_bytes):
+        self.data = np.zeros(n_bytes, dtype=np.uint8)
+        self.view = self.data[::2]
+        self.products = {'img': [np.zeros(n_bytes // 2, dtype=np.uint8)]}
+
+
+class TestGetNbytes(unittest.TestCase):
+    def test_get_nbytes(self):
+        session = Session(1000)
+        # Views of an array are only counted once
+        self.assertEqual(get_nbytes(session), 1500)
+        self.assertEqual(get_nbytes([session, {'data': session.data}]), 1500)
+        self.assertEqual(get_nbytes(session, skip=[session.products]), 1000)
+
+    def test_memmap(self):
+        with tempfile.TemporaryDirectory() as tdir:
+            np.save(Path(tdir, 'data.npy'), np.zeros(1000))
+            data = np.load(Path(tdir, 'data.npy'), mmap_mode='r')
+            self.assertEqual(get_nbytes({'data': data, 'slice': data[:10]}), 0)
+            # Arrays converted from a memory mapped array are held in memory
+            converted = data.astype(np.float32)
+            self.assertIsInstance(converted, np.memmap)
+            self.assertEqual(get_nbytes({'data': data, 'converted': converted}), 4000)
+            del data
+
+
+class TestSessionCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = SessionCache(max_mb=3)
+
+    def test_lru(self):
+        for key in ['a', 'b', 'c']:
+            self.cache.put(key, {'session': Session(2 ** 20)})
+        # Each session holds 1.5 MB, so only the two most recently added are kept
+        self.assertEqual(len(self.cache), 2)
+        self.assertNotIn('a', self.cache)
+        self.assertLessEqual(self.cache.nbytes, 3 * 2 ** 20)
+
+        state = self.cache.pop('b')
+        self.assertIsInstance(state['session'], Session)
+        self.assertNotIn('b', self.cache)
+        self.assertIsNone(self.cache.pop('b'))
+
+        # Storing a session makes it the most recently used
+        self.cache.put('b', state)
+        self.cache.put('d', {'session': Session(2 ** 20)})
+        self.assertEqual(list(self.cache.sessions), ['b', 'd'])
+
+    def test_over_budget(self):
+        self.cache.put('a', {'session': Session(4 * 2 ** 20)})
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main(exit=False)